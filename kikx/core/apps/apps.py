@@ -6,10 +6,12 @@ from fastapi import WebSocket
 
 from lib.utils import get_timestamp
 
-from lib.utils import generate_uuid, ensure_dir, dynamic_import, joinpath
+from lib.utils import generate_uuid, ensure_dir, joinpath
 from core.models.app_models import AppModel
+from core.models.kikx_models import RootConfigModel
 from core.func import FuncX, funcx, funcx_handler
-from core.connection import Connection
+from core.connection import Connection, ChannelConnection
+from core.apps.registry import module_registry
 
 from core.logging import Logger
 
@@ -20,10 +22,11 @@ logger = logging.get_logger()
 
 
 class App(FuncX):
-  def __init__(self, client_id: str, name: str, app_path: Path, config: AppModel, user: object, manifest, sudo=False):
+  def __init__(self, client_id: str, name: str, app_path: Path, config: AppModel, user: object, manifest, sudo=False, kikx_config: Optional[RootConfigModel] = None, app_id: Optional[str] = None):
     super().__init__()
     self.name: str = name
-    self.id: str = generate_uuid()
+    # app_id is given when restoring a session
+    self.id: str = app_id or generate_uuid()
     self.client_id: str = client_id
     self.app_path: Path = app_path
     self.config: AppModel = config
@@ -35,10 +38,12 @@ class App(FuncX):
     
     self.created_at = get_timestamp()
 
-    self.connection = Connection()
-    self.__modules: List[Dict[str, object]] = []
-
-    self.load_modules()
+    self.kikx_config: RootConfigModel = kikx_config or RootConfigModel()
+    self.connection: Connection = Connection(self.kikx_config.connection)
+    # Own connection, kept while multiplexed over the client's one
+    self._connection: Connection = self.connection
+    # Modules are built on first access (see __getattr__)
+    self._modules: Dict[str, object] = {}
 
   def info(self):
     return {
@@ -48,36 +53,86 @@ class App(FuncX):
       
       "sudo": self.sudo,
       "created_at": self.created_at,
+      "modules": list(self._modules),
 
       "connection": self.connection.info()
     }
 
+  def usage(self) -> dict:
+    """Resources held by this app: task processes, websocket traffic, funcx calls."""
+    tasks = self.get_loaded_module("tasks")
+    return {
+      **(tasks.usage() if tasks is not None else {"tasks": 0, "processes": 0, "cpu": 0.0, "rss": 0}),
+      # Own websocket, multiplexed traffic is counted on the client's
+      **self._connection.usage(),
+      "funcx": self.funcx_in_flight,
+      "funcx_calls": self.funcx_calls
+    }
+
   @property
   def connected(self) -> bool:
     """Check if WebSocket is still connected."""
     return self.connection.is_connected
 
-  def load_modules(self) -> None:
-    """Dynamically load app modules from config."""
-    modules_list = self.config.modules.keys()
-    for module_name in modules_list:
+  @property
+  def multiplexed(self) -> bool:
+    """True while events ride on the client's connection."""
+    return isinstance(self.connection, ChannelConnection)
+
+  async def attach_channel(self, parent: Connection) -> None:
+    """Multiplex this app over its client's connection, forwarding unsent events."""
+    if self.multiplexed:
+      return
+    self.connection = ChannelConnection(parent, self.id)
+    for message in self._connection.tracking:
+      await self.connection.send_event(message.event, message.payload)
+    self._connection.sent_seq = self._connection.seq
+    logger.info(f"App multiplexed over client connection: {self.name}")
+
+  def detach_channel(self) -> None:
+    """Go back to the app's own connection."""
+    if self.multiplexed:
+      self.connection = self._connection
+
+  def __getattr__(self, name: str) -> object:
+    # Only called when normal lookup fails - configured modules are built here
+    config = self.__dict__.get("config")
+    if config is None or name not in config.modules or "_modules" not in self.__dict__:
+      raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+    return self.load_module(name)
+
+  def load_module(self, name: str) -> object:
+    """Build a configured module, class comes from the shared registry."""
+    module = self._modules.get(name)
+    if module is not None:
+      return module
+
+    try:
+      module_class = module_registry.get(name)
+      module = module_class(self, self.config.modules[name])
+    except Exception as e:
+      logger.exception(f"Failed to load module '{name}': {e}")
+      raise
+
+    # Cached as a plain attribute, __getattr__ is not hit again
+    setattr(self, name, module)
+    self._modules[name] = module
+    logger.info(f"Module ({name}) loaded for {self}")
+    return module
+
+  def funcx_children(self) -> Dict[str, type]:
+    """Configured modules, listed from their class without building them."""
+    children = {}
+    for name in self.config.modules:
       try:
-        module = dynamic_import(
-          f"app_{module_name}",
-          f"./core/apps/modules/{module_name}.py"
-        )
-        module_class = getattr(module, module_name.capitalize())
-        module_obj = module_class(self, self.config.modules[module_name])
-
-        setattr(self, module_name, module_obj)
-        self.__modules.append({
-          "name": module_name,
-          "module": module,
-          "obj": module_obj
-        })
-        logger.info(f"Module ({module_name}) loaded for {self}")
+        children[name] = module_registry.get(name)
       except Exception as e:
-        logger.exception(f"Failed to load module '{module_name}': {e}")
+        logger.warning(f"Module '{name}' not listed: {e}")
+    return children
+
+  def get_loaded_module(self, name: str) -> Optional[object]:
+    """Return a module only if it was already built."""
+    return self._modules.get(name)
 
   def get_app_path(self) -> Path:
     return self.app_path
@@ -89,27 +144,34 @@ class App(FuncX):
     """Return or create the app's data directory."""
     return ensure_dir(joinpath(self.user.data_path, "data", self.name))
 
-  async def connect_websocket(self, websocket: WebSocket) -> None:
-    """Bind a WebSocket connection to the app."""
-    await self.connection.connect(websocket)
+  async def connect_websocket(self, websocket: WebSocket, last_seq: Optional[int] = None, protocol: Optional[str] = None) -> None:
+    """Bind a WebSocket connection to the app, resuming after last_seq if given."""
+    self.detach_channel()
+    await self.connection.connect(websocket, last_seq, protocol)
     logger.info(f"WebSocket connected for app: {self.name}")
 
   async def send_event(self, event: str, payload: object) -> None:
     """Send event to frontend."""
     await self.connection.send_event(event, payload)
 
+  async def wait_writable(self) -> None:
+    """Wait until the frontend keeps up with sent events."""
+    await self.connection.wait_writable()
+
   async def on_close(self) -> None:
     """Clean up all modules on app close."""
     logger.info(f"Closing app: {self.name} (ID: {self.id})")
 
+    # Modules never used were never built, nothing to close
     results = await asyncio.gather(
-      *[getattr(self, module["name"]).on_close() for module in self.__modules],
+      *[module.on_close() for module in self._modules.values()],
       return_exceptions=True
     )
-    for module, result in zip(self.__modules, results):
+    for name, result in zip(self._modules, results):
       if isinstance(result, Exception):
-        logger.warning(f"Error closing module {module['name']}: {result}")
+        logger.warning(f"Error closing module {name}: {result}")
     await super().on_close()
+    await self._connection.stop()
 
   def __str__(self) -> str:
     return f"App ({self.name}) - (ID: {self.id})"
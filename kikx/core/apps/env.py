@@ -0,0 +1,60 @@
+import os
+from types import MappingProxyType
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+from core.logging import Logger
+
+
+logging = Logger("kikx_apps", "kikx_apps.log")
+logger = logging.get_logger()
+
+
+class EnvCache:
+  """
+  Task environments shared by every instance of an app.
+
+  base is a read-only snapshot of the server environment taken at
+  startup, app environments are built on it once per app name and rebuilt only
+  when their fingerprint (the tasks config) changes. An app env is a plain
+  dict (uvloop spawns only with a real dict) handed out as is to every
+  instance, callers must copy it before adding anything.
+  """
+  def __init__(self):
+    self._base: Mapping[str, str] = MappingProxyType(dict(os.environ))
+    # app name -> (fingerprint, env)
+    self._apps: Dict[str, Tuple[str, Dict[str, str]]] = {}
+    self.stats = {"hits": 0, "builds": 0}
+
+  @property
+  def base(self) -> Mapping[str, str]:
+    return self._base
+
+  def get(self, app_name: str, fingerprint: str, build: Callable[[Mapping[str, str]], Dict[str, str]]) -> Dict[str, str]:
+    """Return the env of app_name, build(base) runs only on a miss / changed fingerprint."""
+    cached = self._apps.get(app_name)
+    if cached is not None and cached[0] == fingerprint:
+      self.stats["hits"] += 1
+      return cached[1]
+
+    env = build(self.base)
+    self._apps[app_name] = (fingerprint, env)
+    self.stats["builds"] += 1
+    logger.info(f"Task env built for {app_name} ({len(env)} vars)")
+    return env
+
+  def invalidate(self, app_name: Optional[str] = None) -> None:
+    """Drop one app env, or all of them."""
+    if app_name is None:
+      self._apps.clear()
+    else:
+      self._apps.pop(app_name, None)
+
+  def info(self) -> dict:
+    return {
+      "apps": len(self._apps),
+      **self.stats
+    }
+
+
+# Shared by all apps
+env_cache = EnvCache()
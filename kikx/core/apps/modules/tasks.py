@@ -2,27 +2,34 @@ import os
 import sys
 import pwd
 import shlex
+import time
 import signal
 import asyncio
 
 from uuid import uuid4
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import Dict, Optional, List, Union
+from typing import Dict, Mapping, Optional, List, Union
 
 from core.func import funcx
 from core.logging import Logger
 from core.func.handlers import Handler
 
 from core.models.app_models import AppModuleTasksConfigModel
+from core.apps.env import env_cache
+from core.limits import LimitExceeded, limits
 
 from lib.parser import parse_config
+from lib.process import process_tree_usage
 
 
 
 logging = Logger("kikx_app_tasks", "kikx_app_tasks.log")
 logger = logging.get_logger()
 
+# Seconds a /proc usage sample of an app's tasks is reused
+USAGE_MAX_AGE = 1.0
+
 
 
 class SafeDict(dict):
@@ -30,10 +37,12 @@ class SafeDict(dict):
     return '{' + key + '}'
 
 class Task:
-  def __init__(self, cmd: str, env: Dict[str, str], shell: bool, cwd: str, sudo: bool):
+  def __init__(self, cmd: str, env: Dict[str, str], shell: bool, cwd: str, sudo: bool, pipe_limit: int = 10 * 1024 * 1024):
     self.cmd: str = cmd
+    self.pipe_limit: int = pipe_limit
     self.cwd = cwd
     self.shell = shell
+    # Shared with the other tasks of the app instance, never modified
     self.env: Dict[str, str] = env
     self.id: str = uuid4().hex
     self.started: bool = False
@@ -54,6 +63,12 @@ class Task:
     
     self._cleaned = False
   
+  def usage(self) -> Optional[Dict[str, float]]:
+    """CPU / RSS of the task's process tree, None if not running."""
+    if not self.process or self.process.returncode is not None:
+      return None
+    return process_tree_usage(self.process.pid)
+
   def get_user(self):
     return "root" if self.sudo else "nobody"
 
@@ -93,7 +108,7 @@ class Task:
         cwd=self.cwd,
         start_new_session=True,
         preexec_fn=preexec,
-        limit=10 * 1024 * 1024 # 10 mb
+        limit=self.pipe_limit
       )
     else:
       self.process = await asyncio.create_subprocess_exec(
@@ -105,7 +120,7 @@ class Task:
         cwd=self.cwd,
         start_new_session=True,
         preexec_fn=preexec,
-        limit=10 * 1024 * 1024 # 10 mb
+        limit=self.pipe_limit
       )
     self.started = True
     self.sid = os.getsid(self.process.pid)
@@ -114,6 +129,8 @@ class Task:
     
     while True:
       try:
+        # Stop reading while the frontend lags, the full pipe blocks the child
+        await handler.writable()
         stdout_line = await asyncio.wait_for(self.process.stdout.readline(), timeout=self.stdout_timeout)
         if not stdout_line:
           break
@@ -153,6 +170,11 @@ class Task:
         start_new_session=True
       )
 
+    # Kept so clean() can kill the process group when the call is cancelled
+    self.process = proc
+    self.sid = os.getsid(proc.pid)
+    self.pgid = os.getpgid(proc.pid)
+
     input_bytes = input_text.encode() if input_text else None
     stdout, stderr = await proc.communicate(input=input_bytes)
 
@@ -223,19 +245,14 @@ class Tasks:
     self.app_path = app.app_path
     self.task_cwd = str(app.get_app_data_path())
 
-    # If not sandbox then copies program env
-    self.task_env = {} if self.config.sandbox else os.environ.copy()
+    # Env shared by every instance of this app, built once per config
+    app_env = env_cache.get(app.name, self.config.model_dump_json(), lambda base: self._build_env(app, base))
 
-    # Include kikx_env variables must shell True
-    if self.config.kikx_env and self.config.shell:
-      self.task_env.update({
-        "KIKX_APP_ID": app.id,
-        "KIKX_APP_NAME": app.name,
-        "KIKX_STORAGE_PATH": str(app.user.storage_path),
-        "KIKX_APP_PATH": str(app.get_app_path()),
-        "KIKX_APP_DATA_PATH": str(app.get_app_data_path()),
-        "KIKX_HOME_PATH": str(app.get_home_path())
-      })
+    # Every task gets it as is, shared with the other instances unless the
+    # app id is added (user env still wins) - never modified in place
+    self.task_env: Dict[str, str] = app_env
+    if self.config.kikx_env and self.config.shell and "KIKX_APP_ID" not in self.config.env:
+      self.task_env = {**app_env, "KIKX_APP_ID": app.id}
 
     # Format paths for task template
     # Task template
@@ -247,23 +264,62 @@ class Tasks:
       "home_path": str(app.get_home_path())
     }))
 
-    # Updating env with user env values
-    self.task_env.update(self.config.env)
-
-    # Program paths
-    self.task_env.update({
-      # 1. app/bin | 2. storage/bin | 3. kikx path
-      "PATH": f'{str(self.app_path / "bin")}:{app.user.get_path_env()}:{str(Path(sys.executable).parent)}:{self.task_env.get("PATH", "")}'
-    })
-    
     # Sudo
     self.sudo = app.sudo #
 
     self.send_event = app.send_event
+    self.wait_writable = app.wait_writable
     
     self.running_tasks: Dict[str, Task] = {}
     self.ctasks: List[asyncio.Task] = []
 
+    # Running tasks of this instance, all apps share limits.tasks too
+    self.admission = limits.app_tasks()
+
+    # Last /proc sample (see usage)
+    self._usage: Optional[Dict[str, float]] = None
+    self._usage_at: float = 0
+
+  def _build_env(self, app, base: Mapping[str, str]) -> Dict[str, str]:
+    """Task env of the app (without the per instance KIKX_APP_ID)."""
+    # If not sandbox then copies program env
+    env = {} if self.config.sandbox else dict(base)
+
+    # Include kikx_env variables must shell True
+    if self.config.kikx_env and self.config.shell:
+      env.update({
+        "KIKX_APP_NAME": app.name,
+        "KIKX_STORAGE_PATH": str(app.user.storage_path),
+        "KIKX_APP_PATH": str(app.get_app_path()),
+        "KIKX_APP_DATA_PATH": str(app.get_app_data_path()),
+        "KIKX_HOME_PATH": str(app.get_home_path())
+      })
+
+    # Updating env with user env values
+    env.update(self.config.env)
+
+    # Program paths
+    env.update({
+      # 1. app/bin | 2. storage/bin | 3. kikx path
+      "PATH": f'{str(self.app_path / "bin")}:{app.user.get_path_env()}:{str(Path(sys.executable).parent)}:{env.get("PATH", "")}'
+    })
+    return env
+
+  def usage(self) -> Dict[str, float]:
+    """CPU seconds / RSS bytes of running tasks, sampled at most every USAGE_MAX_AGE."""
+    now = time.monotonic()
+    if self._usage is None or now - self._usage_at >= USAGE_MAX_AGE:
+      usage = {"tasks": 0, "processes": 0, "cpu": 0.0, "rss": 0}
+      for task in list(self.running_tasks.values()):
+        sample = task.usage()
+        if sample is None:
+          continue
+        usage["tasks"] += 1
+        for key in ("processes", "cpu", "rss"):
+          usage[key] += sample[key]
+      self._usage, self._usage_at = usage, now
+    return self._usage
+
   def __on_ctask_complete(self, task: asyncio.Task) -> None:
     """Callback when a task is finished."""
     if task in self.ctasks:
@@ -273,8 +329,10 @@ class Tasks:
   async def _run_task(self, task: Task, handler: Handler):
     """Run and monitor the task."""
     try:
-      await handler.started("Task started\n")
-      return await task.run(handler)
+      # Waits here while the app / server is at its task limit
+      async with self.admission.slot(), limits.tasks.slot():
+        await handler.started("Task started\n")
+        return await task.run(handler)
     except Exception as e:
       logger.exception(f"Error while running task {task.id}")
       await handler.error(str(e))
@@ -292,16 +350,26 @@ class Tasks:
     split_cmd = shlex.split(task_cmd)
     if not split_cmd:
       raise Exception("Command not found")
+    # Reject now (429) rather than queue past the limits
+    self.admission.check()
+    limits.tasks.check()
 
     task_cmd = self.task_template.format_map(SafeDict({
       "name": split_cmd[0],
       "args": " ".join(split_cmd[1:])
     }))
 
-    task = Task(task_cmd, self.task_env, self.config.shell, self.task_cwd, self.sudo)
+    task = Task(task_cmd, self.task_env, self.config.shell, self.task_cwd, self.sudo, self.config.pipe_limit)
 
     self.running_tasks[task.id] = task
-    ctask = asyncio.create_task(self._run_task(task, Handler(handler_id, self.send_event)), name=task.id)
+    handler = Handler(
+      handler_id,
+      self.send_event,
+      self.config.output_window_ms,
+      self.config.output_max_bytes,
+      self.wait_writable if self.config.backpressure else None
+    )
+    ctask = asyncio.create_task(self._run_task(task, handler), name=task.id)
     ctask.add_done_callback(self.__on_ctask_complete)
     self.ctasks.append(ctask)
 
@@ -312,6 +380,9 @@ class Tasks:
     split_cmd = shlex.split(task_cmd)
     if not split_cmd:
       raise Exception("Command not found")
+    # Reject now (429) rather than queue past the limits
+    self.admission.check()
+    limits.tasks.check()
 
     task_cmd = self.task_template.format_map(SafeDict({
       "name": split_cmd[0],
@@ -322,7 +393,10 @@ class Tasks:
 
     async def _runner():
       try:
-        return await task.run_quick(task_input)
+        async with self.admission.slot(), limits.tasks.slot():
+          return await task.run_quick(task_input)
+      except LimitExceeded:
+        raise
       except asyncio.CancelledError:
         logger.info(f"Task {task.id} was cancelled — terminating subprocess.")
         try:
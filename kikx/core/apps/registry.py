@@ -0,0 +1,90 @@
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from lib.utils import dynamic_import
+
+from core.logging import Logger
+
+
+logging = Logger("kikx_apps", "kikx_apps.log")
+logger = logging.get_logger()
+
+# Built-in app modules (tasks, ...)
+MODULES_PATH = Path(__file__).parent / "modules"
+
+
+class ModuleEntry:
+  def __init__(self, name: str, cls: type, mtime: float, load_ms: float):
+    self.name = name
+    self.cls = cls
+    self.mtime = mtime
+    self.load_ms = load_ms
+    self.loads = 1
+
+
+class ModuleRegistry:
+  """
+  App module classes (modules/<name>.py -> class <Name>), imported once
+  and shared by every app. With reload (dev mode) a module whose file
+  changed is imported again on next use.
+  """
+  def __init__(self, path: Path = MODULES_PATH, reload: bool = False):
+    self.path = path
+    self.reload = reload
+    self._modules: Dict[str, ModuleEntry] = {}
+
+  def discover(self) -> List[str]:
+    """Names of available modules."""
+    return sorted(
+      file.stem for file in self.path.glob("*.py") if not file.name.startswith("_")
+    )
+
+  def preload(self) -> None:
+    """Import every available module, called at startup."""
+    for name in self.discover():
+      try:
+        self.get(name)
+      except Exception as e:
+        logger.exception(f"Failed to load app module '{name}': {e}")
+
+  def get(self, name: str) -> type:
+    """Return the module class, importing it on first use (or after a change with reload)."""
+    entry = self._modules.get(name)
+    if entry is not None and (not self.reload or self._mtime(name) == entry.mtime):
+      return entry.cls
+    return self._load(name, entry).cls
+
+  def _mtime(self, name: str) -> Optional[float]:
+    try:
+      return (self.path / f"{name}.py").stat().st_mtime
+    except OSError:
+      return None
+
+  def _load(self, name: str, previous: Optional[ModuleEntry] = None) -> ModuleEntry:
+    mtime = self._mtime(name)
+    start = time.perf_counter()
+    module = dynamic_import(f"app_{name}", str(self.path / f"{name}.py"))
+    cls = getattr(module, name.capitalize())
+    load_ms = (time.perf_counter() - start) * 1000
+
+    entry = self._modules[name] = ModuleEntry(name, cls, mtime, load_ms)
+    if previous is not None:
+      entry.loads = previous.loads + 1
+      logger.info(f"App module reloaded: {name} ({load_ms:.1f} ms)")
+    else:
+      logger.info(f"App module loaded: {name} ({load_ms:.1f} ms)")
+    return entry
+
+  def info(self) -> dict:
+    return {
+      name: {
+        "load_ms": round(entry.load_ms, 2),
+        "loads": entry.loads
+      }
+      for name, entry in self._modules.items()
+    }
+
+
+# Shared by all apps
+module_registry = ModuleRegistry()
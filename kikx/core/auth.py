@@ -4,6 +4,7 @@ from typing import Optional, Dict
 
 from lib.parser import parse_config
 from core.models.user_models import UserAuthModel
+from core.state import StateBackend, MemoryStateBackend
 
 from fastapi import HTTPException
 
@@ -12,32 +13,36 @@ from fastapi import HTTPException
 # -------------------------------------
 
 class Auth:
-  def __init__(self, user_config_path: Path):
+  def __init__(self, user_config_path: Path, state: Optional[StateBackend] = None):
     self._user_config: UserAuthModel = parse_config(user_config_path, UserAuthModel)
-    self.access_tokens = []
+    # Access tokens, shared between workers with a shared backend
+    self.state: StateBackend = state or MemoryStateBackend()
 
   @property
   def user_config(self) -> UserAuthModel:
     return self._user_config
   
-  def pop_access_token(self, access_token: str) -> Optional[str]:
-    try:
-      self.access_tokens.remove(access_token)  # remove by value (first occurrence)
-      return access_token
-    except ValueError:
+  async def pop_access_token(self, access_token: str) -> Optional[str]:
+    if access_token is None:
       return None
+    return access_token if await self.state.run(self.state.pop_token, access_token) else None
 
-  def generate_access_token(self, access: str, ui: str) -> Optional[str]:
+  async def generate_access_token(self, access: str, ui: str) -> Optional[str]:
     if access != self.user_config.access:
       raise HTTPException(status_code=401, detail="Invalid credentials")
     
     if ui not in self.user_config.ui:
       raise HTTPException(status_code=404, detail="UI not found")
 
-    uid = f"{uuid4()}_{ui}"
-    self.access_tokens.append(uid)
+    uid = self.new_token(ui)
+    await self.state.run(self.state.add_token, uid)
 
     return uid
+
+  @staticmethod
+  def new_token(ui: str) -> str:
+    """Token id for a ui, not usable for login until it is added to the state."""
+    return f"{uuid4()}_{ui}"
   
-  def check_access_token(self, token: str) -> Optional[str]:
-    return token in self.access_tokens
+  async def check_access_token(self, token: str) -> bool:
+    return token is not None and await self.state.run(self.state.has_token, token)
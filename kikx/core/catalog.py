@@ -0,0 +1,192 @@
+import time
+from pathlib import Path
+from uuid import uuid4
+from typing import Dict, List, Optional
+
+from lib.parser import parse_config
+from lib.utils import joinpath
+
+from core.models.app_models import AppManifestModel, AppModel
+from core.apps.env import env_cache
+from core.utils import get_icon_url
+from core.logging import Logger
+
+
+logging = Logger("kikx_catalog", "kikx_catalog.log")
+logger = logging.get_logger()
+
+
+def _mtime(path: Path) -> Optional[float]:
+  try:
+    return path.stat().st_mtime
+  except OSError:
+    return None
+
+
+class CatalogEntry:
+  """Parsed files of one installed app, each with the mtime it was parsed at."""
+  def __init__(self, name: str):
+    self.name = name
+    self.manifest: Optional[AppManifestModel] = None
+    self.manifest_mtime: Optional[float] = None
+    self.config: Optional[AppModel] = None
+    self.config_mtime: Optional[float] = None
+    # Launcher entry (name, title, icon, theme)
+    self.summary: Optional[dict] = None
+
+
+class AppCatalog:
+  """
+  Installed apps with their parsed manifest (apps/<name>/app.json) and
+  config (data/app/<name>.json).
+
+  The apps directory is listed again only when its mtime changes and a
+  file is parsed again only when its own mtime does. Full sweeps for
+  edited files run at most every check_interval seconds, KPM installs
+  and uninstalls call invalidate(). version changes with the content,
+  etag is derived from it. Cached task envs are dropped along with the
+  app they were built for.
+  """
+  def __init__(self, apps_path: Path, apps_data_path: Path, check_interval: float = 1.0):
+    self.apps_path = Path(apps_path).resolve()
+    self.apps_data_path = Path(apps_data_path).resolve()
+    self.check_interval = check_interval
+
+    self.version: int = 0
+    # Distinguishes versions across restarts
+    self._nonce: str = uuid4().hex[:8]
+
+    self._entries: Dict[str, CatalogEntry] = {}
+    self._names: List[str] = []
+    self._apps_mtime: Optional[float] = None
+    self._checked_at: float = 0
+    self._summaries: Optional[List[dict]] = None
+
+  @property
+  def etag(self) -> str:
+    self._sweep()
+    return f'"{self._nonce}-{self.version}"'
+
+  def _changed(self) -> None:
+    self.version += 1
+    self._summaries = None
+
+  def invalidate(self, name: Optional[str] = None) -> None:
+    """Forget one app (or everything), it is read again on next access."""
+    if name is None:
+      self._entries.clear()
+      self._apps_mtime = None
+    else:
+      self._entries.pop(name, None)
+      self._apps_mtime = None
+    env_cache.invalidate(name)
+    self._changed()
+    logger.info(f"Catalog invalidated: {name or 'all apps'}")
+
+  def names(self) -> List[str]:
+    """Installed app names."""
+    mtime = _mtime(self.apps_path)
+    if self._apps_mtime is None or mtime != self._apps_mtime:
+      names = sorted(path.name for path in self.apps_path.iterdir() if path.is_dir())
+      for name in set(self._entries) - set(names):
+        del self._entries[name]
+        env_cache.invalidate(name)
+      if names != self._names:
+        self._names = names
+        self._changed()
+      self._apps_mtime = mtime
+    return self._names
+
+  def exists(self, name: str) -> bool:
+    return name in self.names()
+
+  def _entry(self, name: str) -> CatalogEntry:
+    if not self.exists(name):
+      raise Exception("App not found")
+    entry = self._entries.get(name)
+    if entry is None:
+      entry = self._entries[name] = CatalogEntry(name)
+    return entry
+
+  def manifest(self, name: str) -> AppManifestModel:
+    """Parsed app.json, raise if the app is not installed."""
+    entry = self._entry(name)
+    path = joinpath(self.apps_path, name, "app.json")
+    mtime = _mtime(path)
+    if entry.manifest is None or mtime != entry.manifest_mtime:
+      entry.manifest = parse_config(path, AppManifestModel)
+      entry.manifest_mtime = mtime
+      entry.summary = None
+      self._changed()
+    return entry.manifest
+
+  def config(self, name: str) -> AppModel:
+    """Parsed app config, raise if the app or its config is missing."""
+    entry = self._entry(name)
+    path = joinpath(self.apps_data_path, f"{name}.json")
+    mtime = _mtime(path)
+    if mtime is None:
+      raise Exception("App config file not found")
+    if entry.config is None or mtime != entry.config_mtime:
+      if entry.config is not None:
+        # Edited config, the next instance builds its env again
+        env_cache.invalidate(name)
+      entry.config = parse_config(path, AppModel)
+      entry.config_mtime = mtime
+    return entry.config
+
+  def summary(self, name: str) -> dict:
+    """Launcher entry of an app."""
+    manifest = self.manifest(name)
+    entry = self._entries[name]
+    if entry.summary is None:
+      entry.summary = {
+        "name": name,
+        "title": manifest.title,
+        "icon": get_icon_url(self.apps_path, name, manifest.icon),
+
+        "theme": manifest.theme
+      }
+    return entry.summary
+
+  def summaries(self) -> List[dict]:
+    """Launcher entries of all installed apps, skipping broken ones."""
+    self._sweep()
+    if self._summaries is None:
+      summaries = []
+      for name in self.names():
+        try:
+          summaries.append(self.summary(name))
+        except Exception:
+          pass
+      # Parsing may bump the version, cache for the final one
+      self._summaries = summaries
+    return self._summaries
+
+  def manifests(self) -> List[AppManifestModel]:
+    """Manifests of all installed apps, raise on a broken one."""
+    self._sweep()
+    return [self.manifest(name) for name in self.names()]
+
+  def _sweep(self) -> None:
+    """Pick up apps added / removed / edited outside KPM, throttled."""
+    now = time.monotonic()
+    if now - self._checked_at < self.check_interval:
+      return
+    self._checked_at = now
+
+    for name in self.names():
+      entry = self._entries.get(name)
+      if entry is None or entry.manifest is None:
+        continue
+      if _mtime(joinpath(self.apps_path, name, "app.json")) != entry.manifest_mtime:
+        entry.manifest = None
+        entry.summary = None
+        self._changed()
+
+  def info(self) -> dict:
+    return {
+      "apps": len(self._names),
+      "cached": len(self._entries),
+      "version": self.version
+    }
@@ -4,9 +4,10 @@ from typing import Dict, Optional
 from core.apps import App
 from core.ui import ClientUI
 from core.func import FuncX, funcx
-from core.connection import Connection
+from core.connection import Connection, broadcast_event
 from core.func.handlers import Handler
 from core.models.app_models import AppModel
+from core.models.kikx_models import RootConfigModel
 
 from lib.parser import parse_config
 from lib.utils import generate_uuid, get_timestamp, joinpath
@@ -27,15 +28,17 @@ class Client(FuncX):
   """
   Represents a connected client that manages multiple apps and handles communication.
   """
-  def __init__(self, user: object, resolve_path: callable, access_token: str, ui: ClientUI):
+  def __init__(self, user: object, resolve_path: callable, access_token: str, ui: ClientUI, kikx_config: RootConfigModel, client_id: Optional[str] = None):
     super().__init__()
-    self.id: str = generate_uuid()
+    # client_id is given when restoring a session
+    self.id: str = client_id or generate_uuid()
     self.user: object = user
     self.access_token = access_token
     
     self.ui: ClientUI = ui
+    self.kikx_config: RootConfigModel = kikx_config
 
-    self.connection: Connection = Connection()
+    self.connection: Connection = Connection(kikx_config.connection)
 
     self.created_at: str = get_timestamp()
 
@@ -53,15 +56,28 @@ class Client(FuncX):
 
     return { **app.config.model_dump(), "ui": self.ui.name  }
 
-  async def connect_websocket(self, websocket):
-    await self.connection.connect(websocket)
+  async def connect_websocket(self, websocket, last_seq: Optional[int] = None, protocol: Optional[str] = None):
+    await self.connection.connect(websocket, last_seq, protocol)
 
-  @funcx
+  async def attach_app(self, app_id: str) -> App:
+    """Carry an app's events over this client's connection (multiplexed mode)."""
+    if not self.kikx_config.connection.multiplex_apps:
+      raise PermissionError("App multiplexing is disabled")
+
+    app = self.get_app(app_id)
+    await app.attach_channel(self.connection)
+    await app.send_event("connected", {
+      "config": self.get_app_config(app)
+    })
+    return app
+
+  # Polled by dashboards, user data / settings only change on restart
+  @funcx(cache=60)
   async def user_data(self) -> dict:
     """Returns user's data."""
     return self.user.user_data
 
-  @funcx # not required
+  @funcx(cache=60) # not required
   async def user_settings(self) -> dict:
     """Returns user's settings."""
     return self.user.settings
@@ -80,6 +96,19 @@ class Client(FuncX):
       "apps": [app.info() for app in self.running_apps.values()]
     }
   
+  def usage(self) -> dict:
+    """Resources held by the client and its apps (task processes, traffic, funcx calls)."""
+    usage = {
+      "tasks": 0, "processes": 0, "cpu": 0.0, "rss": 0,
+      **self.connection.usage(),
+      "funcx": self.funcx_in_flight,
+      "funcx_calls": self.funcx_calls
+    }
+    for app in self.running_apps.values():
+      for key, value in app.usage().items():
+        usage[key] += value
+    return usage
+
   # Send event to client connection only if connected else stores
   async def send_event(self, event: str, payload: dict) -> None:
     """Sends an event to the client's connection"""
@@ -87,10 +116,11 @@ class Client(FuncX):
     await self.connection.send_event(event, payload)
   
   # Open app 
-  def open_app(self, name: str, manifest, sudo) -> App:
+  def open_app(self, name: str, manifest, sudo, app_id: Optional[str] = None) -> App:
     """
     Opens an app for the client by name.
-    Loads its configuration and creates the App instance.
+    Loads its configuration and creates the App instance,
+    app_id is given when restoring a session.
     """
     logger.info(f"Opening app: {name}")
     
@@ -98,7 +128,7 @@ class Client(FuncX):
     # app config
     app_config: AppModel = self.user.load_app_config(name)
 
-    app = App(self.id, name, app_path, app_config, self.user, manifest, sudo)
+    app = App(self.id, name, app_path, app_config, self.user, manifest, sudo, self.kikx_config, app_id)
     self.running_apps[app.id] = app
 
     logger.info(f"App opened: {app.name} (ID: {app.id})")
@@ -132,14 +162,14 @@ class Client(FuncX):
     
     # Clearing running apps list
     self.running_apps.clear()
+    await self.connection.stop()
     logger.info(f"All apps shut down for client {self.id}")
 
   # Broadcast event to apps
   async def broadcast_to_apps(self, event, payload):
-    """Broadcast event to apps"""
-    await asyncio.gather(
-      *(app.send_event(event, payload) for app in self.running_apps.values()),
-      return_exceptions=True
+    """Broadcast event to apps, encoding the payload once"""
+    await broadcast_event(
+      [app.connection for app in self.running_apps.values()], event, payload
     )
 
   def __str__(self) -> str:
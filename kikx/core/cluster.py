@@ -0,0 +1,404 @@
+import os
+import re
+import json
+import socket
+import asyncio
+from uuid import uuid4
+from typing import Optional, Tuple
+
+import httpx
+import websockets
+
+from lib.serializer import get_serializer
+
+from core.state import StateBackend
+from core.models.kikx_models import StateConfigModel
+from core.logging import Logger
+
+
+logging = Logger("kikx_cluster", "kikx_cluster.log")
+logger = logging.get_logger()
+
+# Set on requests forwarded between workers, never forwarded again
+WORKER_HEADER = "kikx-worker"
+
+# Paths carrying an app id
+APP_PATH = re.compile(r"^/app(?:-data)?/([^/]+)")
+# POST endpoints naming the session in their JSON body
+BODY_PATHS = ("/open-app", "/close-app", "/api/apps/list")
+
+# Handshake headers the upstream websocket connection sets itself
+WS_SKIP_HEADERS = {
+  "host", "upgrade", "connection", "content-length",
+  "sec-websocket-key", "sec-websocket-version", "sec-websocket-extensions", "sec-websocket-protocol"
+}
+
+
+class Cluster:
+  """
+  Glue between the workers of a multi-worker server.
+
+  Clients / apps live in the memory of the worker that created them,
+  owners are recorded in the shared state backend. A request naming a
+  session owned by another worker is forwarded (HTTP and websocket) to
+  that worker's internal listener, broadcasts are published on the
+  state backend's bus and delivered by every other worker.
+  Workers send a heartbeat every heartbeat_interval, a worker silent
+  for worker_timeout (crashed) is dropped with its sessions.
+  Everything is a no-op with a non shared backend (single worker).
+  """
+  def __init__(self, core: object, state: StateBackend, config: StateConfigModel):
+    self.core = core
+    self.state: StateBackend = state
+    self.config: StateConfigModel = config
+
+    self.worker_id: str = f"{os.getpid()}-{uuid4().hex[:6]}"
+    # Internal listener other workers forward to
+    self.address: Optional[str] = None
+    self._server: Optional[object] = None
+    self._socket: Optional[socket.socket] = None
+    self._http: Optional[httpx.AsyncClient] = None
+
+    self._poll_task: Optional[asyncio.Task] = None
+    self._heartbeat_task: Optional[asyncio.Task] = None
+    self._last_id: int = 0
+
+    self.stats = {
+      "published": 0,
+      "received": 0,
+      "forwarded": 0,
+      "forward_errors": 0,
+      "dead_workers": 0
+    }
+
+  @property
+  def enabled(self) -> bool:
+    return self.state.shared
+
+  def info(self) -> dict:
+    return {
+      "enabled": self.enabled,
+      "worker_id": self.worker_id,
+      "address": self.address,
+      "state": self.state.info(),
+      **self.stats
+    }
+
+  # --------------------------- Owners
+  async def claim(self, *session_ids: str) -> None:
+    """Record this worker as owner of clients / apps."""
+    if self.enabled:
+      for session_id in session_ids:
+        await self.state.run(self.state.set_owner, session_id, self.worker_id)
+
+  def release(self, *session_ids: str) -> None:
+    if self.enabled and session_ids:
+      self.state.submit(self.state.drop_owners, *session_ids)
+
+  def is_local(self, session_id: str) -> bool:
+    return session_id in self.core.clients or session_id in self.core.app_index
+
+  def _locate(self, session_id: str) -> Optional[str]:
+    owner = self.state.get_owner(session_id)
+    if owner is None or owner == self.worker_id:
+      return None
+    return self.state.get_worker(owner)
+
+  async def locate(self, session_id: str) -> Optional[str]:
+    """Address of the other worker owning a session, None if local or unknown."""
+    if not self.enabled or self.is_local(session_id):
+      return None
+    return await self.state.run(self._locate, session_id)
+
+  # --------------------------- Event bus
+  def publish(self, op: str, **data) -> None:
+    """Send a message to every other worker (see Core.on_cluster_message)."""
+    if not self.enabled:
+      return
+    # In order with the other writes, the caller does not wait for the database
+    self.state.submit(self.state.publish, self.worker_id, get_serializer().dumps({"op": op, **data}))
+    self.stats["published"] += 1
+
+  async def _poll(self) -> None:
+    serializer = get_serializer()
+    while True:
+      try:
+        for message_id, message in await self.state.run(self.state.poll, self.worker_id, self._last_id):
+          self._last_id = message_id
+          self.stats["received"] += 1
+          try:
+            await self.core.on_cluster_message(serializer.loads(message))
+          except Exception as e:
+            logger.warning(f"Cluster message failed: {e}")
+      except Exception as e:
+        logger.exception(f"Cluster poll failed: {e}")
+      await asyncio.sleep(self.config.poll_interval)
+
+  async def _heartbeat(self) -> None:
+    state = self.state
+    while True:
+      await asyncio.sleep(self.config.heartbeat_interval)
+      try:
+        if not await state.run(state.heartbeat, self.worker_id):
+          # Dropped as dead while this worker stalled, register it again
+          logger.warning(f"Worker {self.worker_id} was dropped, registering again")
+          await state.run(state.add_worker, self.worker_id, self.address)
+          await self.claim(*self.core.clients, *self.core.app_index)
+
+        dead = await state.run(state.drop_dead_workers, self.config.worker_timeout)
+        if dead:
+          self.stats["dead_workers"] += len(dead)
+          logger.warning(f"Dropped dead workers and their sessions: {', '.join(dead)}")
+      except Exception as e:
+        logger.exception(f"Cluster heartbeat failed: {e}")
+
+  # --------------------------- Lifecycle
+  async def start(self, app: object) -> None:
+    """Start the internal listener and the bus poller, register this worker."""
+    if not self.enabled:
+      return
+
+    await self._start_server(app)
+    self._http = httpx.AsyncClient(timeout=None)
+    await self.state.run(self.state.add_worker, self.worker_id, self.address)
+
+    self._last_id = await self.state.run(self.state.last_message_id)
+    self._poll_task = asyncio.create_task(self._poll(), name="kikx-cluster-poll")
+    self._heartbeat_task = asyncio.create_task(self._heartbeat(), name="kikx-cluster-heartbeat")
+    logger.info(f"Worker {self.worker_id} joined (internal: {self.address})")
+
+  async def _start_server(self, app: object) -> None:
+    import uvicorn
+
+    connection_config = self.core.config.kikx.connection
+    self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    self._socket.bind(("127.0.0.1", 0))
+    host, port = self._socket.getsockname()
+    self.address = f"{host}:{port}"
+
+    config = uvicorn.Config(
+      app=app,
+      lifespan="off",
+      log_level=self.core.config.kikx.server.log_level,
+      ws_ping_interval=connection_config.ping_interval,
+      ws_ping_timeout=connection_config.ping_timeout,
+      timeout_graceful_shutdown=1
+    )
+    config.load()
+    # Runs inside the worker's loop, the main server handles signals
+    self._server = uvicorn.Server(config)
+    self._server.lifespan = config.lifespan_class(config)
+    await self._server.startup(sockets=[self._socket])
+
+  async def stop(self) -> None:
+    if not self.enabled:
+      return
+
+    for task in (self._poll_task, self._heartbeat_task):
+      if task is None:
+        continue
+      task.cancel()
+      try:
+        await task
+      except asyncio.CancelledError:
+        pass
+    self._poll_task = self._heartbeat_task = None
+
+    # Sessions of this worker are gone with it
+    await self.state.run(self.state.drop_worker, self.worker_id)
+
+    if self._server is not None:
+      await self._server.shutdown(sockets=[self._socket])
+      self._server = None
+    if self._http is not None:
+      await self._http.aclose()
+      self._http = None
+    logger.info(f"Worker {self.worker_id} left")
+
+  # --------------------------- Forwarding
+  async def forward_http(self, scope: dict, receive: callable, send: callable, address: str, body: Optional[bytes] = None) -> None:
+    """Proxy an HTTP request to another worker, streaming both bodies."""
+    path = scope.get("raw_path") or scope["path"].encode()
+    url = f"http://{address}{path.decode('latin-1')}"
+    if scope.get("query_string"):
+      url += "?" + scope["query_string"].decode("latin-1")
+    headers = [(k, v) for k, v in scope["headers"]] + [(WORKER_HEADER.encode(), self.worker_id.encode())]
+
+    async def stream_body():
+      while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+          return
+        yield message.get("body", b"")
+        if not message.get("more_body"):
+          return
+
+    request = self._http.build_request(
+      scope["method"], url, headers=headers,
+      content=body if body is not None else stream_body()
+    )
+    try:
+      response = await self._http.send(request, stream=True)
+    except httpx.RequestError as e:
+      self.stats["forward_errors"] += 1
+      logger.warning(f"Forward to {address} failed: {e}")
+      await send({"type": "http.response.start", "status": 503, "headers": [(b"content-type", b"application/json")]})
+      await send({"type": "http.response.body", "body": b'{"detail":"Session worker unavailable"}'})
+      return
+
+    self.stats["forwarded"] += 1
+    try:
+      await send({"type": "http.response.start", "status": response.status_code, "headers": response.headers.raw})
+      async for chunk in response.aiter_raw():
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+      await send({"type": "http.response.body", "body": b""})
+    finally:
+      await response.aclose()
+
+  async def forward_websocket(self, scope: dict, receive: callable, send: callable, address: str) -> None:
+    """Proxy a websocket to another worker, frames are relayed as is."""
+    await receive()  # websocket.connect
+
+    path = (scope.get("raw_path") or scope["path"].encode()).decode("latin-1")
+    url = f"ws://{address}{path}"
+    if scope.get("query_string"):
+      url += "?" + scope["query_string"].decode("latin-1")
+    headers = [
+      (k.decode("latin-1"), v.decode("latin-1")) for k, v in scope["headers"]
+      if k.decode("latin-1").lower() not in WS_SKIP_HEADERS
+    ] + [(WORKER_HEADER, self.worker_id)]
+
+    try:
+      upstream = await websockets.connect(
+        url,
+        additional_headers=headers,
+        subprotocols=scope.get("subprotocols") or None,
+        # Keepalive is done by each side's own server
+        ping_interval=None,
+        max_size=None,
+        compression=None
+      )
+    except Exception as e:
+      self.stats["forward_errors"] += 1
+      logger.warning(f"Websocket forward to {address} failed: {e}")
+      await send({"type": "websocket.close", "code": 1011, "reason": "Session worker unavailable"})
+      return
+
+    self.stats["forwarded"] += 1
+    await send({"type": "websocket.accept", "subprotocol": upstream.subprotocol})
+
+    async def to_upstream():
+      while True:
+        message = await receive()
+        if message["type"] == "websocket.disconnect":
+          await upstream.close(message.get("code", 1000))
+          return
+        data = message.get("bytes")
+        await upstream.send(data if data is not None else message.get("text", ""))
+
+    async def to_downstream():
+      try:
+        async for data in upstream:
+          if isinstance(data, bytes):
+            await send({"type": "websocket.send", "bytes": data})
+          else:
+            await send({"type": "websocket.send", "text": data})
+      except websockets.ConnectionClosed:
+        pass
+      code = upstream.close_code
+      try:
+        await send({
+          "type": "websocket.close",
+          # Reserved codes can't be sent in a close frame
+          "code": code if code and code not in (1005, 1006, 1015) else 1000,
+          "reason": upstream.close_reason or ""
+        })
+      except Exception:
+        pass  # Browser side already gone
+
+    tasks = [asyncio.create_task(to_upstream()), asyncio.create_task(to_downstream())]
+    try:
+      await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+      for task in tasks:
+        task.cancel()
+      await upstream.close()
+
+
+def get_header(scope: dict, name: str) -> Optional[str]:
+  key = name.encode()
+  for k, v in scope["headers"]:
+    if k == key:
+      return v.decode("latin-1")
+  return None
+
+
+def get_session_id(scope: dict) -> Optional[str]:
+  """Client / app id a request is about, from headers, path or query."""
+  session_id = get_header(scope, "kikx-app-id") or get_header(scope, "kikx-client-id")
+  if session_id:
+    return session_id
+
+  match = APP_PATH.match(scope["path"])
+  if match:
+    return match.group(1)
+
+  query = scope.get("query_string", b"").decode("latin-1")
+  for pair in query.split("&"):
+    key, _, value = pair.partition("=")
+    if key in ("client_id", "app_id") and value:
+      return value
+  return None
+
+
+async def read_body(receive: callable) -> Tuple[bytes, callable]:
+  """Read a whole request body, return it with a receive replaying it."""
+  chunks = []
+  while True:
+    message = await receive()
+    if message["type"] != "http.request":
+      break
+    chunks.append(message.get("body", b""))
+    if not message.get("more_body"):
+      break
+  body = b"".join(chunks)
+
+  replayed = False
+  async def replay() -> dict:
+    nonlocal replayed
+    if not replayed:
+      replayed = True
+      return {"type": "http.request", "body": body, "more_body": False}
+    return await receive()
+  return body, replay
+
+
+class ClusterMiddleware:
+  """Send requests about sessions owned by another worker to that worker."""
+  def __init__(self, app: callable, core: object):
+    self.app = app
+    self.core = core
+
+  async def __call__(self, scope: dict, receive: callable, send: callable) -> None:
+    cluster: Cluster = self.core.cluster
+    if scope["type"] not in ("http", "websocket") or not cluster.enabled or get_header(scope, WORKER_HEADER):
+      return await self.app(scope, receive, send)
+
+    session_id = get_session_id(scope)
+    body = None
+    if session_id is None and scope["type"] == "http" and scope["path"] in BODY_PATHS:
+      body, receive = await read_body(receive)
+      try:
+        data = json.loads(body or b"{}")
+        session_id = data.get("app_id") or data.get("client_id")
+      except (ValueError, AttributeError):
+        pass
+
+    address = await cluster.locate(session_id) if session_id else None
+    if address is None:
+      return await self.app(scope, receive, send)
+
+    if scope["type"] == "websocket":
+      await cluster.forward_websocket(scope, receive, send, address)
+    else:
+      await cluster.forward_http(scope, receive, send, address, body)
@@ -1,10 +1,17 @@
+import time
 import asyncio
 
+from collections import deque
+from itertools import islice
+
 from fastapi import WebSocket
-from typing import Optional, Union, Callable, Any, List
+from typing import Optional, Union, Callable, Any, Deque, Dict, Iterable, List
 
-from lib.utils import send_event, is_websocket_connected
+from lib.utils import is_websocket_connected, get_websocket_protocol, get_protocol_latency
+from lib.serializer import EncodedPayload, get_serializer, get_protocol_serializer
 
+from core.models.kikx_models import ConnectionConfigModel
+from core.dispatcher import Dispatcher
 from core.logging import Logger
 
 
@@ -12,62 +19,557 @@ from core.logging import Logger
 logging = Logger("kikx_connections", "kikx_connections.log")
 logger = logging.get_logger()
 
+# Client event carrying a multiplexed app event {app_id, event, payload}
+CHANNEL_EVENT = "app-channel"
+# Sent by the other side with the last sequence number it handled {seq}
+ACK_EVENT = "ack"
+
 
 class MessageEvent:
-  def __init__(self, event: str, payload: Union[dict, Callable[[], dict]]):
+  def __init__(self, event: str, payload: Union[dict, Callable[[], dict]], seq: int = 0):
     self.event = event
     self.payload = payload
+    self.seq = seq
+    self.size: int = 0
+    self._encoded: Dict[str, Union[str, bytes]] = {}
+
+  def encode(self, serializer: Optional[Any] = None) -> Union[str, bytes]:
+    """Encode the event envelope once per encoding, reused for sending and replay."""
+    serializer = serializer or get_serializer()
+    data = self._encoded.get(serializer.name)
+    if data is None:
+      payload = self.payload() if callable(self.payload) else self.payload
+      # Pre-encoded payloads are spliced in as is
+      body = payload.encode(serializer) if isinstance(payload, EncodedPayload) else serializer.dumps(payload)
+      data = self._encoded[serializer.name] = serializer.join_map([
+        ("event", serializer.dumps(self.event)),
+        ("seq", serializer.dumps(self.seq)),
+        ("payload", body)
+      ])
+    return data
+
+
+class ReplayMessageEvent(MessageEvent):
+  """Single frame carrying a batch of already encoded events."""
+  def __init__(self, messages: List[MessageEvent], since: int, missed: int):
+    super().__init__("replay", None, messages[-1].seq if messages else since)
+    self.messages = messages
+    self.since = since
+    self.missed = missed
+
+  def encode(self, serializer: Optional[Any] = None) -> Union[str, bytes]:
+    serializer = serializer or get_serializer()
+    payload = serializer.join_map([
+      ("since", serializer.dumps(self.since)),
+      ("missed", serializer.dumps(self.missed)),
+      ("events", serializer.join_array([m.encode(serializer) for m in self.messages]))
+    ])
+    return serializer.join_map([("event", serializer.dumps(self.event)), ("payload", payload)])
+
+
+class ReplayBuffer:
+  """Ring of recent events bounded by message count and encoded bytes."""
+  def __init__(self, max_messages: int, max_bytes: int):
+    self.max_messages = max_messages
+    self.max_bytes = max_bytes
+    self.bytes: int = 0
+    self.evicted: int = 0
+    self._events: Deque[MessageEvent] = deque()
+
+  def __len__(self) -> int:
+    return len(self._events)
+
+  @property
+  def first_seq(self) -> Optional[int]:
+    return self._events[0].seq if self._events else None
+
+  def append(self, message: MessageEvent, size: int) -> None:
+    message.size = size
+    self._events.append(message)
+    self.bytes += size
+
+    while self._events and (len(self._events) > self.max_messages or self.bytes > self.max_bytes):
+      self.bytes -= self._events.popleft().size
+      self.evicted += 1
+
+  def trim(self, seq: int) -> int:
+    """Drop events up to seq (acknowledged by the other side), returns how many."""
+    trimmed = 0
+    while self._events and self._events[0].seq <= seq:
+      self.bytes -= self._events.popleft().size
+      trimmed += 1
+    return trimmed
+
+  def since(self, seq: int) -> List[MessageEvent]:
+    """Return buffered events with sequence number greater than seq."""
+    if not self._events:
+      return []
+    # Sequence numbers in the buffer are contiguous
+    start = seq - self._events[0].seq + 1
+    if start <= 0:
+      return list(self._events)
+    return list(islice(self._events, start, None))
+
+  def info(self) -> dict:
+    return {
+      "size": len(self._events),
+      "bytes": self.bytes,
+      "first_seq": self.first_seq,
+      "evicted": self.evicted
+    }
 
 
 class Connection:
-  def __init__(self) -> None:
-    self.timeout: float = 10 * 60  # 10 minutes in seconds
+  def __init__(self, config: Optional[ConnectionConfigModel] = None) -> None:
+    self.config: ConnectionConfigModel = config or ConnectionConfigModel()
+    self.timeout: float = self.config.timeout  # 10 minutes by default
     self.websocket: Optional[WebSocket] = None
-    self.tracking: List[MessageEvent] = []
+    # Monotonic time since when no websocket is bound (starts at creation)
+    self.disconnected_at: Optional[float] = time.monotonic()
+    # Negotiated subprotocol, None is plain JSON
+    self.protocol: Optional[str] = None
+    # Liveness - last inbound message or keepalive pong, last ping round trip
+    self.last_seen: float = time.monotonic()
+    self.latency: Optional[float] = None
+    self._transport_protocol: Optional[object] = None
+    self._failed_websocket: Optional[WebSocket] = None
+    # Brought back by load_state, its first websocket resumes a session
+    self.restored: bool = False
+
+    # Every event gets a sequence number, recent ones are kept for resume
+    self.seq: int = 0
+    self.sent_seq: int = 0
+    # Last sequence the other side confirmed, older events are not kept
+    self.acked_seq: int = 0
+    self.replay = ReplayBuffer(self.config.replay_max_messages, self.config.replay_max_bytes)
+
+    # Outbound queue drained by the writer task
+    # bound is enforced in _enqueue so replayed messages are never dropped
+    self._queue: asyncio.Queue = asyncio.Queue()
+    self._writer_task: Optional[asyncio.Task] = None
+    # Overflow close ("close" policy), kept until done
+    self._close_task: Optional[asyncio.Task] = None
+    # Cleared above high_water, set again below low_water (producer backpressure)
+    self._writable = asyncio.Event()
+    self._writable.set()
+    # Inbound dispatcher of the current receive loop
+    self.dispatcher: Optional[Dispatcher] = None
+
+    self._stats = {
+      "sent": 0,
+      "dropped": 0,
+      "peak": 0,
+      "overflows": 0,
+      "throttled": 0,
+      "send_errors": 0,
+      # Frame sizes, characters for text frames
+      "received": 0,
+      "bytes_in": 0,
+      "bytes_out": 0
+    }
 
   @property
   def is_connected(self) -> bool:
-    return is_websocket_connected(self.websocket)
+    # A websocket a send failed on is done even before its receive loop notices
+    return is_websocket_connected(self.websocket) and self.websocket is not self._failed_websocket
+
+  @property
+  def is_new(self) -> bool:
+    """True until a first websocket is bound, a restored session never is."""
+    return self.websocket is None and not self.restored
+
+  @property
+  def idle_for(self) -> float:
+    """Seconds without a connected websocket, 0 while connected."""
+    if self.is_connected:
+      return 0
+    if self.disconnected_at is None:
+      # Dropped without going through mark_disconnected
+      self.disconnected_at = time.monotonic()
+    return time.monotonic() - self.disconnected_at
+
+  @property
+  def is_expired(self) -> bool:
+    """True once disconnected for longer than timeout."""
+    return self.idle_for > self.timeout
+
+  @property
+  def is_stale(self) -> bool:
+    """True if connected but nothing (not even a keepalive pong) was heard for a full ping cycle."""
+    if not self.is_connected or self.config.ping_interval is None:
+      return False
+    self.sample_latency()
+    return time.monotonic() - self.last_seen > self.config.ping_interval + (self.config.ping_timeout or 0)
+
+  @property
+  def serializer(self):
+    return get_protocol_serializer(self.protocol)
+
+  def touch(self, size: int = 0) -> None:
+    """Record activity from the other side, size of a received message if any."""
+    self.last_seen = time.monotonic()
+    if size:
+      self._stats["received"] += 1
+      self._stats["bytes_in"] += size
+
+  def usage(self) -> dict:
+    """Traffic and backlog, for per-session accounting."""
+    return {
+      "bytes_in": self._stats["bytes_in"],
+      "bytes_out": self._stats["bytes_out"],
+      "queued": self.queue_size
+    }
+
+  def sample_latency(self) -> Optional[float]:
+    """Read the keepalive round trip from the websocket, a new value means a pong arrived."""
+    latency = get_protocol_latency(self._transport_protocol) if self.is_connected else None
+    if latency is not None and latency != self.latency:
+      self.latency = latency
+      self.touch()
+    return self.latency
+
+  @property
+  def queue_size(self) -> int:
+    return self._queue.qsize()
+
+  @property
+  def is_slow(self) -> bool:
+    """True while the queue is above the high-water mark."""
+    return self.queue_size >= self.config.high_water
+
+  async def wait_writable(self) -> None:
+    """
+    Wait while the outbound queue is above high_water, until it drains
+    below low_water. Producers await this to slow down to the consumer.
+    """
+    await self._writable.wait()
+
+  @property
+  def tracking(self) -> List[MessageEvent]:
+    """Buffered events not yet handed to a websocket."""
+    return self.replay.since(self.sent_seq)
+
+  def ack(self, seq: int) -> None:
+    """The other side handled every event up to seq, they are never needed for a resume again."""
+    # Can't acknowledge what was not sent (stale or bogus ack)
+    seq = min(seq, self.sent_seq)
+    if seq > self.acked_seq:
+      self.acked_seq = seq
+      self.replay.trim(seq)
 
   def info(self):
+    latency = self.sample_latency()
     return {
-      "connected": self.is_connected
+      "connected": self.is_connected,
+      "protocol": self.protocol,
+      "idle_for": round(self.idle_for, 1),
+      "latency_ms": round(latency * 1000, 1) if latency is not None else None,
+      "last_seen": round(time.monotonic() - self.last_seen, 1),
+      "seq": self.seq,
+      "sent_seq": self.sent_seq,
+      "acked_seq": self.acked_seq,
+      "tracking": len(self.tracking),
+      "replay": self.replay.info(),
+      "queue": {
+        "size": self.queue_size,
+        "max_size": self.config.queue_size,
+        "high_water": self.config.high_water,
+        "slow": self.is_slow,
+        **self._stats
+      },
+      "dispatch": self.dispatcher.info() if self.dispatcher else None
     }
 
-  async def connect(self, websocket: WebSocket) -> None:
+  def dump_state(self) -> dict:
+    """Sequence numbers and buffered events, for a warm restart."""
+    serializer = get_serializer()
+    return {
+      "seq": self.seq,
+      "sent_seq": self.sent_seq,
+      # Envelopes decoded back, callables and pre-encoded payloads resolved
+      "events": [serializer.loads(message.encode(serializer)) for message in self.replay.since(0)]
+    }
+
+  def load_state(self, state: dict) -> None:
+    """Restore what dump_state() returned, on a connection with no events yet."""
+    for event in state.get("events", []):
+      message = MessageEvent(event["event"], event.get("payload"), event["seq"])
+      self.replay.append(message, len(message.encode(self.serializer)))
+    self.seq = state.get("seq", 0)
+    self.sent_seq = min(state.get("sent_seq", 0), self.seq)
+    self.restored = True
+
+  async def connect(self, websocket: WebSocket, last_seq: Optional[int] = None, protocol: Optional[str] = None) -> None:
+    """
+    Bind a websocket and resend what the other side missed.
+    With last_seq the missing tail is sent in a single 'replay' frame,
+    without it only events never handed to a websocket are resent.
+    protocol is the subprotocol the websocket was accepted with.
+    """
     if not isinstance(websocket, WebSocket):
       raise TypeError("Internal Error: Invalid websocket type")
 
     if self.websocket is None:
       logger.info("New websocket connection established.")
-      self.websocket = websocket
-
     elif not self.is_connected:
       logger.info("Reconnecting websocket and resending tracked messages.")
-      self.websocket = websocket
-      for message in self.tracking:
-        await self._send_message(message)
+    elif self.is_stale:
+      # Peer went away without the keepalive noticing yet, the new socket wins
+      logger.info("Replacing stale websocket connection.")
+      await self.close(code=1001, reason="Replaced by a new connection")
     else:
       logger.warning("Attempt to connect while websocket is already active.")
       raise ConnectionError("WebSocket is already connected")
 
-    self.tracking.clear()
+    self.websocket = websocket
+    self.protocol = protocol
+    self.disconnected_at = None
+    self.latency = None
+    self._transport_protocol = get_websocket_protocol(websocket)
+    self.touch()
+    # Anything left in the queue is still in the replay buffer
+    self._clear_queue()
+
+    if last_seq is None:
+      for message in self.tracking:
+        self._queue.put_nowait(message)
+    else:
+      self._queue_replay(last_seq)
+
+    self._start_writer()
 
-  async def _send_message(self, message: MessageEvent) -> None:
-    await send_event(self.websocket, message.event, message.payload)
+  def _queue_replay(self, last_seq: int) -> None:
+    # Sequence from another incarnation of this connection, resend all
+    if last_seq > self.seq or last_seq < 0:
+      last_seq = 0
+
+    messages = self.replay.since(last_seq)
+    first_seq = messages[0].seq if messages else self.seq + 1
+    missed = max(0, first_seq - last_seq - 1)
+
+    if missed:
+      logger.warning(f"Replay gap: {missed} events evicted before resume")
+    if messages or missed:
+      self._queue.put_nowait(ReplayMessageEvent(messages, last_seq, missed))
+
+  def _start_writer(self) -> None:
+    if self._writer_task is None or self._writer_task.done():
+      self._writer_task = asyncio.create_task(self._writer(), name="kikx-connection-writer")
+
+  async def _writer(self) -> None:
+    """Drain the outbound queue, one message at a time, while connected."""
+    while True:
+      message = await self._queue.get()
+      if not self._writable.is_set() and self.queue_size <= self.config.low_water:
+        self._writable.set()
+
+      if not self.is_connected:
+        # Still in the replay buffer, resent on reconnect
+        self._clear_queue()
+        continue
+
+      # The websocket this message goes out on, a reconnect may rebind meanwhile
+      websocket = self.websocket
+      try:
+        await self._send_message(message, websocket)
+        self.sent_seq = max(self.sent_seq, message.seq)
+        self._stats["sent"] += 1
+      except Exception as e:
+        self._stats["send_errors"] += 1
+        if websocket is not self.websocket:
+          # Failed on a replaced websocket, the queue belongs to the new one
+          logger.info(f"Send failed on a replaced websocket: {e}")
+          continue
+        # The message (and what is queued after it) is still in the replay
+        # buffer, dropping the websocket makes the other side reconnect and resume
+        logger.warning(f"Connection send failed, closing: {e}")
+        self._clear_queue()
+        self._failed_websocket = websocket
+        self.mark_disconnected(websocket)
+        await self._close_websocket(websocket, 1011, "Send failed")
+
+  @staticmethod
+  def _on_close_done(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+      logger.warning(f"Connection close failed: {task.exception()}")
+
+  def _clear_queue(self) -> None:
+    while not self._queue.empty():
+      self._queue.get_nowait()
+    self._writable.set()
+
+  def _enqueue(self, message: MessageEvent) -> None:
+    if self.queue_size >= self.config.queue_size:
+      self._stats["overflows"] += 1
+      policy = self.config.overflow
+
+      if policy == "drop_newest":
+        self._stats["dropped"] += 1
+        return
+      elif policy == "drop_oldest":
+        self._queue.get_nowait()
+        self._stats["dropped"] += 1
+      else:  # close - consumer is hopeless, it resumes from the replay buffer
+        logger.warning("Outbound queue full, closing slow connection.")
+        self._clear_queue()
+        if self._close_task is None or self._close_task.done():
+          self._close_task = asyncio.create_task(
+            self._close_websocket(self.websocket, 1013, "Outbound queue overflow"), name="kikx-connection-close"
+          )
+          self._close_task.add_done_callback(self._on_close_done)
+        return
+
+    self._queue.put_nowait(message)
+    if self.queue_size > self._stats["peak"]:
+      self._stats["peak"] = self.queue_size
+
+    if self._writable.is_set() and self.is_slow:
+      self._writable.clear()
+      self._stats["throttled"] += 1
+
+  async def _send_message(self, message: MessageEvent, websocket: WebSocket) -> None:
+    data = message.encode(self.serializer)
+    if isinstance(data, bytes):
+      await websocket.send_bytes(data)
+    else:
+      await websocket.send_text(data)
+    self._stats["bytes_out"] += len(data)
 
   async def send_event(self, event: str, payload: Union[dict, Callable[[], dict]]) -> None:
-    message = MessageEvent(event, payload)
+    self.seq += 1
+    message = MessageEvent(event, payload, self.seq)
+    self.replay.append(message, len(message.encode(self.serializer)))
+
     if not self.is_connected:
       logger.debug(f"WebSocket not connected. Tracking message: {event}")
-      self.tracking.append(message)
     else:
-      await self._send_message(message)
-  
+      self._enqueue(message)
+
+  def mark_disconnected(self, websocket: Optional[WebSocket] = None) -> None:
+    """Called when the websocket receive loop ends (ignored for a replaced websocket)."""
+    if websocket is not None and websocket is not self.websocket:
+      return
+    if self.disconnected_at is None:
+      self.disconnected_at = time.monotonic()
+
   async def close(self, code=1000, reason=None):
     if not self.is_connected:
       return
+    await self._close_websocket(self.websocket, code, reason)
+
+  @staticmethod
+  async def _close_websocket(websocket: WebSocket, code: int, reason: Optional[str]) -> None:
     try:
-      await self.websocket.close(code=code, reason=reason)
+      await websocket.close(code=code, reason=reason)
     except Exception:
       pass
+
+  async def stop(self) -> None:
+    """Stop the writer task and pending handlers, called when the owner (client / app) is closed."""
+    # Never leave producers waiting on a dead connection
+    self._writable.set()
+    if self.dispatcher is not None:
+      await self.dispatcher.close()
+      self.dispatcher = None
+
+    if self._writer_task is None:
+      return
+
+    self._writer_task.cancel()
+    try:
+      await self._writer_task
+    except asyncio.CancelledError:
+      pass
+    self._writer_task = None
+
+
+class ChannelPayload(EncodedPayload):
+  """
+  CHANNEL_EVENT payload {app_id, event, payload}, an already encoded app
+  payload (broadcast) is spliced in as is instead of encoded again per app.
+  """
+  def __init__(self, channel_id: str, event: str, payload: Any):
+    super().__init__({"app_id": channel_id, "event": event, "payload": payload})
+
+  def encode(self, serializer: Any) -> Union[str, bytes]:
+    data = self._encoded.get(serializer.name)
+    if data is None:
+      payload = self.payload["payload"]
+      data = self._encoded[serializer.name] = serializer.join_map([
+        ("app_id", serializer.dumps(self.payload["app_id"])),
+        ("event", serializer.dumps(self.payload["event"])),
+        ("payload", payload.encode(serializer) if isinstance(payload, EncodedPayload) else serializer.dumps(payload))
+      ])
+    return data
+
+
+class ChannelConnection(Connection):
+  """
+  App channel multiplexed over its client's connection.
+  Events are wrapped in a CHANNEL_EVENT tagged with the app id,
+  sequencing, replay and liveness are the parent connection's.
+  """
+  def __init__(self, parent: Connection, channel_id: str) -> None:
+    super().__init__(parent.config)
+    self.parent = parent
+    self.channel_id = channel_id
+
+  @property
+  def is_connected(self) -> bool:
+    return self.parent.is_connected
+
+  @property
+  def idle_for(self) -> float:
+    return self.parent.idle_for
+
+  @property
+  def protocol(self) -> Optional[str]:
+    return self.parent.protocol
+
+  @protocol.setter
+  def protocol(self, value: Optional[str]) -> None:
+    pass  # Negotiated by the parent
+
+  @property
+  def tracking(self) -> List[MessageEvent]:
+    return []
+
+  def info(self):
+    return {
+      "connected": self.is_connected,
+      "channel": self.channel_id,
+      "idle_for": round(self.idle_for, 1),
+      "latency_ms": self.parent.info()["latency_ms"],
+      "seq": self.seq
+    }
+
+  async def connect(self, websocket: WebSocket, last_seq: Optional[int] = None, protocol: Optional[str] = None) -> None:
+    raise ConnectionError("Multiplexed channel has no websocket of its own")
+
+  async def send_event(self, event: str, payload: Union[dict, Callable[[], dict]]) -> None:
+    self.seq += 1
+    await self.parent.send_event(CHANNEL_EVENT, ChannelPayload(
+      self.channel_id, event, payload() if callable(payload) else payload
+    ))
+
+  async def wait_writable(self) -> None:
+    await self.parent.wait_writable()
+
+  def mark_disconnected(self, websocket: Optional[WebSocket] = None) -> None:
+    pass
+
+  async def close(self, code=1000, reason=None):
+    pass  # Never closes the shared websocket
+
+  async def stop(self) -> None:
+    pass
+
+
+async def broadcast_event(connections: Iterable[Connection], event: str, payload: Any) -> None:
+  """Send one event to many connections, serializing the payload only once."""
+  encoded = payload if isinstance(payload, EncodedPayload) else EncodedPayload(payload)
+  for connection in connections:
+    try:
+      await connection.send_event(event, encoded)
+    except Exception as e:
+      logger.warning(f"Broadcast of {event} failed for a connection: {e}")
@@ -1,5 +1,5 @@
+import os
 import sys
-import asyncio
 import subprocess
 from typing import Dict, Optional, Tuple, Union
 
@@ -9,10 +9,21 @@ from core.config import Config
 from core.services import Services
 from core.console import Console
 from core.user import User
+from core.catalog import AppCatalog
+from core.reaper import Reaper
+from core.snapshot import SessionSnapshot
+from core.state import create_state_backend
+from core.cluster import Cluster
+from core.limits import limits
+from core.pubsub import PubSub
+from core.apps.registry import module_registry
+from core.connection import CHANNEL_EVENT, ACK_EVENT, broadcast_event
+from core.func.func import FUNCX_EVENT, FUNCX_CANCEL_EVENT, FUNCX_RESULT_EVENT
 
 from core.setup import pre_check_apps
 
 from lib.event import Events
+from lib.serializer import set_serializer
 from core import __version__, __author__
 
 
@@ -21,6 +32,9 @@ from core.logging import Logger
 logging = Logger("kikx_core", "kikx_core.log")
 logger = logging.get_logger()
 
+# Set by main.run_server in the environment of worker processes
+WORKER_ENV = "KIKX_WORKER"
+
 # -------------------------------------
 # Core API
 # -------------------------------------
@@ -29,32 +43,35 @@ logger = logging.get_logger()
 class Core:
   def __init__(self, storage_path: str, dev_mode: bool = False):
     """Initialize the core system: config, plugins, services, auth, users, etc."""
+    # Worker of a multi-worker server, boot / shutdown work is done by the main process
+    self.is_worker = os.environ.get(WORKER_ENV) == "1"
     # Dev mode
-    self._dev_mode = dev_mode
+    self._dev_mode = dev_mode and not self.is_worker
 
     # Load configuration
     self.config = Config(storage_path)
+    set_serializer(self.config.kikx.connection.serializer)
 
     # Run boot script if it exists
-    boot_file = self.config.resolve_path("storage://etc/boot.sh")
-    if boot_file.exists() and not boot_file.is_dir():
-      subprocess.Popen(
-        f"chmod +x {boot_file} && {boot_file}",
-        shell=True,
-        stdout=sys.stdout,
-        stdin=sys.stdin,
-        stderr=sys.stderr
-      ).wait()
+    if not self.is_worker:
+      self.run_script("boot.sh")
+
+    # Tokens, session owners and cross-worker events
+    self.state = create_state_backend(self.config.kikx.state, self.config.resolve_path)
 
     # Initialize subsystems
     self.services = Services(self.config.resolve_path("storage://config/services.json"))
-    self.auth = Auth(self.config.resolve_path("storage://config/auth.json"))
+    self.auth = Auth(self.config.resolve_path("storage://config/auth.json"), self.state)
+
+    # Installed apps, parsed manifests / configs cached until changed
+    self.catalog = AppCatalog(self.config.apps_path, self.config.apps_data_path)
 
     self.user = User(
       self.auth.user_config,
       self.config.resolve_path("data://"),
       self.config.resolve_path("home://"),
-      self.config.resolve_path("storage://")
+      self.config.resolve_path("storage://"),
+      self.catalog
     )
 
     self.clients: Dict[str, Client] = {}
@@ -62,6 +79,21 @@ class Core:
     
     self.events = Events()
     self.scr = Console()
+
+    # Topic subscriptions of clients / apps (signals)
+    self.pubsub = PubSub()
+
+    # Client / app / task caps
+    limits.configure(self.config.kikx.limits)
+
+    # Closes clients / apps left disconnected past connection.timeout
+    self.reaper = Reaper(self, self.config.kikx.reaper)
+
+    # Other workers' sessions / events (multi-worker only)
+    self.cluster = Cluster(self, self.state, self.config.kikx.state)
+
+    # Sessions saved on shutdown, restored on startup (warm restart)
+    self.snapshot = SessionSnapshot(self, self.config.kikx.snapshot)
   
   @property
   def version(self):
@@ -79,6 +111,23 @@ class Core:
     """Return a client by ID."""
     return self.clients.get(client_id)
 
+  async def add_client(self, client: Client) -> None:
+    """Register a new (or restored) client on this worker."""
+    self.clients[client.id] = client
+    await self.cluster.claim(client.id)
+
+  def run_script(self, name: str) -> None:
+    """Run storage://etc/<name> (boot.sh, shutdown.sh) if it exists."""
+    script = self.config.resolve_path(f"storage://etc/{name}")
+    if script.exists() and not script.is_dir():
+      subprocess.Popen(
+        f"chmod +x {script} && {script}",
+        shell=True,
+        stdout=sys.stdout,
+        stdin=sys.stdin,
+        stderr=sys.stderr
+      ).wait()
+
   def get_ui_config(self, name: str):
     try:
       return self.config.kikx.ui[name]
@@ -102,17 +151,27 @@ class Core:
     return (client, app) if app else (None, None)
   
   # --------------------------- Apps
-  async def open_app(self, client_id: str, name: str, manifest, sudo) -> object:
+  async def open_app(self, client_id: str, name: str, manifest, sudo, app_id: Optional[str] = None, connection_state: Optional[dict] = None) -> object:
     """
     Open an app for a given client.
     Raises an error if the client does not exist.
+    app_id and connection_state are given when restoring a session.
     """
     client = self.clients.get(client_id)
     if client is None:
       raise Exception("client not found")
 
-    app = client.open_app(name, manifest, sudo)
+    limits.check_apps(len(client.running_apps), len(self.app_index))
+    app = client.open_app(name, manifest, sudo, app_id)
+    if connection_state is not None:
+      # Before anything is sent on the new connection
+      app.connection.load_state(connection_state)
     self.app_index[app.id] = client.id
+    await self.cluster.claim(app.id)
+
+    # Signals declared in app.json
+    for topic in app.config.signals:
+      self.pubsub.subscribe(app, topic)
     
     await self.events.emit_async("app:open", app.id)
 
@@ -122,8 +181,10 @@ class Core:
     """
     Close an app and remove it from the app index.
     """
+    self.pubsub.unsubscribe(app)
     await client.close_app(app)
     del self.app_index[app.id]
+    self.cluster.release(app.id)
     
     await self.events.emit_async("app:close", app.id)
 
@@ -132,12 +193,44 @@ class Core:
     event = data.get("event")
     if event == "ping":
       await app.connection.send_event("pong", data.get("payload", {}))
+    elif event == ACK_EVENT:
+      seq = (data.get("payload") or {}).get("seq")
+      if isinstance(seq, int):
+        app.connection.ack(seq)
+    elif event == FUNCX_EVENT:
+      payload = data.get("payload") or {}
+      if not app.config.system.check("funcx"):
+        await app.send_event(FUNCX_RESULT_EVENT, {"id": payload.get("id"), "error": "Permission denied", "status": 403})
+        return
+      await app.run_funcx_request(payload, self.config.kikx.connection.funcx_limit)
+    elif event == FUNCX_CANCEL_EVENT:
+      await app.cancel_funcx_request((data.get("payload") or {}).get("id"))
 
   async def on_client_data(self, client: object, data: dict) -> None:
     """Handle data received from the client (placeholder)."""
     event = data.get("event")
     if event == "ping":
       await client.connection.send_event("pong", {})
+    elif event == ACK_EVENT:
+      seq = (data.get("payload") or {}).get("seq")
+      if isinstance(seq, int):
+        client.connection.ack(seq)
+    elif event == FUNCX_EVENT:
+      await client.run_funcx_request(data.get("payload") or {}, self.config.kikx.connection.funcx_limit)
+    elif event == FUNCX_CANCEL_EVENT:
+      await client.cancel_funcx_request((data.get("payload") or {}).get("id"))
+    elif event == "app:attach":
+      payload = data.get("payload") or {}
+      await client.attach_app(payload.get("app_id"))
+    elif event == CHANNEL_EVENT:
+      # App data multiplexed over the client websocket
+      payload = data.get("payload") or {}
+      app = client.running_apps.get(payload.get("app_id"))
+      if app is not None and app.multiplexed:
+        await self.on_app_data(client, app, {
+          "event": payload.get("event"),
+          "payload": payload.get("payload", {})
+        })
 
   async def on_app_disconnect(self, client: Client, app: object) -> None:
     """Handle app disconnect event (placeholder)."""
@@ -147,8 +240,11 @@ class Core:
   async def on_client_disconnect(self, client: Client) -> None:
     """Handle client disconnection and clean up resources."""
     # Close all running_apps & remove
-    for app_id in list(client.running_apps.keys()):
+    for app_id, app in list(client.running_apps.items()):
       self.app_index.pop(app_id, None)
+      self.pubsub.unsubscribe(app)
+    self.pubsub.unsubscribe(client)
+    self.cluster.release(client.id, *client.running_apps)
 
     # closs on client
     await client.on_close()
@@ -160,37 +256,60 @@ class Core:
   # On startup / load services, plugins
   async def on_start(self, app) -> None:
     await self.services.load(self, app)
+    # App module classes, re-imported on change in dev mode
+    # Set here as main.run_server turns dev mode off after __init__
+    module_registry.reload = self.is_dev_mode
+    module_registry.preload()
 
     # precheck built in apps
-    if not self.is_dev_mode:
+    if not self.is_dev_mode and not self.is_worker:
       await pre_check_apps(self)
 
+    # Internal listener / event bus, before sessions are restored
+    await self.cluster.start(app)
+
+    # Open tabs reconnect to their previous sessions
+    try:
+      await self.snapshot.restore()
+    except Exception as e:
+      logger.exception(f"Failed to restore sessions: {e}")
+
+    self.reaper.start()
+
     await self.events.emit_order("kikx:start", self)
 
   # On shutdown /
   async def on_close(self) -> None:
+    await self.reaper.stop()
+
+    try:
+      self.snapshot.save()
+    except Exception as e:
+      logger.exception(f"Failed to save sessions: {e}")
+
     for client in list(self.clients.values()):
       await self.on_client_disconnect(client)
 
+    await self.cluster.stop()
+    self.state.close()
+
     await self.services.on_close(self)
     await self.user.on_close(self)
 
-    shutdown_file = self.config.resolve_path("storage://etc/shutdown.sh")
-    if shutdown_file.exists() and not shutdown_file.is_dir():
-      subprocess.Popen(
-        f"chmod +x {shutdown_file} && {shutdown_file}",
-        shell=True,
-        stdout=sys.stdout,
-        stdin=sys.stdin,
-        stderr=sys.stderr
-      ).wait()
+    if not self.is_worker:
+      self.run_script("shutdown.sh")
     
     await self.events.emit_order("kikx:close", self)
 
   # Force close client connection
   async def close_client(self, client: str):
-    client = self.clients.get(client)
+    client_id = client
+    client = self.clients.get(client_id)
     if not client:
+      # Owned by another worker
+      if await self.cluster.locate(client_id):
+        self.cluster.publish("close", client_id=client_id)
+        return True
       raise Exception("Session not found")
 
     # close all apps and remove client
@@ -200,25 +319,55 @@ class Core:
 
     return True
   
-  # Broadcast event to clients
-  async def broadcast_to_clients(self, event, payload):
-    await asyncio.gather(
-      *(client.send_event(event, payload) for client in self.clients.values()),
-      return_exceptions=True
+  # Publish a signal to clients / apps subscribed to it
+  # returns subscribers reached on this worker, other workers deliver their own
+  async def publish_signal(self, signal: str, data: dict, local: bool = False) -> int:
+    if not local:
+      self.cluster.publish("signal", signal=signal, data=data)
+    return await self.pubsub.publish(signal, "signal", { "signal": signal, "data": data })
+
+  # Broadcast event to clients - payload is encoded once
+  async def broadcast_to_clients(self, event, payload, local: bool = False):
+    if not local:
+      self.cluster.publish("clients", event=event, payload=payload)
+    await broadcast_event(
+      [client.connection for client in self.clients.values()], event, payload
     )
 
   # Broadcast event to apps / client - apps
-  async def broadcast_to_apps(self, event, payload, client_id = None):
+  async def broadcast_to_apps(self, event, payload, client_id = None, local: bool = False):
     if client_id is None:
-      await asyncio.gather(
-        *(client.broadcast_to_apps(event, payload) for client in self.clients.values()),
-        return_exceptions=True
+      if not local:
+        self.cluster.publish("apps", event=event, payload=payload)
+      await broadcast_event(
+        [app.connection for client in self.clients.values() for app in client.running_apps.values()],
+        event, payload
       )
       return None
 
     client = self.get_client(client_id)
     if client is None:
+      # Owned by another worker
+      if not local and await self.cluster.locate(client_id):
+        self.cluster.publish("apps", event=event, payload=payload, client_id=client_id)
+        return None
       raise Exception("Client not found")
     
     await client.broadcast_to_apps(event, payload)
 
+  # Message published by another worker - delivered to this worker's sessions only
+  async def on_cluster_message(self, message: dict) -> None:
+    op = message.get("op")
+    if op == "clients":
+      await self.broadcast_to_clients(message["event"], message["payload"], local=True)
+    elif op == "apps":
+      client_id = message.get("client_id")
+      if client_id is None or client_id in self.clients:
+        await self.broadcast_to_apps(message["event"], message["payload"], client_id, local=True)
+    elif op == "signal":
+      await self.publish_signal(message["signal"], message["data"], local=True)
+    elif op == "close":
+      client = self.clients.get(message["client_id"])
+      if client is not None:
+        await self.close_client(client.id)
+
@@ -0,0 +1,99 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Union
+
+from core.logging import Logger
+
+
+logging = Logger("kikx_dispatcher", "kikx_dispatcher.log")
+logger = logging.get_logger()
+
+
+class Dispatcher:
+  """
+  Runs handlers for inbound websocket messages concurrently, up to limit.
+
+  submit() waits for a free slot, so the receive loop stops reading while
+  the limit is reached (backpressure). Messages carrying the same "key"
+  are handled one after another in arrival order, others run in parallel.
+  """
+  def __init__(self, handler: Callable[[Any], Awaitable[None]], limit: int = 16):
+    self.handler = handler
+    self.limit = limit
+
+    self._semaphore = asyncio.Semaphore(limit)
+    self._tasks: Set[asyncio.Task] = set()
+    # Last task per ordering key
+    self._keys: Dict[str, asyncio.Task] = {}
+
+    self.stats = {
+      "dispatched": 0,
+      "failed": 0,
+      "paused": 0
+    }
+
+  @property
+  def in_flight(self) -> int:
+    return len(self._tasks)
+
+  def info(self) -> dict:
+    return {
+      "limit": self.limit,
+      "in_flight": self.in_flight,
+      **self.stats
+    }
+
+  @staticmethod
+  def get_key(data: Any) -> Optional[Union[str, int]]:
+    """Ordering key of a message, anything but a str / int (unhashable, ...) is ignored."""
+    key = data.get("key") if isinstance(data, dict) else None
+    if isinstance(key, (str, int)) and not isinstance(key, bool):
+      return key
+    return None
+
+  async def submit(self, data: Any) -> None:
+    """Schedule handler(data), waiting while the limit is reached."""
+    if self._semaphore.locked():
+      self.stats["paused"] += 1
+    await self._semaphore.acquire()
+
+    try:
+      key = self.get_key(data)
+      previous = self._keys.get(key) if key is not None else None
+
+      task = asyncio.create_task(self._run(data, previous))
+    except BaseException:
+      # Never leak a slot, the receive loop would block for good once all are gone
+      self._semaphore.release()
+      raise
+
+    self._tasks.add(task)
+    task.add_done_callback(lambda t: self._on_done(t, key))
+    if key is not None:
+      self._keys[key] = task
+
+    self.stats["dispatched"] += 1
+
+  async def _run(self, data: Any, previous: Optional[asyncio.Task]) -> None:
+    try:
+      if previous is not None:
+        # Only wait for completion, its result / error is not ours
+        await asyncio.wait({previous})
+      await self.handler(data)
+    except Exception as e:
+      self.stats["failed"] += 1
+      logger.exception(f"Error handling websocket message: {e}")
+    finally:
+      self._semaphore.release()
+
+  def _on_done(self, task: asyncio.Task, key: Optional[str]) -> None:
+    self._tasks.discard(task)
+    if key is not None and self._keys.get(key) is task:
+      del self._keys[key]
+
+  async def close(self) -> None:
+    """Cancel handlers still running (except the caller, if it is one)."""
+    tasks = [task for task in self._tasks if task is not asyncio.current_task()]
+    for task in tasks:
+      task.cancel()
+    if tasks:
+      await asyncio.gather(*tasks, return_exceptions=True)
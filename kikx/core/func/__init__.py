@@ -1,2 +1,3 @@
-from .func import FuncX, funcx, funcx_handler
-from .handlers import Handler
\ No newline at end of file
+from .func import FuncX, funcx, funcx_handler, funcx_functions, describe_funcx
+from .handlers import Handler
+from .cache import funcx_cache_info
\ No newline at end of file
@@ -0,0 +1,115 @@
+import json
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Union
+
+from .models import FuncXCacheConfig
+
+
+class FuncXCache:
+  """
+  Memoized results of one funcx method (see funcx(cache=...)).
+
+  Results are keyed on the call arguments, kept for ttl seconds (0 = until
+  invalidated) and evicted least recently used past max_entries. With the
+  "instance" scope every bound object has its own entries, dropped with it.
+  Failed calls are not cached.
+  """
+  def __init__(self, name: str, config: FuncXCacheConfig):
+    self.name = name
+    self.config: FuncXCacheConfig = config
+
+    self._shared: "OrderedDict[Hashable, Tuple[Optional[float], Any]]" = OrderedDict()
+    self._instances: "weakref.WeakKeyDictionary[object, OrderedDict]" = weakref.WeakKeyDictionary()
+
+    self.hits: int = 0
+    self.misses: int = 0
+
+  def _entries(self, instance: object, create: bool = True) -> Optional[OrderedDict]:
+    if self.config.scope == "class":
+      return self._shared
+    entries = self._instances.get(instance)
+    if entries is None and create:
+      entries = self._instances[instance] = OrderedDict()
+    return entries
+
+  def make_key(self, args: tuple, kwargs: dict) -> Hashable:
+    if self.config.key is not None:
+      return self.config.key(*args, **kwargs)
+    # Arguments come from JSON (lists, dicts), keyed on their serialized form
+    return json.dumps([args, kwargs], sort_keys=True, default=str)
+
+  async def call(self, func: Callable, instance: object, *args, **kwargs) -> Any:
+    entries = self._entries(instance)
+    key = self.make_key(args, kwargs)
+    now = time.monotonic()
+
+    entry = entries.get(key)
+    if entry is not None and (entry[0] is None or entry[0] > now):
+      entries.move_to_end(key)
+      self.hits += 1
+      return entry[1]
+
+    self.misses += 1
+    value = await func(instance, *args, **kwargs)
+
+    ttl = self.config.ttl
+    entries[key] = (now + ttl if ttl else None, value)
+    entries.move_to_end(key)
+    while len(entries) > self.config.max_entries:
+      entries.popitem(last=False)
+    return value
+
+  def invalidate(self, instance: Optional[object] = None, *args, **kwargs) -> None:
+    """
+    Drop cached results: of one call if arguments are given, else all of
+    the instance (everything when no instance, or with the class scope).
+    """
+    if instance is None:
+      self._shared.clear()
+      self._instances.clear()
+      return
+
+    entries = self._entries(instance, create=False)
+    if not entries:
+      return
+    if args or kwargs:
+      entries.pop(self.make_key(args, kwargs), None)
+    else:
+      entries.clear()
+
+  def info(self) -> dict:
+    return {
+      "scope": self.config.scope,
+      "ttl": self.config.ttl,
+      "entries": len(self._shared) + sum(len(entries) for entries in self._instances.values()),
+      "hits": self.hits,
+      "misses": self.misses
+    }
+
+
+# Every cache created by funcx(cache=...), by module and method qualname
+_caches: Dict[str, FuncXCache] = {}
+
+
+def create_cache(func: Callable, cache: Union[bool, float, dict, FuncXCacheConfig]) -> FuncXCache:
+  """cache: True (defaults), a ttl in seconds (0: no expiry), a dict / FuncXCacheConfig."""
+  if isinstance(cache, FuncXCacheConfig):
+    config = cache
+  elif isinstance(cache, dict):
+    config = FuncXCacheConfig(**cache)
+  elif cache is True:
+    config = FuncXCacheConfig()
+  else:
+    config = FuncXCacheConfig(ttl=cache)
+
+  # Same class name in two modules must not share a cache
+  name = f"{func.__module__}.{func.__qualname__}"
+  # Dev mode module reloads define the method again, the newest one wins
+  cache = _caches[name] = FuncXCache(name, config)
+  return cache
+
+
+def funcx_cache_info() -> Dict[str, dict]:
+  return {name: cache.info() for name, cache in _caches.items()}
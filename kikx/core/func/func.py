@@ -1,22 +1,44 @@
+import time
 import asyncio
+import inspect
 import functools
 import logging
 from uuid import uuid4
-from typing import Any, Callable, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 
 from .handlers import Handler  # Placeholder for future use
-from .models import FuncXConfig, FuncXModel
+from .models import FuncXConfig, FuncXModel, FuncXBatchModel, FuncXCacheConfig
+from .cache import FuncXCache, create_cache
 
 logger = logging.getLogger(__name__)
 
+# Websocket funcx: call / cancel messages, the reply carries the request id
+FUNCX_EVENT = "funcx"
+FUNCX_CANCEL_EVENT = "funcx:cancel"
+FUNCX_RESULT_EVENT = "funcx:result"
+
+# Calls of a concurrent batch running at the same time
+BATCH_CONCURRENCY = 8
+
+
+class FuncXTimeout(Exception):
+  """A funcx call ran past its config.timeout, answered with 504."""
+  status_code = 504
+
+
+class FuncXNotFound(Exception):
+  """No exposed function by that name, answered with 404."""
+  status_code = 404
+
 
 class XFunction:
   """Wrapper for binding instance methods dynamically."""
 
-  def __init__(self, func: Callable):
+  def __init__(self, func: Callable, cache: Optional[FuncXCache] = None):
     self.func = func
+    self.cache = cache
     self.is_handler = False  # Reserved for future use
 
   def __call__(self, *args, **kwargs):
@@ -25,12 +47,69 @@ class XFunction:
   def __get__(self, instance, owner):
     if instance is None:
       return self.func
-    return XFunction(functools.partial(self.func, instance))
+    return XFunction(self.bind(instance))
+
+  def bind(self, instance: object) -> Callable:
+    """The function bound to an instance, results served from the cache if any."""
+    if self.cache is None:
+      return functools.partial(self.func, instance)
+    return functools.partial(self.cache.call, self.func, instance)
+
+
+def funcx(func: Optional[Callable] = None, *, cache: Union[None, bool, float, dict, FuncXCacheConfig] = None):
+  """
+  Decorator to expose methods as async callable, as @funcx or @funcx(cache=...).
+
+  cache memoizes results (idempotent calls only): True, a ttl in seconds
+  or FuncXCacheConfig fields (ttl, max_entries, scope, key). A ttl of 0
+  (cache=0 included) keeps results until invalidated, only None / False
+  turn caching off.
+  """
+  def decorator(func: Callable) -> XFunction:
+    enabled = cache is not None and cache is not False
+    return XFunction(func, create_cache(func, cache) if enabled else None)
+
+  if func is not None:
+    return decorator(func)
+  return decorator
+
+
+# class -> exposed methods by name, filled on first use of the class
+_funcx_classes: Dict[type, Dict[str, XFunction]] = {}
 
 
-def funcx(func: Callable) -> XFunction:
-  """Decorator to expose methods as async callable."""
-  return XFunction(func)
+def funcx_functions(cls: type) -> Dict[str, XFunction]:
+  """Exposed methods of a class (own and inherited), computed once per class."""
+  functions = _funcx_classes.get(cls)
+  if functions is None:
+    functions = {}
+    for klass in reversed(cls.__mro__):
+      for name, value in vars(klass).items():
+        if isinstance(value, XFunction):
+          functions[name] = value
+        elif name in functions:
+          # Overridden without @funcx, no longer exposed
+          del functions[name]
+    _funcx_classes[cls] = functions
+  return functions
+
+
+def describe_funcx(cls: type, prefix: str = "") -> List[dict]:
+  """Name, signature (without self) and docstring of the exposed methods of a class."""
+  functions = []
+  for name, function in sorted(funcx_functions(cls).items()):
+    try:
+      signature = inspect.signature(function.func)
+      signature = str(signature.replace(parameters=list(signature.parameters.values())[1:]))
+    except (TypeError, ValueError):
+      signature = None
+    functions.append({
+      "name": prefix + name,
+      "signature": signature,
+      "doc": inspect.getdoc(function.func),
+      "cached": function.cache is not None
+    })
+  return functions
 
 
 def funcx_handler(func: Callable):
@@ -39,38 +118,86 @@ def funcx_handler(func: Callable):
   return func
 
 
+class FuncXCall:
+  """A funcx call in flight."""
+
+  def __init__(self, funcx_id: str, name: str, task: asyncio.Task):
+    self.id = funcx_id
+    self.name = name
+    self.task = task
+    self.started_at = time.time()
+
+  def info(self) -> dict:
+    return {
+      "id": self.id,
+      "name": self.name,
+      "started_at": self.started_at,
+      "elapsed": round(time.time() - self.started_at, 3)
+    }
+
+
 class FuncX:
   """Base class to enable dynamic function execution from client."""
 
   def __init__(self):
-    # List of waiting tasks to complete
-    self.__funcx_tasks: List[asyncio.Task] = []
+    # Calls in flight by funcx id
+    self.__funcx_tasks: Dict[str, FuncXCall] = {}
+    # Calls made so far
+    self.funcx_calls: int = 0
+    # Dotted name -> bound function, filled on first call of each name
+    self.__funcx_dispatch: Dict[str, Callable] = {}
+    # Websocket calls in flight, by request id
+    self.__funcx_requests: Dict[str, asyncio.Task] = {}
+
+  @property
+  def funcx_in_flight(self) -> int:
+    """Funcx calls still running."""
+    return len(self.__funcx_tasks)
   
   # placeholder function 
   async def send_event(self, event: str, data: Any):
     """Override in subclass to send events (e.g. over websocket)."""
     pass
 
-  @funcx  # this method not required
-  async def cancel_funcx(self, funcx_id: str):
-    """Cancel a running funcx task by ID (unimplemented)."""
-    # Needs task lookup by ID to cancel specific task
-    pass
-  
-  # remove task from list on complete
+  @funcx
+  async def cancel_funcx(self, funcx_id: str) -> bool:
+    """Cancel a funcx call in flight by id, False if not found."""
+    if funcx_id in self.__funcx_requests:
+      # Websocket call, its reply tells it was cancelled
+      return await self.cancel_funcx_request(funcx_id)
+
+    call = self.__funcx_tasks.get(funcx_id)
+    if call is None:
+      return False
+    call.task.cancel()
+    logger.info(f"Funcx task cancel requested: {call.name} ({funcx_id})")
+    return True
+
+  @funcx
+  async def list_funcx(self) -> List[dict]:
+    """Funcx calls in flight (id, name, start time)."""
+    current = asyncio.current_task()
+    return [call.info() for call in self.__funcx_tasks.values() if call.task is not current]
+
+  # remove task from registry on complete
   def __on_funcx_task_complete(self, task: asyncio.Task):
     """Callback for when a task completes."""
-    if task in self.__funcx_tasks:
-      self.__funcx_tasks.remove(task)
+    call = self.__funcx_tasks.get(task.get_name())
+    if call is not None and call.task is task:
+      del self.__funcx_tasks[call.id]
     logger.info(f"Funcx task complete: {task.get_name()}")
-  
+
   # wrapper function for funcx task core logic
-  async def _run_func(self, func: Callable, config: FuncXConfig) -> Any:
+  async def _run_func(self, func: Callable, config: FuncXConfig, name: str = "") -> Any:
     """Run a registered async function with optional timeout."""
-    task_id = uuid4().hex
+    task_id = config.id or uuid4().hex
+    if task_id in self.__funcx_tasks:
+      raise Exception(f"Funcx id already in flight: {task_id}")
+
+    self.funcx_calls += 1
     task = asyncio.create_task(func(*config.args, **config.options), name=task_id)
+    self.__funcx_tasks[task_id] = FuncXCall(task_id, name, task)
     task.add_done_callback(self.__on_funcx_task_complete)
-    self.__funcx_tasks.append(task)
 
     try:
       if config.timeout > 0:
@@ -78,43 +205,145 @@ class FuncX:
       return await task
     except asyncio.TimeoutError:
       logger.warning(f"Funcx task timed out: {task.get_name()}")
+      raise FuncXTimeout(f"Timed out after {config.timeout}s") from None
     except asyncio.CancelledError:
       logger.info(f"Funcx task cancelled: {task.get_name()}")
     except Exception:
       logger.exception("Unhandled exception in funcx task")
       raise
 
-  # Entry point for running funcx task
-  async def run_function(self, func_model: FuncXModel) -> Any:
-    """Resolve and run a function via dot-path (e.g. module.sub.func)."""
-    *attrs, name = func_model.name.split(".")
+  def funcx_children(self) -> Dict[str, type]:
+    """Objects whose functions are called with a dotted prefix, name -> class (see list_functions)."""
+    return {}
+
+  def list_functions(self) -> List[dict]:
+    """Functions callable with run_function."""
+    functions = describe_funcx(type(self))
+    for name, cls in self.funcx_children().items():
+      functions.extend(describe_funcx(cls, f"{name}."))
+    return functions
+
+  def _resolve_function(self, dotted_name: str) -> Callable:
+    """Walk a dotted name once, the bound function is kept in the dispatch table."""
+    *attrs, name = dotted_name.split(".")
     obj = self
 
     for attr in attrs:
       obj = getattr(obj, attr, None)
       if obj is None:
-        raise Exception(f"'{attr}' not found in '{'.'.join(attrs)}'")
+        raise FuncXNotFound(f"'{attr}' not found in '{'.'.join(attrs)}'")
+
+    function = funcx_functions(type(obj)).get(name)
+    if function is None:
+      raise FuncXNotFound("Function not found")
+
+    bound = self.__funcx_dispatch[dotted_name] = function.bind(obj)
+    return bound
 
-    func = getattr(obj, name, None)
+  # Entry point for running funcx task
+  async def run_function(self, func_model: FuncXModel) -> Any:
+    """Run a function by dot-path (e.g. module.sub.func)."""
+    func = self.__funcx_dispatch.get(func_model.name) or self._resolve_function(func_model.name)
+    return await self._run_func(func, func_model.config, func_model.name)
 
-    if isinstance(func, XFunction):
-      return await self._run_func(func, func_model.config)
+  def invalidate_funcx_cache(self, *names: str) -> None:
+    """Drop this instance's cached results of the given functions (all when none given)."""
+    functions = funcx_functions(type(self))
+    for name in names or functions:
+      function = functions.get(name)
+      if function is not None and function.cache is not None:
+        function.cache.invalidate(self)
 
-    raise Exception("Function not found")
+  async def _run_batch_call(self, func_model: FuncXModel) -> dict:
+    try:
+      return {"result": await self.run_function(func_model)}
+    except Exception as e:
+      return {"error": str(e), "status": getattr(e, "status_code", 500)}
+
+  async def run_batch(self, batch: FuncXBatchModel) -> List[dict]:
+    """Run several functions, per call result ({result} or {error, status}) in request order."""
+    if batch.sequential:
+      return [await self._run_batch_call(call) for call in batch.calls]
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    async def run_call(call: FuncXModel) -> dict:
+      async with semaphore:
+        return await self._run_batch_call(call)
+    return list(await asyncio.gather(*[run_call(call) for call in batch.calls]))
+
+  async def run_funcx_request(self, payload: dict, limit: int) -> None:
+    """
+    Start a funcx call received over the websocket, a funcx:result event
+    ({id, result} or {id, error, status}) is sent once it is done.
+    Runs in its own task so the receive loop stays free for cancels.
+    """
+    request_id = payload.get("id")
+    if not isinstance(request_id, str):
+      # Nothing to match the reply with, still tell the sender
+      error = ("funcx request without id", 422)
+      request_id = None
+    elif request_id in self.__funcx_requests:
+      error = ("Request id already in flight", 409)
+    elif len(self.__funcx_requests) >= limit:
+      error = (f"Too many funcx calls in flight (max {limit})", 429)
+    else:
+      try:
+        func_model = FuncXModel(name=payload.get("name"), config=payload.get("config") or {})
+      except ValidationError as e:
+        error = (str(e), 422)
+      else:
+        # Same id for cancel_funcx / list_funcx
+        if func_model.config.id is None:
+          func_model.config.id = request_id
+        self.__funcx_requests[request_id] = asyncio.create_task(self.__funcx_request(request_id, func_model))
+        return
+
+    await self.send_event(FUNCX_RESULT_EVENT, {"id": request_id, "error": error[0], "status": error[1]})
+
+  async def __funcx_request(self, request_id: str, func_model: FuncXModel) -> None:
+    try:
+      reply = {"id": request_id, "result": await self.run_function(func_model)}
+    except Exception as e:
+      reply = {"id": request_id, "error": str(e), "status": getattr(e, "status_code", 500)}
+
+    # Cancelled meanwhile - the cancel already answered
+    if self.__funcx_requests.get(request_id) is not asyncio.current_task():
+      return
+    try:
+      await self.send_event(FUNCX_RESULT_EVENT, reply)
+    finally:
+      self.__funcx_requests.pop(request_id, None)
+
+  async def cancel_funcx_request(self, request_id: str) -> bool:
+    """Cancel a websocket funcx call, its reply is {id, cancelled: true}."""
+    task = self.__funcx_requests.pop(request_id, None)
+    if task is None:
+      return False
+    task.cancel()
+    await self.send_event(FUNCX_RESULT_EVENT, {"id": request_id, "cancelled": True})
+    return True
 
   # When closing app / client
   async def on_close(self):
     """Cancel all active funcx tasks and wait for them to finish."""
-    if not getattr(self, "__funcx_tasks", None):
+    requests = list(self.__funcx_requests.values())
+    self.__funcx_requests.clear()
+    for task in requests:
+      task.cancel()
+
+    # Not the caller, when closed from one of its own calls
+    current = asyncio.current_task()
+    tasks = [call.task for call in self.__funcx_tasks.values() if call.task is not current]
+    if not tasks:
       return
     
     # tasks must implement cancel checks
-    for task in self.__funcx_tasks:
+    for task in tasks:
       task.cancel()
   
     try:
       await asyncio.wait_for(
-        asyncio.gather(*self.__funcx_tasks, return_exceptions=True),
+        asyncio.gather(*tasks, return_exceptions=True),
         timeout=2
       )
     except asyncio.TimeoutError:
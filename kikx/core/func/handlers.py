@@ -1,14 +1,39 @@
 import asyncio
 import functools
-from typing import Any, Awaitable, Callable, Optional
+from typing import Any, Awaitable, Callable, List, Optional
 
 
 class Handler:
-  """Handler that manages event messages and statuses."""
+  """
+  Handler that manages event messages and statuses.
 
-  def __init__(self, handler_id: Optional[str], send_event: Callable[[str, dict], Awaitable[None]]):
+  With a coalescing window, consecutive text output is merged into one
+  'output' frame sent after window_ms or once max_bytes is buffered.
+  Any other status flushes pending output first, so order is kept.
+
+  wait_writable, if given, is awaited by producers (writable()) before
+  producing more output, so they follow the consumer's pace.
+  """
+
+  def __init__(
+    self,
+    handler_id: Optional[str],
+    send_event: Callable[[str, dict], Awaitable[None]],
+    window_ms: int = 0,
+    max_bytes: int = 16 * 1024,
+    wait_writable: Optional[Callable[[], Awaitable[None]]] = None
+  ):
     self.id: Optional[str] = handler_id
     self.send_event = send_event
+    self.wait_writable = wait_writable
+
+    # Output coalescing (0 = send every output immediately)
+    self.window: float = window_ms / 1000
+    self.max_bytes: int = max_bytes
+    self._buffer: List[str] = []
+    self._buffer_size: int = 0
+    self._flush_timer: Optional[asyncio.TimerHandle] = None
+    self._flush_task: Optional[asyncio.Task] = None
 
   async def send(self, status: str, output: Any) -> None:
     """Send data with a specific status."""
@@ -25,21 +50,66 @@ class Handler:
     except Exception:
       pass  # Fail silently
 
+  async def flush(self) -> None:
+    """Send buffered output as a single frame."""
+    if self._flush_timer is not None:
+      self._flush_timer.cancel()
+      self._flush_timer = None
+
+    if not self._buffer:
+      return
+
+    # Swap before awaiting so concurrent output lands in the next frame
+    output = "".join(self._buffer)
+    self._buffer = []
+    self._buffer_size = 0
+    await self.send("output", output)
+
+  async def writable(self) -> None:
+    """Wait until the consumer can take more output."""
+    if self.wait_writable is not None and self.id is not None:
+      await self.wait_writable()
+
+  def _on_flush_timer(self) -> None:
+    self._flush_timer = None
+    self._flush_task = asyncio.create_task(self.flush())
+
   async def started(self, message: Any) -> None:
+    await self.flush()
     await self.send("started", message)
 
   async def info(self, message: Any) -> None:
+    await self.flush()
     await self.send("info", message)
 
   async def output(self, message: Any) -> None:
-    await self.send("output", message)
+    if self.window <= 0 or not isinstance(message, str):
+      await self.flush()
+      await self.send("output", message)
+      return
+
+    self._buffer.append(message)
+    self._buffer_size += len(message)
+
+    if self._buffer_size >= self.max_bytes:
+      await self.flush()
+    elif self._flush_timer is None:
+      self._flush_timer = asyncio.get_running_loop().call_later(self.window, self._on_flush_timer)
 
   async def error(self, message: Any) -> None:
+    await self.flush()
     await self.send("error", message)
 
   async def ended(self, message: Any) -> None:
+    await self.flush()
     await self.send("ended", message)
 
-def create_handler(handler_id: Optional[str], send_event: Callable[[str, dict], Awaitable[None]]) -> Handler:
+def create_handler(
+  handler_id: Optional[str],
+  send_event: Callable[[str, dict], Awaitable[None]],
+  window_ms: int = 0,
+  max_bytes: int = 16 * 1024,
+  wait_writable: Optional[Callable[[], Awaitable[None]]] = None
+) -> Handler:
   """Factory method to create a handler."""
-  return Handler(handler_id, send_event)
+  return Handler(handler_id, send_event, window_ms, max_bytes, wait_writable)
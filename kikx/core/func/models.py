@@ -1,4 +1,4 @@
-from typing import Any, Callable, List, Optional
+from typing import Any, Callable, Hashable, List, Literal, Optional
 from pydantic import BaseModel, Field
 
 
@@ -6,7 +6,26 @@ class FuncXConfig(BaseModel):
   args: List[Any] = []
   options: dict = {}
   timeout: int = 0
+  # Funcx id (see cancel_funcx / list_funcx), generated if not given
+  id: Optional[str] = None
 
 class FuncXModel(BaseModel):
   name: str
   config: FuncXConfig = Field(default_factory=FuncXConfig)
+
+# Most calls a batch request may carry
+BATCH_MAX_CALLS = 64
+
+class FuncXBatchModel(BaseModel):
+  calls: List[FuncXModel] = Field(..., max_length=BATCH_MAX_CALLS)
+  # One after another (in order) instead of concurrently
+  sequential: bool = False
+
+class FuncXCacheConfig(BaseModel):
+  # Seconds a result is reused, 0 keeps it until invalidated / evicted
+  ttl: float = Field(0, ge=0)
+  max_entries: int = Field(128, ge=1)
+  # "instance": each client / app / module has its own results, "class": shared by all
+  scope: Literal["instance", "class"] = "instance"
+  # Cache key from the call arguments, default keys on all of them
+  key: Optional[Callable[..., Hashable]] = None
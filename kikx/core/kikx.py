@@ -16,9 +16,13 @@ from core.ui import ClientUI
 from core.client import Client
 from core.logging import Logger
 from core.console import Console
+from core.dispatcher import Dispatcher
+from core.cluster import ClusterMiddleware
+from core.limits import LimitExceeded, limits
 from core.utils import load_app_manifest
 
-from lib.utils import file_response, import_relative_module
+from lib.utils import file_response, import_relative_module, receive_message
+from lib.serializer import negotiate_protocol
 
 
 
@@ -66,6 +70,21 @@ kikx_app.add_middleware(
   allow_headers=["*"],
 )
 
+# Requests about another worker's sessions are forwarded to it (multi-worker)
+kikx_app.add_middleware(ClusterMiddleware, core=core)
+
+# Limits reached - try again later
+@kikx_app.exception_handler(LimitExceeded)
+async def limit_exception_handler(request: Request, exc: LimitExceeded):
+  return JSONResponse(
+    status_code=exc.status_code,
+    content={
+      "success": False,
+      "detail": exc.detail,
+      "limit": exc.limit
+    },
+  )
+
 # Global exception handler
 @kikx_app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -125,7 +144,7 @@ def login_page(file: Optional[str] = None, ui: Optional[str] = None):
 
 @kikx_app.post("/login", tags=["Auth"])
 async def login(access: str = Form(...), ui: str = Form(...)):
-  access_token = core.auth.generate_access_token(access, ui)
+  access_token = await core.auth.generate_access_token(access, ui)
 
   response = JSONResponse(content={"message": "Login successful"})
   response.set_cookie(key="access_token", value=access_token, httponly=True, samesite="strict")
@@ -134,8 +153,8 @@ async def login(access: str = Form(...), ui: str = Form(...)):
   return response
 
 @kikx_app.get("/lazy-login", tags=["Auth"])
-def lazy_login(key: str, ui: str):
-  access_token = core.auth.generate_access_token(key, ui)
+async def lazy_login(key: str, ui: str):
+  access_token = await core.auth.generate_access_token(key, ui)
 
   response = RedirectResponse("/")
   response.set_cookie(key="access_token", value=access_token, httponly=True, samesite="strict")
@@ -149,8 +168,8 @@ def logout():
   return response
 
 @kikx_app.get("/generate", tags=["Auth"])
-def generate(key: str, ui: str):
-  access_token = core.auth.generate_access_token(key, ui)
+async def generate(key: str, ui: str):
+  access_token = await core.auth.generate_access_token(key, ui)
   return {"access_token": access_token}
 
 # -------------------------------------
@@ -201,12 +220,12 @@ async def app_data(app_id: str, path: str, starting: bool = False):
   return file_response(app.get_app_data_path(), path)
 
 @kikx_app.get("/ui/{ui_name}/{path:path}")
-def home_page(request: Request, ui_name: str, path: str):
+async def home_page(request: Request, ui_name: str, path: str):
   path = "index.html" if not path.strip() else path
   # Require access for index page
   if path == "index.html":
     token = request.cookies.get("access_token")
-    if not core.auth.check_access_token(token):
+    if not await core.auth.check_access_token(token):
       return RedirectResponse(f"/login?ui={ui_name}")
   # Checking if ui enabled
   ui_config = core.config.kikx.ui.get(ui_name)
@@ -223,9 +242,17 @@ def root_page(request: Request):
 # WebSockets
 # -------------------------------------
 
+# Subprotocol to accept - binary (kikx.msgpack) when offered and allowed, else JSON
+def accept_protocol(websocket: WebSocket) -> Optional[str]:
+  return negotiate_protocol(
+    websocket.scope.get("subprotocols", []),
+    core.config.kikx.connection.binary_protocol
+  )
+
 @kikx_app.websocket("/app/{app_id}")
-async def apps_websocket_endpoint(websocket: WebSocket, app_id: str):
-  await websocket.accept()
+async def apps_websocket_endpoint(websocket: WebSocket, app_id: str, last_seq: Optional[int] = None):
+  protocol = accept_protocol(websocket)
+  await websocket.accept(subprotocol=protocol)
   client, app = core.get_client_app_by_id(app_id)
 
   try:
@@ -233,10 +260,10 @@ async def apps_websocket_endpoint(websocket: WebSocket, app_id: str):
     
     if not client or not app:
       raise PermissionError("Unauthorized")
-    # new connection
-    if app.connection.websocket is None:
+    # new connection (a restored one resumes its session)
+    if app.connection.is_new:
       event_name = "connected"
-    await app.connect_websocket(websocket)
+    await app.connect_websocket(websocket, last_seq, protocol)
     await app.send_event(event_name, {
       "config": client.get_app_config(app)
       # "config": { **app.config.model_dump(), "ui": client.ui.name }
@@ -261,18 +288,25 @@ async def apps_websocket_endpoint(websocket: WebSocket, app_id: str):
   # except Exception as e:
   #   logger.exception(f"WebSocket app error: {app.id}: {e}")
   
+  # Handlers run concurrently, submit waits (pauses reads) at the limit
+  # Handlers of the previous websocket (reconnect) must not outlive it
+  if app.connection.dispatcher is not None:
+    await app.connection.dispatcher.close()
+  dispatcher = app.connection.dispatcher = Dispatcher(
+    lambda data: core.on_app_data(client, app, data),
+    core.config.kikx.connection.dispatch_limit
+  )
+
   while True:
     try:
-      data = await websocket.receive_json()
+      data, size = await receive_message(websocket, protocol)
       logger.debug(f"WebSocket Data (App {app.id}): {data}")
-
-      try:
-        await core.on_app_data(client, app, data)
-      except Exception as e:
-        logger.exception(f"Error processing app data {app.id}: {e}")
+      app.connection.touch(size)
+      await dispatcher.submit(data)
 
     except WebSocketDisconnect:
       logger.info(f"WebSocket: App disconnected {app.id}")
+      app.connection.mark_disconnected(websocket)
       break
 
     except Exception as e:
@@ -280,8 +314,9 @@ async def apps_websocket_endpoint(websocket: WebSocket, app_id: str):
 
 
 @kikx_app.websocket("/client")
-async def websocket_client_endpoint(websocket: WebSocket, client_id: Optional[str] = None, access_token: str = Cookie(None)):
-  await websocket.accept()
+async def websocket_client_endpoint(websocket: WebSocket, client_id: Optional[str] = None, last_seq: Optional[int] = None, access_token: str = Cookie(None)):
+  protocol = accept_protocol(websocket)
+  await websocket.accept(subprotocol=protocol)
 
   try:
     logger.info(f"Cliend Connect Attempt (ID: {client_id}) (Access: {access_token})")
@@ -292,23 +327,30 @@ async def websocket_client_endpoint(websocket: WebSocket, client_id: Optional[st
     if not client:
       # If access token already exists then disconnect previous client based on that
       # ----- no need access token for already connected session
-      if core.auth.pop_access_token(access_token) is None:
+      # Checked first so a rejected login keeps its token
+      limits.check_clients(len(core.clients))
+      if await core.auth.pop_access_token(access_token) is None:
         raise PermissionError("Unauthorized")
   
       ui = access_token.split("_")[1]
       # move this above to check even client reconnect
-      client = Client(core.user, core.config.resolve_path, access_token, ClientUI(ui, core.get_ui_config(ui)))
-      core.clients[client.id] = client
+      client = Client(core.user, core.config.resolve_path, access_token, ClientUI(ui, core.get_ui_config(ui)), core.config.kikx)
+      await core.add_client(client)
+      # Clients receive every signal
+      core.pubsub.subscribe(client, "*")
       event_name = "connected"
 
-    # This is reconnect attempt
-    await client.connect_websocket(websocket)
+    # This is reconnect attempt - last_seq resumes from the replay buffer
+    await client.connect_websocket(websocket, last_seq, protocol)
     await client.send_event(event_name, {
       "client_id": client.id
     })
   except PermissionError as e:
     await websocket.close(code=1008, reason=str(e))
     return
+  except LimitExceeded as e:
+    await websocket.close(code=1013, reason=str(e))
+    return
   except Exception as e:
     logger.info(f"WebSocket Client Connect Error: {str(e)}")
     await websocket.close(reason=str(e))
@@ -325,12 +367,21 @@ async def websocket_client_endpoint(websocket: WebSocket, client_id: Optional[st
   # except Exception as e:
   #   logger.exception(f"WebSocket client error: {e}")
 
+  if client.connection.dispatcher is not None:
+    await client.connection.dispatcher.close()
+  dispatcher = client.connection.dispatcher = Dispatcher(
+    lambda data: core.on_client_data(client, data),
+    core.config.kikx.connection.dispatch_limit
+  )
+
   while True:
     try:
-      data = await websocket.receive_json()
-      await core.on_client_data(client, data)
+      data, size = await receive_message(websocket, protocol)
+      client.connection.touch(size)
+      await dispatcher.submit(data)
     except WebSocketDisconnect:
       logger.info(f"Client {client.id} disconnected")
+      client.connection.mark_disconnected(websocket)
       break
     except Exception as e:
       logger.exception(f"Error handling client {client.id}: {e}")
@@ -130,6 +130,7 @@ class AppInstaller:
       self._copy_include_files()
       self._create_manifest_file(source)
       self._create_config_file()
+      self.core.catalog.invalidate(self.app_name)
 
       self.set_status("Install completed")
 
@@ -202,6 +203,7 @@ class AppInstaller:
 
         # Remove backup after success
         shutil.rmtree(backup_path)
+        self.core.catalog.invalidate(self.app_name)
 
         return True
       except Exception:
@@ -378,6 +380,8 @@ class AppUninstaller:
 
       shutil.rmtree(safe_data_path)
 
+    self.core.catalog.invalidate(self.app_name)
+
     self.set_status("Uninstall completed")
     return True
   
@@ -0,0 +1,142 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from core.models.kikx_models import LimitsConfigModel
+from core.logging import Logger
+
+
+logging = Logger("kikx_limits", "kikx_limits.log")
+logger = logging.get_logger()
+
+
+class LimitExceeded(Exception):
+  """A configured limit was reached, answered with 429 (websockets close with 1013)."""
+  status_code = 429
+
+  def __init__(self, limit: str, detail: str):
+    super().__init__(detail)
+    self.limit = limit
+    self.detail = detail
+
+
+class Admission:
+  """
+  Concurrency slots with a bounded wait queue.
+  Past limit running, callers wait (at most timeout seconds) in a queue
+  of max_queued, beyond that they are rejected right away.
+  """
+  def __init__(self, limits: "Limits", name: str, limit: Optional[int], max_queued: int, timeout: float):
+    self.limits = limits
+    self.name = name
+    self.limit = limit
+    self.max_queued = max_queued
+    self.timeout = timeout
+
+    self.running: int = 0
+    self.waiting: int = 0
+    self._semaphore: Optional[asyncio.Semaphore] = asyncio.Semaphore(limit) if limit else None
+
+  @property
+  def is_full(self) -> bool:
+    return self._semaphore is not None and self._semaphore.locked()
+
+  def check(self) -> None:
+    """Reject now if the caller could not even be queued."""
+    if self.is_full and self.waiting >= self.max_queued:
+      self.limits.reject(self.name, f"Too many {self.name}: {self.limit} running, {self.waiting} queued")
+
+  @asynccontextmanager
+  async def slot(self) -> AsyncIterator[bool]:
+    """Hold a slot for the block, yields True if it had to wait for it."""
+    if self._semaphore is None:
+      self.running += 1
+      try:
+        yield False
+      finally:
+        self.running -= 1
+      return
+
+    self.check()
+    queued = self.is_full
+    if queued:
+      self.limits.stats["queued"] += 1
+
+    self.waiting += 1
+    try:
+      await asyncio.wait_for(self._semaphore.acquire(), timeout=self.timeout)
+    except asyncio.TimeoutError:
+      self.limits.reject(self.name, f"Too many {self.name}: no slot within {self.timeout}s")
+    finally:
+      self.waiting -= 1
+
+    self.running += 1
+    try:
+      yield queued
+    finally:
+      self.running -= 1
+      self._semaphore.release()
+
+  def info(self) -> dict:
+    return {
+      "limit": self.limit,
+      "running": self.running,
+      "waiting": self.waiting
+    }
+
+
+class Limits:
+  """
+  Admission control for clients, apps and tasks (counts are per worker).
+  Client / app caps reject at once, tasks queue for a slot first.
+  """
+  def __init__(self, config: Optional[LimitsConfigModel] = None):
+    self.stats = {
+      "queued": 0,
+      # limit name -> rejections
+      "rejected": {}
+    }
+    self.configure(config or LimitsConfigModel())
+
+  def configure(self, config: LimitsConfigModel) -> None:
+    self.config: LimitsConfigModel = config
+    # Subprocesses of all apps together
+    self.tasks = Admission(self, "tasks", config.max_tasks, config.task_queue, config.task_queue_timeout)
+
+  def reject(self, limit: str, detail: str) -> None:
+    rejected: Dict[str, int] = self.stats["rejected"]
+    rejected[limit] = rejected.get(limit, 0) + 1
+    logger.warning(f"Limit reached ({limit}): {detail}")
+    raise LimitExceeded(limit, detail)
+
+  def check_clients(self, clients: int) -> None:
+    """Before a new client is created."""
+    limit = self.config.max_clients
+    if limit is not None and clients >= limit:
+      self.reject("clients", f"Too many clients (max {limit})")
+
+  def check_apps(self, client_apps: int, apps: int) -> None:
+    """Before a client opens an app."""
+    limit = self.config.max_apps_per_client
+    if limit is not None and client_apps >= limit:
+      self.reject("apps_per_client", f"Too many open apps (max {limit} per client)")
+    limit = self.config.max_apps
+    if limit is not None and apps >= limit:
+      self.reject("apps", f"Too many open apps (max {limit})")
+
+  def app_tasks(self) -> Admission:
+    """Task slots of one app instance."""
+    config = self.config
+    return Admission(self, "tasks_per_app", config.max_tasks_per_app, config.task_queue, config.task_queue_timeout)
+
+  def info(self) -> dict:
+    return {
+      **self.config.model_dump(),
+      "tasks": self.tasks.info(),
+      "queued": self.stats["queued"],
+      "rejected": dict(self.stats["rejected"])
+    }
+
+
+# Shared by core and app modules, configured by Core
+limits = Limits()
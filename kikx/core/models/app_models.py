@@ -82,6 +82,13 @@ class AppModuleTasksConfigModel(BaseModel):
   env: Dict[str, str] = {}
   # Main program to run while running tasks
   main: str = Field('python3 -u {app_path}/tasks/{name}.py {args}', description="Prefix for all tasks")
+  # Merge task output lines into one frame per window (0 = one frame per line)
+  output_window_ms: int = Field(0, ge=0, le=1000, description="Output coalescing window in ms")
+  output_max_bytes: int = Field(16 * 1024, ge=1, description="Flush coalesced output at this size")
+  # Pause reading task output while the frontend lags behind (queue above high_water)
+  backpressure: bool = Field(True, description="Throttle tasks to the frontend's pace")
+  # Max line length, asyncio buffers up to twice this before the pipe blocks the child
+  pipe_limit: int = Field(10 * 1024 * 1024, ge=64 * 1024, description="Task output stream buffer limit in bytes")
 
 # App storage access permissions
 class AppStoragePermissionsModel(BaseModel):
@@ -172,6 +179,10 @@ class AppModel(BaseModel):
   # App modules to use
   modules: Dict[APP_MODULE, Dict] = Field({}, description="App modules to use")
 
+  # Signal topics (or fnmatch patterns) the app subscribes to when opened
+  # Every signal unless declared, as before topics existed - [] opts out
+  signals: List[str] = Field(["*"], description="Subscribed signals")
+
   # Service permissions
   proxy: bool = False
   system: AppSystemPermissionsModel = Field(default_factory=AppSystemPermissionsModel, description="system permissions")
@@ -1,5 +1,5 @@
 from typing import Dict, List, Literal, Optional
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 
 
 
@@ -12,6 +12,77 @@ class ServerModel(BaseModel):
   host: str = Field("127.0.0.1", description="Host to bind the server")
   port: int = Field(1303, ge=1000, le=65535, description="Port to bind the server")
   log_level: Literal["critical", "error", "warning", "info", "debug"] = Field("critical", description="Logging level")
+  # More than one worker needs a shared state backend (state.backend = sqlite)
+  workers: int = Field(1, ge=1, description="Server worker processes")
+  # Implementations, auto picks the fastest installed one (falls back to auto when missing)
+  loop: Literal["auto", "asyncio", "uvloop"] = Field("auto", description="Event loop")
+  http: Literal["auto", "h11", "httptools"] = Field("auto", description="HTTP protocol implementation")
+  ws: Literal["auto", "websockets", "websockets-sansio", "wsproto"] = Field("auto", description="Websocket protocol implementation")
+  backlog: int = Field(2048, ge=1, description="Max pending connections")
+  timeout_keep_alive: int = Field(5, ge=1, description="Seconds an idle keep-alive connection is kept open")
+  # Counts open connections (websockets too) and running tasks
+  limit_concurrency: Optional[int] = Field(None, ge=1, description="Max concurrent connections / tasks before answering 503")
+
+# Websocket connection config model
+class ConnectionConfigModel(BaseModel):
+  timeout: float = Field(10 * 60, gt=0, description="Seconds a disconnected client / app is kept before reaping")
+  queue_size: int = Field(1024, ge=1, description="Max outbound events queued per connection")
+  high_water: int = Field(768, ge=1, description="Queue depth at which a consumer is considered slow")
+  low_water: int = Field(256, ge=0, description="Queue depth at which a slow consumer is considered recovered")
+  overflow: Literal["drop_oldest", "drop_newest", "close"] = Field("drop_oldest", description="What to do when the queue is full")
+  # Replay buffer kept for resuming after reconnect
+  replay_max_messages: int = Field(512, ge=0, description="Max events kept for replay per connection")
+  replay_max_bytes: int = Field(1024 * 1024, ge=0, description="Max encoded bytes kept for replay per connection")
+  # Event encoder, auto uses orjson when installed
+  serializer: Literal["auto", "json", "orjson"] = Field("auto", description="JSON serializer for websocket events")
+  # Clients may negotiate the kikx.msgpack subprotocol (needs msgpack installed)
+  binary_protocol: bool = Field(True, description="Allow the binary MessagePack protocol")
+  # Inbound messages are handled concurrently, reads pause at the limit
+  dispatch_limit: int = Field(16, ge=1, description="Max inbound messages handled concurrently per connection")
+  # Websocket funcx calls run outside the dispatcher so a cancel is never stuck behind them
+  funcx_limit: int = Field(64, ge=1, description="Max websocket funcx calls in flight per client / app")
+  # Protocol-level keepalive (websocket ping frames sent by the server, None disables)
+  ping_interval: Optional[float] = Field(20, gt=0, description="Seconds between websocket pings")
+  ping_timeout: Optional[float] = Field(20, gt=0, description="Seconds to wait for a pong before dropping the connection")
+  # Apps may ride on their client's websocket instead of opening their own
+  multiplex_apps: bool = Field(True, description="Allow multiplexing app channels over the client websocket")
+
+  @model_validator(mode="after")
+  def check_water_marks(self):
+    if not self.low_water <= self.high_water <= self.queue_size:
+      raise ValueError("Expected low_water <= high_water <= queue_size")
+    return self
+
+# Idle reaper config model
+class ReaperConfigModel(BaseModel):
+  enabled: bool = Field(True, description="Close clients / apps disconnected longer than connection.timeout")
+  interval: float = Field(60, gt=0, description="Seconds between reaper runs")
+
+# Warm restart config model
+class SnapshotConfigModel(BaseModel):
+  enabled: bool = Field(True, description="Save sessions on shutdown and restore them on startup")
+  path: str = Field("storage://data/sessions.json", description="Snapshot file")
+
+# Session state config model (shared between workers)
+class StateConfigModel(BaseModel):
+  backend: Literal["memory", "sqlite"] = Field("memory", description="Where tokens, session owners and cross-worker events live")
+  path: str = Field("storage://data/state.db", description="SQLite database of the sqlite backend")
+  poll_interval: float = Field(0.05, gt=0, description="Seconds between polls for other workers' events")
+  message_ttl: float = Field(60, gt=0, description="Seconds cross-worker events are kept")
+  heartbeat_interval: float = Field(5, gt=0, description="Seconds between a worker's heartbeats")
+  worker_timeout: float = Field(30, gt=0, description="Seconds without a heartbeat before a worker and its sessions are dropped")
+  token_ttl: float = Field(24 * 60 * 60, gt=0, description="Seconds a login token stays valid until a websocket uses it")
+
+# Admission control config model (None disables a cap), counted per worker
+class LimitsConfigModel(BaseModel):
+  max_clients: Optional[int] = Field(64, ge=1, description="Max connected clients of the user")
+  max_apps_per_client: Optional[int] = Field(32, ge=1, description="Max open apps per client")
+  max_apps: Optional[int] = Field(256, ge=1, description="Max open apps across clients")
+  max_tasks_per_app: Optional[int] = Field(16, ge=1, description="Max running tasks (subprocesses) per app")
+  max_tasks: Optional[int] = Field(128, ge=1, description="Max running tasks across apps")
+  # Tasks past a limit wait for a slot, rejected when the queue is full or the wait times out
+  task_queue: int = Field(64, ge=0, description="Max tasks waiting for a slot")
+  task_queue_timeout: float = Field(30, gt=0, description="Seconds a task waits for a slot")
 
 # Services config model 
 class ServicesConfigModel(BaseModel):
@@ -35,6 +106,11 @@ class ConfigSettingsModel(BaseModel):
 class RootConfigModel(BaseModel):
   settings: ConfigSettingsModel = Field(default_factory=ConfigSettingsModel, description="Settings of kikx")
   server: ServerModel = Field(default_factory=ServerModel, description="Server config")
+  connection: ConnectionConfigModel = Field(default_factory=ConnectionConfigModel, description="Websocket connection config")
+  reaper: ReaperConfigModel = Field(default_factory=ReaperConfigModel, description="Idle reaper config")
+  snapshot: SnapshotConfigModel = Field(default_factory=SnapshotConfigModel, description="Warm restart config")
+  state: StateConfigModel = Field(default_factory=StateConfigModel, description="Session state backend config")
+  limits: LimitsConfigModel = Field(default_factory=LimitsConfigModel, description="Client / app / task limits")
 
   ui: Dict[str, UIConfigModel] = Field({}, description="UIs")
 
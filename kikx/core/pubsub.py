@@ -0,0 +1,128 @@
+import re
+from fnmatch import translate
+from typing import Any, Dict, List, Optional, Pattern, Set, Tuple
+
+from core.connection import broadcast_event
+from core.logging import Logger
+
+
+logging = Logger("kikx_pubsub", "kikx_pubsub.log")
+logger = logging.get_logger()
+
+
+def is_pattern(topic: str) -> bool:
+  """Whether a topic is a wildcard pattern (fnmatch syntax)."""
+  return any(char in topic for char in "*?[")
+
+
+class PubSub:
+  """
+  Topic registry for clients and apps.
+
+  Subscribers are objects with an id and a connection (Client / App).
+  Topics are plain names ("theme") or fnmatch patterns ("app:*").
+  publish() reaches only the subscribers of matching topics, the
+  subscriber list per published topic is cached until the index changes.
+  """
+  # Max published topics kept in the match cache
+  MATCH_CACHE_SIZE = 1024
+
+  def __init__(self):
+    # topic -> {subscriber id: subscriber}
+    self._topics: Dict[str, Dict[str, object]] = {}
+    # pattern -> (compiled pattern, {subscriber id: subscriber})
+    self._patterns: Dict[str, Tuple[Pattern, Dict[str, object]]] = {}
+    # subscriber id -> topics / patterns
+    self._subscriptions: Dict[str, Set[str]] = {}
+
+    self._match_cache: Dict[str, List[object]] = {}
+
+    self.stats = {
+      "published": 0,
+      "delivered": 0
+    }
+
+  def info(self) -> dict:
+    return {
+      "topics": len(self._topics),
+      "patterns": len(self._patterns),
+      "subscribers": len(self._subscriptions),
+      **self.stats
+    }
+
+  def topics(self, subscriber: object) -> List[str]:
+    """Topics and patterns a subscriber is subscribed to."""
+    return sorted(self._subscriptions.get(subscriber.id, ()))
+
+  def subscribe(self, subscriber: object, topic: str) -> None:
+    if not topic:
+      raise ValueError("Topic can't be empty")
+
+    if is_pattern(topic):
+      if topic not in self._patterns:
+        self._patterns[topic] = (re.compile(translate(topic)), {})
+      self._patterns[topic][1][subscriber.id] = subscriber
+    else:
+      self._topics.setdefault(topic, {})[subscriber.id] = subscriber
+
+    self._subscriptions.setdefault(subscriber.id, set()).add(topic)
+    self._match_cache.clear()
+
+  def unsubscribe(self, subscriber: object, topic: Optional[str] = None) -> None:
+    """Remove one subscription, or all of them when topic is None."""
+    topics = self._subscriptions.get(subscriber.id)
+    if not topics:
+      return
+
+    for name in ([topic] if topic is not None else list(topics)):
+      if name not in topics:
+        continue
+      topics.discard(name)
+
+      if name in self._patterns:
+        subscribers = self._patterns[name][1]
+        subscribers.pop(subscriber.id, None)
+        if not subscribers:
+          del self._patterns[name]
+      elif name in self._topics:
+        subscribers = self._topics[name]
+        subscribers.pop(subscriber.id, None)
+        if not subscribers:
+          del self._topics[name]
+
+    if not topics:
+      del self._subscriptions[subscriber.id]
+    self._match_cache.clear()
+
+  def subscribers(self, topic: str) -> List[object]:
+    """Subscribers of a published topic, exact and pattern matches (once each)."""
+    cached = self._match_cache.get(topic)
+    if cached is not None:
+      return cached
+
+    matched: Dict[str, object] = dict(self._topics.get(topic, {}))
+    for pattern, subscribers in self._patterns.values():
+      if pattern.match(topic):
+        matched.update(subscribers)
+
+    if len(self._match_cache) >= self.MATCH_CACHE_SIZE:
+      self._match_cache.clear()
+    result = self._match_cache[topic] = list(matched.values())
+    return result
+
+  async def publish(self, topic: str, event: str, payload: Any) -> int:
+    """
+    Send an event to the subscribers of topic, payload is encoded once.
+    Sends only queue the event, each connection's writer does the I/O.
+
+    Returns:
+      Number of subscribers reached.
+    """
+    subscribers = self.subscribers(topic)
+    self.stats["published"] += 1
+    if not subscribers:
+      return 0
+
+    await broadcast_event([subscriber.connection for subscriber in subscribers], event, payload)
+    self.stats["delivered"] += len(subscribers)
+    return len(subscribers)
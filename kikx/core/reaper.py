@@ -0,0 +1,103 @@
+import asyncio
+from typing import Optional
+
+from lib.utils import get_timestamp
+
+from core.models.kikx_models import ReaperConfigModel
+from core.logging import Logger
+
+
+logging = Logger("kikx_reaper", "kikx_reaper.log")
+logger = logging.get_logger()
+
+
+class Reaper:
+  """
+  Background task closing clients and apps whose websocket has been
+  gone longer than their connection timeout, and dropping login tokens
+  past their ttl.
+  """
+  def __init__(self, core: object, config: ReaperConfigModel):
+    self.core = core
+    self.config: ReaperConfigModel = config
+    self._task: Optional[asyncio.Task] = None
+
+    self.stats = {
+      "runs": 0,
+      "last_run": None,
+      "clients": 0,
+      "apps": 0,
+      "tasks": 0,
+      "events": 0,
+      "bytes": 0,
+      "tokens": 0
+    }
+
+  def info(self) -> dict:
+    return {
+      "enabled": self.config.enabled,
+      "interval": self.config.interval,
+      "reclaimed": dict(self.stats)
+    }
+
+  def start(self) -> None:
+    if not self.config.enabled or self._task is not None:
+      return
+    self._task = asyncio.create_task(self._run(), name="kikx-reaper")
+    logger.info(f"Reaper started (interval: {self.config.interval}s)")
+
+  async def stop(self) -> None:
+    if self._task is None:
+      return
+    self._task.cancel()
+    try:
+      await self._task
+    except asyncio.CancelledError:
+      pass
+    self._task = None
+
+  async def _run(self) -> None:
+    while True:
+      await asyncio.sleep(self.config.interval)
+      try:
+        await self.reap()
+      except Exception as e:
+        logger.exception(f"Reaper run failed: {e}")
+
+  def _account(self, app_or_client: object) -> None:
+    replay = app_or_client.connection.replay
+    self.stats["events"] += len(replay)
+    self.stats["bytes"] += replay.bytes
+
+  def _account_app(self, app: object) -> None:
+    self._account(app)
+    tasks = app.get_loaded_module("tasks")
+    if tasks is not None:
+      self.stats["tasks"] += len(getattr(tasks, "running_tasks", {}))
+    self.stats["apps"] += 1
+
+  async def reap(self) -> None:
+    """Close every expired client (with its apps) and every expired app."""
+    core = self.core
+    self.stats["runs"] += 1
+    self.stats["last_run"] = get_timestamp()
+
+    state = core.state
+    self.stats["tokens"] += await state.run(state.purge_tokens)
+
+    for client in list(core.clients.values()):
+      if client.connection.is_expired:
+        logger.info(f"Reaping client {client.id} (idle {client.connection.idle_for:.0f}s)")
+        self._account(client)
+        for app in client.running_apps.values():
+          self._account_app(app)
+        self.stats["clients"] += 1
+
+        await core.on_client_disconnect(client)
+        continue
+
+      for app in list(client.running_apps.values()):
+        if app.connection.is_expired:
+          logger.info(f"Reaping app {app} (idle {app.connection.idle_for:.0f}s)")
+          self._account_app(app)
+          await core.close_app(client, app)
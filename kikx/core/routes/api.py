@@ -1,6 +1,6 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 
-from core.utils import load_app_manifest
+from lib.utils import etag_matches
 from pydantic import BaseModel, Field
 
 from . import get_core
@@ -15,18 +15,20 @@ class AppsListModel(BaseModel):
 
 
 @router.post("/apps/list")
-def get_apps_list(data: AppsListModel, core = Depends(get_core)):
+def get_apps_list(data: AppsListModel, request: Request, response: Response, core = Depends(get_core)):
   client = core.clients.get(data.client_id)
   if client is None:
     raise HTTPException(status_code=401, detail="Client not found")
-  
-  def safe_load(name):
-    try:
-      return load_app_manifest(core, name)
-    except Exception:
-      return None
-  
-  return [res for name in client.user.get_installed_apps() if (res := safe_load(name)) is not None]
+
+  # Broken apps are skipped, cached until the catalog changes
+  apps = core.catalog.summaries()
+
+  etag = core.catalog.etag
+  if etag_matches(request, etag):
+    return Response(status_code=304, headers={"ETag": etag})
+
+  response.headers["ETag"] = etag
+  return apps
 
 @router.get("/ui-list")
 def get_ui_list(core = Depends(get_core)):
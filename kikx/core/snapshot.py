@@ -0,0 +1,212 @@
+import os
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from lib.serializer import get_serializer
+
+from core.client import Client
+from core.ui import ClientUI
+from core.utils import load_app_manifest
+from core.models.kikx_models import SnapshotConfigModel
+from core.logging import Logger
+
+
+logging = Logger("kikx_snapshot", "kikx_snapshot.log")
+logger = logging.get_logger()
+
+# Bumped when the file layout changes, other versions are ignored
+SNAPSHOT_VERSION = 1
+
+
+class SessionSnapshot:
+  """
+  Warm restart of sessions.
+
+  On shutdown clients and their open apps (ids, ui, subscriptions,
+  sequence numbers and buffered events) are written to a file, on
+  startup they are created again under the same ids so open tabs
+  reconnect (and resume with last_seq) instead of logging in again.
+  Access tokens are not written, apps are reopened through
+  core.open_app so the app limits hold.
+  The file is removed once read, a snapshot older than the connection
+  timeout is dropped as the reaper would have closed those sessions.
+  Module state (running tasks, ...) is not kept.
+
+  With several workers each one saves its own file (<name>-<worker>),
+  on startup a worker restores every file it manages to claim.
+  """
+  def __init__(self, core: object, config: SnapshotConfigModel):
+    self.core = core
+    self.config: SnapshotConfigModel = config
+
+    self.stats = {
+      "saved": None,
+      "restored": None
+    }
+
+  @property
+  def path(self) -> Path:
+    return Path(self.core.config.resolve_path(self.config.path))
+
+  @property
+  def worker_path(self) -> Path:
+    """File written by this process."""
+    path = self.path
+    if self.core.cluster.enabled:
+      return path.with_name(f"{path.stem}-{self.core.cluster.worker_id}{path.suffix}")
+    return path
+
+  def info(self) -> dict:
+    return {
+      "enabled": self.config.enabled,
+      **self.stats
+    }
+
+  # --------------------------- Save
+  def _dump_client(self, client: Client) -> dict:
+    pubsub = self.core.pubsub
+    return {
+      "id": client.id,
+      "ui": client.ui.name,
+      "created_at": client.created_at,
+      "topics": pubsub.topics(client),
+      "connection": client.connection.dump_state(),
+      "apps": [
+        {
+          "id": app.id,
+          "name": app.name,
+          "sudo": app.sudo,
+          "created_at": app.created_at,
+          "multiplexed": app.multiplexed,
+          "topics": pubsub.topics(app),
+          # Own connection, channel events are in the client's
+          "connection": app._connection.dump_state()
+        }
+        for app in client.running_apps.values()
+      ]
+    }
+
+  def save(self) -> Optional[Path]:
+    """Write the current sessions, called on shutdown before clients are closed."""
+    if not self.config.enabled:
+      return None
+
+    clients = [self._dump_client(client) for client in self.core.clients.values()]
+    serializer = get_serializer()
+    data = serializer.dumps({
+      "version": SNAPSHOT_VERSION,
+      "saved_at": time.time(),
+      "clients": clients
+    })
+
+    path = self.worker_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Never leave a half written snapshot behind
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(data, encoding="utf-8")
+    os.replace(tmp, path)
+
+    apps = sum(len(client["apps"]) for client in clients)
+    self.stats["saved"] = {"clients": len(clients), "apps": apps}
+    logger.info(f"Sessions saved: {len(clients)} clients, {apps} apps ({path})")
+    return path
+
+  # --------------------------- Restore
+  def _claim(self) -> List[dict]:
+    """Take the snapshot files (own and other workers'), a file goes to one worker only."""
+    path = self.path
+    candidates = [path, *sorted(path.parent.glob(f"{path.stem}-*{path.suffix}"))]
+
+    states = []
+    for candidate in candidates:
+      claimed = candidate.with_name(f"{candidate.name}.{self.core.cluster.worker_id}")
+      try:
+        os.rename(candidate, claimed)
+      except OSError:
+        continue  # Missing or taken by another worker
+
+      try:
+        states.append(self._load(claimed))
+      except Exception as e:
+        logger.warning(f"Unreadable session snapshot {candidate.name}: {e}")
+      finally:
+        # One shot - a crash later must not bring back these sessions again
+        claimed.unlink(missing_ok=True)
+    return [state for state in states if state is not None]
+
+  def _load(self, path: Path) -> Optional[dict]:
+    state = get_serializer().loads(path.read_text(encoding="utf-8"))
+    if not isinstance(state, dict) or state.get("version") != SNAPSHOT_VERSION:
+      return None
+
+    age = time.time() - state.get("saved_at", 0)
+    if age > self.core.config.kikx.connection.timeout:
+      logger.info(f"Session snapshot expired ({age:.0f}s old), ignored")
+      return None
+    return state
+
+  async def _restore_client(self, state: dict) -> Client:
+    core = self.core
+    ui = state["ui"]
+    # The login token is not saved, the restored client gets a new one
+    client = Client(
+      core.user, core.config.resolve_path, core.auth.new_token(ui),
+      ClientUI(ui, core.get_ui_config(ui)), core.config.kikx, state["id"]
+    )
+    client.created_at = state["created_at"]
+    client.connection.load_state(state["connection"])
+    await core.add_client(client)
+    for topic in state["topics"]:
+      core.pubsub.subscribe(client, topic)
+
+    for app_state in state["apps"]:
+      name = app_state["name"]
+      try:
+        # Same path as a new app, limits and app:open apply
+        app = await core.open_app(
+          client.id, name, load_app_manifest(core, name), app_state["sudo"],
+          app_state["id"], app_state["connection"]
+        )
+      except Exception as e:
+        # Uninstalled / broken since the snapshot / over the limits
+        logger.warning(f"App not restored: {name} ({e})")
+        continue
+
+      app.created_at = app_state["created_at"]
+      if app_state["multiplexed"]:
+        await app.attach_channel(client.connection)
+      for topic in app_state["topics"]:
+        core.pubsub.subscribe(app, topic)
+
+    return client
+
+  async def restore(self) -> int:
+    """
+    Create the saved sessions again, called on startup.
+
+    Returns:
+      Number of clients restored.
+    """
+    if not self.config.enabled:
+      return 0
+
+    restored = apps = 0
+    clients = [client for state in self._claim() for client in state.get("clients", [])]
+    if not clients:
+      return 0
+
+    for client_state in clients:
+      if client_state["id"] in self.core.clients:
+        continue
+      try:
+        client = await self._restore_client(client_state)
+      except Exception as e:
+        logger.warning(f"Client not restored: {client_state.get('id')} ({e})")
+        continue
+      restored += 1
+      apps += len(client.running_apps)
+
+    self.stats["restored"] = {"clients": restored, "apps": apps}
+    logger.info(f"Sessions restored: {restored} clients, {apps} apps")
+    return restored
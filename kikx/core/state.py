@@ -0,0 +1,350 @@
+import time
+import asyncio
+import sqlite3
+from abc import ABC, abstractmethod
+from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.models.kikx_models import StateConfigModel
+from core.logging import Logger
+
+
+logging = Logger("kikx_state", "kikx_state.log")
+logger = logging.get_logger()
+
+
+class StateBackend(ABC):
+  """
+  Session state shared between server workers.
+
+  - access tokens (login on one worker, websocket on another), valid for token_ttl seconds
+  - session owners: client / app id -> worker id holding it in memory
+  - workers: worker id -> internal address requests are forwarded to,
+    with the time of their last heartbeat
+  - event bus: messages published by a worker, polled by the others
+
+  Methods are blocking, code on the event loop goes through run()
+  (awaited) or submit() (fire and forget), both keep call order.
+  shared is False when only one process can see the state.
+  """
+  name: str
+  shared: bool = False
+
+  def __init__(self, token_ttl: float = 24 * 60 * 60):
+    self.token_ttl = token_ttl
+
+  async def run(self, method: Callable, *args) -> Any:
+    """Call a backend method from the event loop."""
+    return method(*args)
+
+  def submit(self, method: Callable, *args) -> None:
+    """Call a backend method without waiting for it."""
+    method(*args)
+
+  # --------------------------- Tokens
+  @abstractmethod
+  def add_token(self, token: str) -> None:
+    ...
+
+  @abstractmethod
+  def pop_token(self, token: str) -> bool:
+    """Remove a token, False if it did not exist or expired."""
+    ...
+
+  @abstractmethod
+  def has_token(self, token: str) -> bool:
+    ...
+
+  @abstractmethod
+  def purge_tokens(self) -> int:
+    """Remove tokens older than token_ttl, returns how many."""
+    ...
+
+  # --------------------------- Owners
+  @abstractmethod
+  def set_owner(self, session_id: str, worker_id: str) -> None:
+    ...
+
+  @abstractmethod
+  def get_owner(self, session_id: str) -> Optional[str]:
+    ...
+
+  @abstractmethod
+  def drop_owners(self, *session_ids: str) -> None:
+    ...
+
+  # --------------------------- Workers
+  @abstractmethod
+  def add_worker(self, worker_id: str, address: str) -> None:
+    ...
+
+  @abstractmethod
+  def get_worker(self, worker_id: str) -> Optional[str]:
+    ...
+
+  @abstractmethod
+  def heartbeat(self, worker_id: str) -> bool:
+    """Mark a worker alive, False if it was dropped meanwhile."""
+    ...
+
+  @abstractmethod
+  def drop_worker(self, worker_id: str) -> None:
+    """Forget a worker and every session it owned."""
+    ...
+
+  @abstractmethod
+  def drop_dead_workers(self, timeout: float) -> List[str]:
+    """Drop workers without a heartbeat for timeout seconds (crashed), returns their ids."""
+    ...
+
+  # --------------------------- Event bus
+  @abstractmethod
+  def publish(self, worker_id: str, message: str) -> None:
+    ...
+
+  @abstractmethod
+  def poll(self, worker_id: str, after: int) -> List[Tuple[int, str]]:
+    """Messages of other workers with id greater than after, oldest first."""
+    ...
+
+  @abstractmethod
+  def last_message_id(self) -> int:
+    ...
+
+  def info(self) -> dict:
+    return {"backend": self.name, "shared": self.shared}
+
+  def close(self) -> None:
+    pass
+
+
+class MemoryStateBackend(StateBackend):
+  """In-process state, the single worker default. Nothing to publish to."""
+  name = "memory"
+
+  def __init__(self, token_ttl: float = 24 * 60 * 60):
+    super().__init__(token_ttl)
+    # token -> created
+    self._tokens: Dict[str, float] = {}
+    self._owners: Dict[str, str] = {}
+    # worker id -> (address, last heartbeat)
+    self._workers: Dict[str, Tuple[str, float]] = {}
+
+  def add_token(self, token: str) -> None:
+    self._tokens[token] = time.time()
+
+  def pop_token(self, token: str) -> bool:
+    created = self._tokens.pop(token, None)
+    return created is not None and created >= time.time() - self.token_ttl
+
+  def has_token(self, token: str) -> bool:
+    created = self._tokens.get(token)
+    return created is not None and created >= time.time() - self.token_ttl
+
+  def purge_tokens(self) -> int:
+    expired = time.time() - self.token_ttl
+    tokens = [token for token, created in self._tokens.items() if created < expired]
+    for token in tokens:
+      del self._tokens[token]
+    return len(tokens)
+
+  def set_owner(self, session_id: str, worker_id: str) -> None:
+    self._owners[session_id] = worker_id
+
+  def get_owner(self, session_id: str) -> Optional[str]:
+    return self._owners.get(session_id)
+
+  def drop_owners(self, *session_ids: str) -> None:
+    for session_id in session_ids:
+      self._owners.pop(session_id, None)
+
+  def add_worker(self, worker_id: str, address: str) -> None:
+    self._workers[worker_id] = (address, time.time())
+
+  def get_worker(self, worker_id: str) -> Optional[str]:
+    worker = self._workers.get(worker_id)
+    return worker[0] if worker else None
+
+  def heartbeat(self, worker_id: str) -> bool:
+    worker = self._workers.get(worker_id)
+    if worker is None:
+      return False
+    self._workers[worker_id] = (worker[0], time.time())
+    return True
+
+  def drop_worker(self, worker_id: str) -> None:
+    self._workers.pop(worker_id, None)
+    for session_id in [k for k, v in self._owners.items() if v == worker_id]:
+      del self._owners[session_id]
+
+  def drop_dead_workers(self, timeout: float) -> List[str]:
+    dead_before = time.time() - timeout
+    dead = [worker_id for worker_id, (_, seen) in self._workers.items() if seen < dead_before]
+    for worker_id in dead:
+      self.drop_worker(worker_id)
+    return dead
+
+  def publish(self, worker_id: str, message: str) -> None:
+    pass
+
+  def poll(self, worker_id: str, after: int) -> List[Tuple[int, str]]:
+    return []
+
+  def last_message_id(self) -> int:
+    return 0
+
+  def info(self) -> dict:
+    return {
+      **super().info(),
+      "tokens": len(self._tokens),
+      "owners": len(self._owners)
+    }
+
+
+class SQLiteStateBackend(StateBackend):
+  """
+  State in a local SQLite database (WAL), shared by the workers of one box.
+  Bus messages are kept message_ttl seconds, long enough for every worker's poll.
+  Queries run on one dedicated thread so the event loop never waits on
+  the database lock, info() counts are refreshed by drop_dead_workers().
+  """
+  name = "sqlite"
+  shared = True
+
+  SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tokens (token TEXT PRIMARY KEY, created REAL NOT NULL);
+    CREATE INDEX IF NOT EXISTS tokens_created ON tokens (created);
+    CREATE TABLE IF NOT EXISTS owners (session_id TEXT PRIMARY KEY, worker_id TEXT NOT NULL);
+    CREATE INDEX IF NOT EXISTS owners_worker ON owners (worker_id);
+    CREATE TABLE IF NOT EXISTS workers (worker_id TEXT PRIMARY KEY, address TEXT NOT NULL, started REAL NOT NULL);
+    CREATE TABLE IF NOT EXISTS messages (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      worker_id TEXT NOT NULL,
+      message TEXT NOT NULL,
+      created REAL NOT NULL
+    );
+  """
+
+  def __init__(self, path: Path, message_ttl: float = 60, token_ttl: float = 24 * 60 * 60):
+    super().__init__(token_ttl)
+    self.path = Path(path)
+    self.message_ttl = message_ttl
+    self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Autocommit, every statement is its own short transaction
+    self._db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=5)
+    self._db.execute("PRAGMA journal_mode=WAL")
+    self._db.execute("PRAGMA synchronous=NORMAL")
+    self._db.executescript(self.SCHEMA)
+    try:
+      # Databases created before heartbeats
+      self._db.execute("ALTER TABLE workers ADD COLUMN seen REAL NOT NULL DEFAULT 0")
+    except sqlite3.OperationalError:
+      pass
+
+    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kikx-state")
+    self._counts: Dict[str, int] = {}
+
+  async def run(self, method: Callable, *args) -> Any:
+    return await asyncio.get_running_loop().run_in_executor(self._executor, method, *args)
+
+  def submit(self, method: Callable, *args) -> None:
+    self._executor.submit(method, *args).add_done_callback(self._on_submitted)
+
+  @staticmethod
+  def _on_submitted(future: Future) -> None:
+    if future.exception() is not None:
+      logger.warning(f"State write failed: {future.exception()}")
+
+  def _one(self, query: str, *args) -> Optional[tuple]:
+    return self._db.execute(query, args).fetchone()
+
+  def add_token(self, token: str) -> None:
+    self._db.execute("INSERT OR IGNORE INTO tokens VALUES (?, ?)", (token, time.time()))
+
+  def pop_token(self, token: str) -> bool:
+    return self._db.execute(
+      "DELETE FROM tokens WHERE token = ? AND created >= ?", (token, time.time() - self.token_ttl)
+    ).rowcount > 0
+
+  def has_token(self, token: str) -> bool:
+    return self._one("SELECT 1 FROM tokens WHERE token = ? AND created >= ?", token, time.time() - self.token_ttl) is not None
+
+  def purge_tokens(self) -> int:
+    return self._db.execute("DELETE FROM tokens WHERE created < ?", (time.time() - self.token_ttl,)).rowcount
+
+  def set_owner(self, session_id: str, worker_id: str) -> None:
+    self._db.execute("INSERT OR REPLACE INTO owners VALUES (?, ?)", (session_id, worker_id))
+
+  def get_owner(self, session_id: str) -> Optional[str]:
+    row = self._one("SELECT worker_id FROM owners WHERE session_id = ?", session_id)
+    return row[0] if row else None
+
+  def drop_owners(self, *session_ids: str) -> None:
+    self._db.executemany("DELETE FROM owners WHERE session_id = ?", [(s,) for s in session_ids])
+
+  def add_worker(self, worker_id: str, address: str) -> None:
+    now = time.time()
+    self._db.execute(
+      "INSERT OR REPLACE INTO workers (worker_id, address, started, seen) VALUES (?, ?, ?, ?)",
+      (worker_id, address, now, now)
+    )
+
+  def get_worker(self, worker_id: str) -> Optional[str]:
+    row = self._one("SELECT address FROM workers WHERE worker_id = ?", worker_id)
+    return row[0] if row else None
+
+  def heartbeat(self, worker_id: str) -> bool:
+    return self._db.execute("UPDATE workers SET seen = ? WHERE worker_id = ?", (time.time(), worker_id)).rowcount > 0
+
+  def drop_worker(self, worker_id: str) -> None:
+    self._db.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+    self._db.execute("DELETE FROM owners WHERE worker_id = ?", (worker_id,))
+
+  def drop_dead_workers(self, timeout: float) -> List[str]:
+    now = time.time()
+    dead = [row[0] for row in self._db.execute("SELECT worker_id FROM workers WHERE seen < ?", (now - timeout,))]
+    for worker_id in dead:
+      self.drop_worker(worker_id)
+    # Periodic housekeeping of the other tables as well
+    self._db.execute("DELETE FROM messages WHERE created < ?", (now - self.message_ttl,))
+    self._counts = {
+      "tokens": self._one("SELECT COUNT(*) FROM tokens")[0],
+      "owners": self._one("SELECT COUNT(*) FROM owners")[0],
+      "workers": self._one("SELECT COUNT(*) FROM workers")[0]
+    }
+    return dead
+
+  def publish(self, worker_id: str, message: str) -> None:
+    self._db.execute(
+      "INSERT INTO messages (worker_id, message, created) VALUES (?, ?, ?)",
+      (worker_id, message, time.time())
+    )
+
+  def poll(self, worker_id: str, after: int) -> List[Tuple[int, str]]:
+    return self._db.execute(
+      "SELECT id, message FROM messages WHERE id > ? AND worker_id != ? ORDER BY id",
+      (after, worker_id)
+    ).fetchall()
+
+  def last_message_id(self) -> int:
+    row = self._one("SELECT MAX(id) FROM messages")
+    return row[0] or 0
+
+  def info(self) -> dict:
+    return {
+      **super().info(),
+      **self._counts
+    }
+
+  def close(self) -> None:
+    # Pending writes first
+    self._executor.shutdown(wait=True)
+    self._db.close()
+
+
+def create_state_backend(config: StateConfigModel, resolve_path: callable) -> StateBackend:
+  if config.backend == "sqlite":
+    return SQLiteStateBackend(resolve_path(config.path), config.message_ttl, config.token_ttl)
+  return MemoryStateBackend(config.token_ttl)
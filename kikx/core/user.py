@@ -1,6 +1,6 @@
 import os
 import logging
-from typing import Any
+from typing import Any, Optional
 from pathlib import Path
 from datetime import datetime
 
@@ -9,6 +9,7 @@ from lib.parser import parse_config
 
 from core.models.user_models import UserDataModel
 from core.models.app_models import AppManifestModel, AppModel
+from core.catalog import AppCatalog
 
 
 
@@ -18,7 +19,8 @@ class User:
     user_config: Any,
     user_data_path: Path,
     home_path: Path,
-    storage_path: Path
+    storage_path: Path,
+    catalog: Optional[AppCatalog] = None
   ):
     self.config = user_config
     self.username: str = user_config.name
@@ -34,6 +36,9 @@ class User:
     self.apps_path = (self.storage_path / "apps").resolve()
     self.apps_data_path = (self.data_path / "app").resolve()
 
+    # Parsed manifests / configs of installed apps
+    self.catalog: AppCatalog = catalog or AppCatalog(self.apps_path, self.apps_data_path)
+
   # storage/bin path
   def get_path_env(self) -> str:
     return (self.storage_path / 'bin').as_posix()
@@ -50,27 +55,22 @@ class User:
   # Return installed apps in list
   def get_installed_apps(self) -> list[str]:
     """Return installed apps list"""
-    return [path.name for path in self.apps_path.iterdir() if path.is_dir()]
+    return list(self.catalog.names())
   
   # if not found raise error
   def check_app_exists(self, app_name: str):
-    if app_name not in self.get_installed_apps():
+    if not self.catalog.exists(app_name):
       raise Exception("App not found")
 
   # Return app manifest if not found raise error
   def load_app_manifest(self, app_name: str) -> AppManifestModel:
-    # raise if not found
-    self.check_app_exists(app_name)
-
-    manifest_path = joinpath(self.apps_path, app_name, "app.json")
-    return parse_config(manifest_path, AppManifestModel)
+    # raise if not found, parsed once per file change
+    return self.catalog.manifest(app_name)
 
   # Return app config if not found raise error
   def load_app_config(self, app_name: str) -> AppModel:
-    # raise if not found
-    self.check_app_exists(app_name)
-
-    return parse_config(self.get_app_config_file_path(app_name), AppModel)
+    # raise if not found, parsed once per file change
+    return self.catalog.config(app_name)
 
   async def on_close(self, core) -> None:
     pass
@@ -1,9 +1,10 @@
+import os
 import logging
 import sys
 
 from os import getcwd
 from subprocess import Popen, PIPE
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -84,3 +85,59 @@ def sh(cmd: str) -> ProcessBuilder:
   Entry point for building and running a shell process.
   """
   return ProcessBuilder(cmd)
+
+
+# -------------------------------------
+# Resource usage (Linux /proc)
+# -------------------------------------
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def read_process_usage(pid: int) -> Optional[Tuple[float, int]]:
+  """
+  CPU time and resident memory of one process.
+
+  Returns:
+    (user + system CPU seconds, RSS bytes), None if the process is gone
+    or /proc is not available.
+  """
+  try:
+    with open(f"/proc/{pid}/stat", "rb") as file:
+      data = file.read()
+  except OSError:
+    return None
+
+  # comm (field 2) may contain spaces and parens, fields after it start at state (3)
+  fields = data[data.rindex(b")") + 2:].split()
+  utime, stime, rss = int(fields[11]), int(fields[12]), int(fields[21])
+  return (utime + stime) / CLOCK_TICKS, rss * PAGE_SIZE
+
+
+def child_pids(pid: int) -> List[int]:
+  """Direct children of a process (all its threads)."""
+  children = []
+  try:
+    for tid in os.listdir(f"/proc/{pid}/task"):
+      with open(f"/proc/{pid}/task/{tid}/children") as file:
+        children.extend(int(child) for child in file.read().split())
+  except OSError:
+    pass
+  return children
+
+
+def process_tree_usage(pid: int) -> Dict[str, float]:
+  """CPU seconds, RSS bytes and process count of a process and its descendants."""
+  usage = {"cpu": 0.0, "rss": 0, "processes": 0}
+  pending = [pid]
+  while pending:
+    current = pending.pop()
+    sample = read_process_usage(current)
+    if sample is None:
+      continue
+    usage["cpu"] += sample[0]
+    usage["rss"] += sample[1]
+    usage["processes"] += 1
+    pending.extend(child_pids(current))
+  return usage
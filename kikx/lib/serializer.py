@@ -0,0 +1,163 @@
+import json
+import logging
+
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+try:
+  import orjson
+except ImportError:  # optional, faster encoder
+  orjson = None
+
+try:
+  import msgpack
+except ImportError:  # optional, binary websocket protocol
+  msgpack = None
+
+
+logger = logging.getLogger(__name__)
+
+# Websocket subprotocols
+JSON_PROTOCOL = "kikx.json"
+MSGPACK_PROTOCOL = "kikx.msgpack"
+
+
+def _default(obj: Any) -> Any:
+  """Fallback for objects the encoders don't know (pydantic models, sets)."""
+  if isinstance(obj, EncodedPayload):
+    # Nested in another payload (multiplexed channels), encoded in place
+    return obj.payload
+  if hasattr(obj, "model_dump"):
+    return obj.model_dump()
+  if isinstance(obj, (set, frozenset)):
+    return list(obj)
+  raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class JSONSerializer:
+  """Standard library json encoder."""
+  name = "json"
+  binary = False
+
+  def dumps(self, obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default)
+
+  def loads(self, data: Union[str, bytes]) -> Any:
+    return json.loads(data)
+
+  # Build containers from already encoded values
+  def join_map(self, items: List[Tuple[str, str]]) -> str:
+    return "{" + ",".join(f"{self.dumps(key)}:{value}" for key, value in items) + "}"
+
+  def join_array(self, items: List[str]) -> str:
+    return "[" + ",".join(items) + "]"
+
+
+class ORJSONSerializer(JSONSerializer):
+  """orjson encoder, used when installed."""
+  name = "orjson"
+
+  def dumps(self, obj: Any) -> str:
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+  def loads(self, data: Union[str, bytes]) -> Any:
+    return orjson.loads(data)
+
+
+class MsgPackSerializer:
+  """MessagePack encoder for the binary websocket protocol."""
+  name = "msgpack"
+  binary = True
+
+  def __init__(self):
+    self._packer = msgpack.Packer(default=_default, use_bin_type=True)
+
+  def dumps(self, obj: Any) -> bytes:
+    return self._packer.pack(obj)
+
+  def loads(self, data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False)
+
+  # Build containers from already encoded values
+  def join_map(self, items: List[Tuple[str, bytes]]) -> bytes:
+    return self._packer.pack_map_header(len(items)) + b"".join(self.dumps(key) + value for key, value in items)
+
+  def join_array(self, items: List[bytes]) -> bytes:
+    return self._packer.pack_array_header(len(items)) + b"".join(items)
+
+
+_serializer: JSONSerializer = ORJSONSerializer() if orjson else JSONSerializer()
+_msgpack_serializer: Optional[MsgPackSerializer] = MsgPackSerializer() if msgpack else None
+
+
+def create_serializer(name: str = "auto") -> JSONSerializer:
+  """
+  Create a serializer by name.
+
+  Args:
+    name: 'auto' (orjson if installed), 'orjson' or 'json'.
+
+  Returns:
+    Serializer instance, falls back to json if orjson is missing.
+  """
+  if name in ("auto", "orjson") and orjson is not None:
+    return ORJSONSerializer()
+
+  if name == "orjson":
+    logger.warning("orjson is not installed, falling back to json")
+  return JSONSerializer()
+
+
+def get_serializer() -> JSONSerializer:
+  """Return the serializer used for JSON websocket events."""
+  return _serializer
+
+
+def set_serializer(serializer: Union[str, JSONSerializer]) -> None:
+  """
+  Set the serializer used for JSON websocket events.
+
+  Args:
+    serializer: Serializer name or instance with dumps / loads.
+  """
+  global _serializer
+  _serializer = create_serializer(serializer) if isinstance(serializer, str) else serializer
+
+
+def negotiate_protocol(requested: List[str], allow_binary: bool = True) -> Optional[str]:
+  """
+  Pick the websocket subprotocol to accept, in the client's order of preference.
+
+  Args:
+    requested: Subprotocols offered by the client.
+    allow_binary: Whether the binary protocol may be selected.
+
+  Returns:
+    Accepted subprotocol or None for plain JSON (old clients).
+  """
+  for protocol in requested:
+    if protocol == MSGPACK_PROTOCOL and allow_binary and _msgpack_serializer is not None:
+      return protocol
+    if protocol == JSON_PROTOCOL:
+      return protocol
+  return None
+
+
+def get_protocol_serializer(protocol: Optional[str]) -> Union[JSONSerializer, MsgPackSerializer]:
+  """Return the serializer for a negotiated subprotocol."""
+  if protocol == MSGPACK_PROTOCOL and _msgpack_serializer is not None:
+    return _msgpack_serializer
+  return _serializer
+
+
+class EncodedPayload:
+  """Payload serialized once per encoding and shared by every message it is sent in."""
+
+  def __init__(self, payload: Any):
+    self.payload = payload
+    self._encoded: Dict[str, Union[str, bytes]] = {}
+
+  def encode(self, serializer: Union[JSONSerializer, MsgPackSerializer]) -> Union[str, bytes]:
+    data = self._encoded.get(serializer.name)
+    if data is None:
+      data = self._encoded[serializer.name] = serializer.dumps(self.payload)
+    return data
@@ -89,14 +89,18 @@ class KikxService:
     core = self.get_core()
     payload = { "signal": signal, "payload": payload }
     
-    await core.broadcast_client_event("signal", payload)
+    await core.broadcast_to_clients("signal", payload)
   
   # broadcast to all running apps - for all clients / client
   async def broadcast_signal_to_apps(self, signal: str, payload: dict, client_id: str | None = None) -> None:
     core = self.get_core()
     payload = { "signal": signal, "payload": payload }
 
-    await core.broadcast_app_event("signal", payload, client_id)
+    await core.broadcast_to_apps("signal", payload, client_id)
+
+  # publish to clients / apps subscribed to the signal
+  async def publish_signal(self, signal: str, payload: dict) -> int:
+    return await self.get_core().publish_signal(signal, payload)
 
 
 def create_service(file: str) -> KikxService:
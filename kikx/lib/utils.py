@@ -9,9 +9,9 @@ from importlib import import_module
 from datetime import datetime, timezone
 from importlib import util as importlib_util
 
-from typing import Any, Callable, Union
+from typing import Any, Optional, Tuple
 
-from fastapi import WebSocket, HTTPException
+from fastapi import WebSocket, WebSocketDisconnect, HTTPException, Request
 from fastapi.responses import FileResponse
 
 from starlette.websockets import WebSocketState
@@ -19,6 +19,8 @@ from starlette.websockets import WebSocketState
 from packaging.version import Version, InvalidVersion
 from packaging.specifiers import SpecifierSet, InvalidSpecifier
 
+from .serializer import get_serializer, get_protocol_serializer
+
 
 
 async def any_run(func, *args, **kwargs):
@@ -121,23 +123,84 @@ def is_websocket_connected(ws: WebSocket) -> bool:
   """
   return isinstance(ws, WebSocket) and ws.client_state == WebSocketState.CONNECTED
 
-async def send_event(websocket: WebSocket, event: str, payload: Union[dict, Callable[[], dict]]) -> None:
+# Attributes the uvicorn websocket protocols keep the keepalive round trip in
+RTT_ATTRIBUTES = ("last_ping_rtt", "latency")
+
+def _closure_callable(function: Any) -> Optional[Any]:
+  """First callable captured by function's closure (empty cells skipped)."""
+  for cell in getattr(function, "__closure__", None) or ():
+    try:
+      value = cell.cell_contents
+    except ValueError:
+      continue
+    if callable(value):
+      return value
+  return None
+
+def get_websocket_protocol(ws: WebSocket, depth: int = 8) -> Optional[object]:
+  """
+  Find the server's websocket protocol instance behind an ASGI websocket.
+
+  ASGI has no scope key or extension exposing the transport, so this relies
+  on uvicorn internals: the send callable handed to the app is a bound method
+  of the protocol (WebSocketProtocol.asgi_send in websockets_impl, .send in
+  websockets_sansio_impl and wsproto_impl), possibly wrapped in middleware
+  closures which are unwrapped up to depth levels.
+
+  RTT is exposed as `latency` by the legacy websockets backend and as
+  `last_ping_rtt` by websockets-sansio (and by wsproto on recent uvicorn only),
+  any other server or backend gets None and the latency is left unknown.
+
+  Returns:
+    The protocol object, or None if not found or it keeps no RTT.
+  """
+  send = getattr(ws, "_send", None)
+  for _ in range(depth):
+    if send is None:
+      return None
+    owner = getattr(send, "__self__", None)
+    if owner is not None:
+      return owner if any(hasattr(owner, attr) for attr in RTT_ATTRIBUTES) else None
+    send = _closure_callable(send)
+  return None
+
+def get_protocol_latency(protocol: Optional[object]) -> Optional[float]:
+  """
+  Round trip time of the last protocol-level keepalive ping.
+
+  Args:
+    protocol: Object returned by get_websocket_protocol.
+
+  Returns:
+    Seconds, or None if the server's websocket implementation doesn't expose it.
+  """
+  for attr in RTT_ATTRIBUTES:
+    value = getattr(protocol, attr, None)
+    if isinstance(value, (int, float)) and value > 0:
+      return float(value)
+  return None
+
+async def receive_message(websocket: WebSocket, protocol: Optional[str] = None) -> Tuple[Any, int]:
   """
-  Send a JSON event to a WebSocket client.
+  Receive and decode one message from a WebSocket client.
 
   Args:
     websocket: WebSocket connection.
-    event: Event name string.
-    payload: Dict or callable returning a dict.
+    protocol: Negotiated subprotocol, decides how binary frames are decoded.
+
+  Returns:
+    Decoded message (text frames are always JSON) and its size
+    (characters for text frames, bytes for binary ones).
   """
-  if is_websocket_connected(websocket):
-    try:
-      await websocket.send_json({
-        "event": event,
-        "payload": payload() if callable(payload) else payload
-      })
-    except Exception:
-      pass
+  message = await websocket.receive()
+  if message["type"] == "websocket.disconnect":
+    raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+
+  text = message.get("text")
+  if text is not None:
+    return get_serializer().loads(text), len(text)
+  data = message["bytes"]
+  return get_protocol_serializer(protocol).loads(data), len(data)
 
 def convert_to_base64(data: bytes) -> str:
   """
@@ -181,6 +244,22 @@ def file_response(base: str | Path, *paths: str | Path) -> Path:
 
   return FileResponse(full_path)
 
+def etag_matches(request: Request, etag: str) -> bool:
+  """
+  Check a request's If-None-Match header against an ETag.
+
+  Args:
+    request: Incoming request.
+    etag: Current ETag of the resource (quoted).
+
+  Returns:
+    True if the client already has this version (respond 304).
+  """
+  header = request.headers.get("if-none-match")
+  if not header:
+    return False
+  return header.strip() == "*" or etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
 def joinpath(base: str | Path, *parts: str | Path) -> Path:
   base = Path(base).resolve()
   target = base.joinpath(*parts).resolve()
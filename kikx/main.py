@@ -1,5 +1,47 @@
+import os
+import asyncio
+from importlib.util import find_spec
+
 from core.kikx import kikx_app, core
+from core.core import WORKER_ENV
+from core.setup import pre_check_apps
 from core.console import Console
+from core.models.kikx_models import ServerModel
+
+
+# Packages behind the optional server implementations
+OPTIONAL_IMPLEMENTATIONS = {
+  "uvloop": "uvloop",
+  "httptools": "httptools",
+  "websockets": "websockets",
+  "websockets-sansio": "websockets",
+  "wsproto": "wsproto"
+}
+
+def server_options(server_config: ServerModel) -> dict:
+  """uvicorn tuning options, an implementation whose package is missing falls back to auto."""
+  options = {}
+  for option in ("loop", "http", "ws"):
+    value = getattr(server_config, option)
+    package = OPTIONAL_IMPLEMENTATIONS.get(value)
+    if package is not None and find_spec(package) is None:
+      core.scr.print(f"[x] server.{option} '{value}' needs {package} (not installed), using 'auto'")
+      value = "auto"
+    options[option] = value
+
+  return {
+    **options,
+    "backlog": server_config.backlog,
+    "timeout_keep_alive": server_config.timeout_keep_alive,
+    "limit_concurrency": server_config.limit_concurrency
+  }
+
+
+def create_supervisor(config):
+  """Multi-worker supervisor, every worker process builds its own uvicorn Server from config."""
+  from uvicorn.supervisors import Multiprocess
+
+  return Multiprocess(config, sockets=[config.bind_socket()])
 
 
 def run_server():
@@ -8,21 +50,39 @@ def run_server():
   core._dev_mode = False
 
   server_config = core.config.kikx.server
+  connection_config = core.config.kikx.connection
+
+  workers = server_config.workers
+  if workers > 1 and not core.state.shared:
+    # Sessions would be split between processes that can't see each other
+    core.scr.print("[x] workers > 1 needs state.backend 'sqlite', running a single worker")
+    workers = 1
 
   config = uvicorn.Config(
-    app=kikx_app,
+    # Workers import the app themselves
+    app="core.kikx:kikx_app" if workers > 1 else kikx_app,
     host=server_config.host,
     port=server_config.port,
-    workers=1,
+    workers=workers,
     log_level=server_config.log_level,
+    # Protocol-level keepalive, dead peers are dropped and resume on reconnect
+    ws_ping_interval=connection_config.ping_interval,
+    ws_ping_timeout=connection_config.ping_timeout,
+    # loop / http / ws implementations, backlog, keep-alive, concurrency limit
+    **server_options(server_config)
   )
-  
-  core.scr.print_banner(core.version, core.author)
 
-  server = uvicorn.Server(config)
+  core.scr.print_banner(core.version, core.author)
 
   try:
-    server.run()
+    if workers > 1:
+      # Done once here instead of in every worker
+      asyncio.run(pre_check_apps(core))
+      os.environ[WORKER_ENV] = "1"
+      create_supervisor(config).run()
+      core.run_script("shutdown.sh")
+    else:
+      uvicorn.Server(config).run()
   except KeyboardInterrupt:
     print("Bye :)")
 
@@ -4,27 +4,23 @@ from typing import Literal, Optional
 
 from fastapi import Request, HTTPException
 
-from core.func.func import FuncXModel
+from core.func.func import FuncXModel, FuncXBatchModel, FuncXNotFound, FuncXTimeout
+from core.limits import LimitExceeded
 
 from lib.utils import get_timestamp
 from lib.service import create_service
 
 from .routes import info, app
-from .models import NotifyModel, UserSettingsModel, AlertModel, ClientAppEventModel
+from .models import NotifyModel, UserSettingsModel, AlertModel, ClientAppEventModel, SubscribeModel
 
 
 
 srv = create_service(__file__)
 
 
-async def broadcast_signal(signal: str, data: dict) -> None:
-  core = srv.get_core()
-  payload = { "signal": signal, "data": data }
-
-  for client in core.clients.values():
-    await client.send_event("signal", payload)
-    for a in client.running_apps.values():
-      await a.send_event("signal", payload)
+# Reaches only clients / apps subscribed to the signal
+async def broadcast_signal(signal: str, data: dict) -> int:
+  return await srv.get_core().publish_signal(signal, data)
 
 # ------ App FuncX 
 @srv.router.post("/app/func")
@@ -35,18 +31,48 @@ async def app_func(request: Request, app_func_model: FuncXModel):
 
   try:
     return await app.run_function(app_func_model)
+  except (LimitExceeded, FuncXNotFound, FuncXTimeout) as e:
+    raise HTTPException(status_code=e.status_code, detail=str(e))
   except Exception as e:
     raise HTTPException(status_code=500, detail=str(e))
 
+# Many calls in one request, failures are reported per call
+@srv.router.post("/app/func/batch")
+async def app_func_batch(request: Request, batch: FuncXBatchModel):
+  client, app = srv.get_client_app(request)
+  if not app.config.system.check("funcx"):
+    raise HTTPException(status_code=403, detail="Permission denied")
+  return { "results": await app.run_batch(batch) }
+
+# Exposed functions (name, signature, doc) of the app and its modules
+@srv.router.get("/app/funcx")
+async def app_funcx(request: Request):
+  client, app = srv.get_client_app(request)
+  if not app.config.system.check("funcx"):
+    raise HTTPException(status_code=403, detail="Permission denied")
+  return { "functions": app.list_functions() }
+
 # ------ Client FuncX 
 @srv.router.post("/client/func")
 async def client_func(request: Request, client_func_model: FuncXModel):
   client = srv.get_client(request)
   try:
     return await client.run_function(client_func_model)
+  except (LimitExceeded, FuncXNotFound, FuncXTimeout) as e:
+    raise HTTPException(status_code=e.status_code, detail=str(e))
   except Exception as e:
     raise HTTPException(status_code=500, detail=str(e),)
 
+@srv.router.post("/client/func/batch")
+async def client_func_batch(request: Request, batch: FuncXBatchModel):
+  client = srv.get_client(request)
+  return { "results": await client.run_batch(batch) }
+
+@srv.router.get("/client/funcx")
+async def client_funcx(request: Request):
+  client = srv.get_client(request)
+  return { "functions": client.list_functions() }
+
 # ------ Sending app close event to client
 @srv.router.post("/close-app") # triggers app for closing itself
 async def close_app(request: Request) -> None:
@@ -78,6 +104,26 @@ async def client_app_event(request: Request, payload: ClientAppEventModel):
     "payload": payload.payload
   })
 
+# ------ Signal subscriptions (client or app)
+@srv.router.post("/subscribe")
+async def subscribe(request: Request, payload: SubscribeModel):
+  client, app = srv.get_client_or_app(request)
+  pubsub = srv.get_core().pubsub
+  try:
+    for topic in payload.topics:
+      pubsub.subscribe(app or client, topic)
+  except ValueError as e:
+    raise HTTPException(status_code=400, detail=str(e))
+  return { "topics": pubsub.topics(app or client) }
+
+@srv.router.post("/unsubscribe")
+async def unsubscribe(request: Request, payload: SubscribeModel):
+  client, app = srv.get_client_or_app(request)
+  pubsub = srv.get_core().pubsub
+  for topic in payload.topics:
+    pubsub.unsubscribe(app or client, topic)
+  return { "topics": pubsub.topics(app or client) }
+
 # ------ Notify
 @srv.router.post("/notify")
 async def notify(request: Request, payload: NotifyModel) -> None:
@@ -20,6 +20,9 @@ class AlertModel(BaseModel):
 class UserSettingsModel(BaseModel):
   settings: dict
 
+class SubscribeModel(BaseModel):
+  topics: List[str]
+
 class ClientAppEventModel(BaseModel):
   app_id: str
   event: str
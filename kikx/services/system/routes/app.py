@@ -16,9 +16,11 @@ from lib.hash import hash_file
 from urllib.parse import urlparse
 from core.kpm import GITHUB_API, AppInstaller, AppUninstaller, resolve_app_package, parse_github_repo
 
-from fastapi import APIRouter, Request, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, Request, Response, UploadFile, File, HTTPException, Depends
 from fastapi.responses import FileResponse
 
+from lib.utils import etag_matches
+
 
 
 class AppInstallRoute(BaseModel):
@@ -60,15 +62,22 @@ def get_installed_app(app_name, core):
 
 # Return apps / app
 @router.get("/installed-apps")
-async def get_installed_apps(app_name: Optional[str] = None, core = Depends(check_permisson)):
+async def get_installed_apps(request: Request, response: Response, app_name: Optional[str] = None, core = Depends(check_permisson)):
   try:
     if app_name is None:
-      return [get_installed_app(name, core) for name in core.user.get_installed_apps()]
-    
-    return get_installed_app(app_name, core)
+      result = core.catalog.manifests()
+    else:
+      result = get_installed_app(app_name, core)
   except Exception as e:
     raise HTTPException(status_code=404, detail=str(e))
 
+  etag = core.catalog.etag
+  if etag_matches(request, etag):
+    return Response(status_code=304, headers={"ETag": etag})
+
+  response.headers["ETag"] = etag
+  return result
+
 
 @router.post("/prepare-install")
 async def prepare_install(file: UploadFile = File(...), core = Depends(check_permisson)):
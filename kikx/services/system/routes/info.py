@@ -1,5 +1,12 @@
+from typing import Literal, Optional
+
 from fastapi import APIRouter, Request, HTTPException
 
+from core.apps.registry import module_registry
+from core.apps.env import env_cache
+from core.limits import limits
+from core.func import funcx_cache_info
+
 class ServiceRouter(APIRouter):
   def __init__(self):
     super().__init__()
@@ -10,8 +17,14 @@ class ServiceRouter(APIRouter):
 
 router = ServiceRouter()
 
+# Usage keys sessions can be sorted by (descending)
+SESSION_SORT = Literal["cpu", "rss", "processes", "tasks", "bytes_in", "bytes_out", "queued", "funcx", "funcx_calls"]
+
+def round_usage(usage: dict) -> dict:
+  return {**usage, "cpu": round(usage["cpu"], 2)}
+
 @router.get("/")
-async def get_sessions(request: Request):
+async def get_sessions(request: Request, sort: Optional[SESSION_SORT] = None):
   srv = router.get_srv()
   client, app = srv.get_client_or_app(request)
   if app and not app.config.system.check("sessions"):
@@ -20,17 +33,47 @@ async def get_sessions(request: Request):
   core = srv.get_core()
 
   def sessions_details(client):
+    apps = [{"id": app.id, "name": app.name, "usage": round_usage(app.usage())} for app in client.running_apps.values()]
+    if sort:
+      apps.sort(key=lambda app: app["usage"][sort], reverse=True)
     return {
       "id": client.id,
-      "apps_count": len(client.running_apps)
+      "apps_count": len(client.running_apps),
+      # Task processes (sampled from /proc), websocket traffic, funcx calls
+      "usage": round_usage(client.usage()),
+      "apps": apps
     }
 
   sessions = [sessions_details(v) for k, v in core.clients.items() if k != client.id]
+  if sort:
+    sessions.sort(key=lambda session: session["usage"][sort], reverse=True)
   # ---- fetch client info
   return {
     "sessions": sessions
   }
 
+# Server wide counters of the core subsystems
+def server_info(core) -> dict:
+  return {
+    "reaper": core.reaper.info(),
+    "snapshot": core.snapshot.info(),
+    "cluster": core.cluster.info(),
+    "limits": limits.info(),
+    "pubsub": core.pubsub.info(),
+    "funcx_cache": funcx_cache_info(),
+    "modules": module_registry.info(),
+    "task_env": env_cache.info()
+  }
+
+@router.get("/server")
+async def get_server_info(request: Request):
+  srv = router.get_srv()
+  client, app = srv.get_client_or_app(request)
+  if app and not app.config.system.check("info"):
+    raise HTTPException(status_code=403, detail="Permission denied")
+
+  return server_info(srv.get_core())
+
 @router.post("/session/close/{session_id}")
 async def close_session(request: Request, session_id: str):
   srv = router.get_srv()
@@ -111,6 +111,171 @@
     });
   }
 
+  // Minimal MessagePack codec used by the binary websocket protocol
+  const msgpack = (() => {
+    const textEncoder = new TextEncoder();
+    const textDecoder = new TextDecoder();
+
+    function encode(value) {
+      const parts = [];
+      let size = 0;
+
+      const push = bytes => {
+        parts.push(bytes);
+        size += bytes.length;
+      };
+      const header = (...bytes) => push(Uint8Array.from(bytes));
+      const u16 = n => [(n >>> 8) & 0xff, n & 0xff];
+      const u32 = n => [(n >>> 24) & 0xff, (n >>> 16) & 0xff, (n >>> 8) & 0xff, n & 0xff];
+
+      const write = v => {
+        if (v === null || v === undefined) {
+          header(0xc0);
+        } else if (typeof v === "boolean") {
+          header(v ? 0xc3 : 0xc2);
+        } else if (typeof v === "number") {
+          if (Number.isInteger(v) && v >= -32 && v < 128) header(v & 0xff);
+          else if (Number.isInteger(v) && v >= 0 && v <= 0xffffffff) header(0xce, ...u32(v));
+          else if (Number.isInteger(v) && v < 0 && v >= -0x80000000) header(0xd2, ...u32(v));
+          else {
+            const view = new DataView(new ArrayBuffer(9));
+            view.setUint8(0, 0xcb);
+            view.setFloat64(1, v);
+            push(new Uint8Array(view.buffer));
+          }
+        } else if (typeof v === "string") {
+          const bytes = textEncoder.encode(v);
+          const n = bytes.length;
+          if (n < 32) header(0xa0 | n);
+          else if (n < 0x100) header(0xd9, n);
+          else if (n < 0x10000) header(0xda, ...u16(n));
+          else header(0xdb, ...u32(n));
+          push(bytes);
+        } else if (v instanceof Uint8Array || v instanceof ArrayBuffer) {
+          const bytes = v instanceof ArrayBuffer ? new Uint8Array(v) : v;
+          const n = bytes.length;
+          if (n < 0x100) header(0xc4, n);
+          else if (n < 0x10000) header(0xc5, ...u16(n));
+          else header(0xc6, ...u32(n));
+          push(bytes);
+        } else if (Array.isArray(v)) {
+          const n = v.length;
+          if (n < 16) header(0x90 | n);
+          else if (n < 0x10000) header(0xdc, ...u16(n));
+          else header(0xdd, ...u32(n));
+          v.forEach(write);
+        } else if (typeof v === "object") {
+          const keys = Object.keys(v).filter(k => v[k] !== undefined);
+          const n = keys.length;
+          if (n < 16) header(0x80 | n);
+          else if (n < 0x10000) header(0xde, ...u16(n));
+          else header(0xdf, ...u32(n));
+          keys.forEach(k => {
+            write(k);
+            write(v[k]);
+          });
+        } else {
+          throw Error(`msgpack: cannot encode ${typeof v}`);
+        }
+      };
+
+      write(value);
+
+      const out = new Uint8Array(size);
+      let offset = 0;
+      parts.forEach(part => {
+        out.set(part, offset);
+        offset += part.length;
+      });
+      return out;
+    }
+
+    function decode(buffer) {
+      const bytes = buffer instanceof Uint8Array ? buffer : new Uint8Array(buffer);
+      const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+      let pos = 0;
+
+      const take = (n, size) => {
+        const v = view[`get${n}`](pos);
+        pos += size;
+        return v;
+      };
+      const str = n => {
+        const s = textDecoder.decode(bytes.subarray(pos, pos + n));
+        pos += n;
+        return s;
+      };
+      const bin = n => {
+        const b = bytes.slice(pos, pos + n);
+        pos += n;
+        return b;
+      };
+      const arr = n => {
+        const a = new Array(n);
+        for (let i = 0; i < n; i++) a[i] = read();
+        return a;
+      };
+      const map = n => {
+        const o = {};
+        for (let i = 0; i < n; i++) {
+          const key = read();
+          o[key] = read();
+        }
+        return o;
+      };
+
+      const read = () => {
+        const t = bytes[pos++];
+        if (t < 0x80) return t;
+        if (t < 0x90) return map(t & 0x0f);
+        if (t < 0xa0) return arr(t & 0x0f);
+        if (t < 0xc0) return str(t & 0x1f);
+        if (t >= 0xe0) return t - 0x100;
+
+        switch (t) {
+          case 0xc0: return null;
+          case 0xc2: return false;
+          case 0xc3: return true;
+          case 0xc4: return bin(take("Uint8", 1));
+          case 0xc5: return bin(take("Uint16", 2));
+          case 0xc6: return bin(take("Uint32", 4));
+          case 0xca: return take("Float32", 4);
+          case 0xcb: return take("Float64", 8);
+          case 0xcc: return take("Uint8", 1);
+          case 0xcd: return take("Uint16", 2);
+          case 0xce: return take("Uint32", 4);
+          case 0xcf: return Number(take("BigUint64", 8));
+          case 0xd0: return take("Int8", 1);
+          case 0xd1: return take("Int16", 2);
+          case 0xd2: return take("Int32", 4);
+          case 0xd3: return Number(take("BigInt64", 8));
+          case 0xd9: return str(take("Uint8", 1));
+          case 0xda: return str(take("Uint16", 2));
+          case 0xdb: return str(take("Uint32", 4));
+          case 0xdc: return arr(take("Uint16", 2));
+          case 0xdd: return arr(take("Uint32", 4));
+          case 0xde: return map(take("Uint16", 2));
+          case 0xdf: return map(take("Uint32", 4));
+        }
+        throw Error(`msgpack: unsupported type 0x${t.toString(16)}`);
+      };
+
+      return read();
+    }
+
+    return { encode, decode };
+  })();
+
+  // Websocket subprotocols, server falls back to JSON if binary is unavailable
+  const BINARY_PROTOCOL = "kikx.msgpack";
+  const JSON_PROTOCOL = "kikx.json";
+  // Multiplexed app event relayed by the host page
+  const CHANNEL_EVENT = "app-channel";
+  // Function calls over the websocket, replies carry the request id
+  const FUNCX_EVENT = "funcx";
+  const FUNCX_CANCEL_EVENT = "funcx:cancel";
+  const FUNCX_RESULT_EVENT = "funcx:result";
+
   // Event handler
   class Handler {
     constructor() {
@@ -176,6 +341,9 @@
     notify = payload => this.request("notify", "POST", payload);
     alert = payload => this.request("alert", "POST", payload);
     sendSignal = signal => this.request(`signal?signal=${signal}`);
+    // Signal topics, fnmatch patterns like "app:*" allowed
+    subscribe = topics => this.request("subscribe", "POST", { topics });
+    unsubscribe = topics => this.request("unsubscribe", "POST", { topics });
     getUserSettings = (setting = null) =>
       this.request(`user-settings?setting=${setting}`);
     setUserSettings = settings =>
@@ -207,14 +375,33 @@
   }
 
   class KikxAppClient extends KikxApp {
-    constructor() {
+    constructor({ binary = false, multiplex = false } = {}) {
       super();
 
+      // Opt in to the binary (MessagePack) websocket protocol
+      this.binary = binary;
+      // Ride on the host client's websocket (via postMessage) instead of
+      // opening one per app - only when embedded in a host page
+      this.multiplex = multiplex && window.parent !== window;
+      this._onChannelMessage = null;
+      // Hosts not relaying app channels never answer, fall back to a direct websocket
+      this.channelTimeout = 3000; // ms
+      this._channelTimer = null;
+
       this.appEventHandlers = new Map();
 
       this.ws = null;
       this.eventCallbacks = {};
 
+      // Websocket funcx calls waiting for their reply, id -> { resolve, reject }
+      this._funcxCalls = new Map();
+
+      // Last event sequence seen, sent on reconnect to resume
+      this.lastSeq = null;
+      // Handled events are acknowledged (batched) so the server can drop them
+      this.ackDelay = 1000; // ms
+      this._ackTimer = null;
+
       this.reconnectDelay = 1000; // ms
       this.reconnectAttempts = 0;
       this.maxReconnectAttempts = 13;
@@ -236,6 +423,9 @@
         this.reconnectAttempts = 0;
       });
 
+      // Replies are resent after a reconnect like other events
+      this.on(FUNCX_RESULT_EVENT, reply => this._onFuncxResult(reply));
+
       // Handle tab focus in browsers
       document.addEventListener("visibilitychange", () => {
         if (this.ws && document.visibilityState === "visible") {
@@ -267,15 +457,51 @@
       this._connect();
     }
 
+    _connectChannel() {
+      if (this._onChannelMessage) return;
+
+      this._onChannelMessage = e => {
+        const data = e.data;
+        if (e.source !== window.parent || !data || data.kikx !== CHANNEL_EVENT) return;
+        if (data.app_id !== this.id) return;
+        this._clearChannelTimer();
+        this._handleMessage({ event: data.event, payload: data.payload });
+      };
+      window.addEventListener("message", this._onChannelMessage);
+      // Host attaches this app to the client connection, server answers "connected"
+      window.parent.postMessage({ kikx: "app:attach", app_id: this.id }, "*");
+
+      this._channelTimer = setTimeout(() => {
+        this._channelTimer = null;
+        console.warn("No app channel from the host page, using a direct websocket.");
+        window.removeEventListener("message", this._onChannelMessage);
+        this._onChannelMessage = null;
+        this.multiplex = false;
+        this._connect();
+      }, this.channelTimeout);
+    }
+
+    _clearChannelTimer() {
+      if (this._channelTimer) {
+        clearTimeout(this._channelTimer);
+        this._channelTimer = null;
+      }
+    }
+
     _connect() {
+      if (this.multiplex) return this._connectChannel();
       if (this.ws) return;
 
       //  const protocol = location.protocol === "https:" ? "wss" : "ws";
-      const url = `${getWsUrl()}/app/${this.id}`;
+      const resume = this.lastSeq !== null ? `?last_seq=${this.lastSeq}` : "";
+      const url = `${getWsUrl()}/app/${this.id}${resume}`;
       // const url = `${protocol}://${location.host}/app/${this.id}`;
       console.log("Connecting to WebSocket:", url);
 
-      this.ws = new WebSocket(url);
+      this.ws = this.binary
+        ? new WebSocket(url, [BINARY_PROTOCOL, JSON_PROTOCOL])
+        : new WebSocket(url);
+      this.ws.binaryType = "arraybuffer";
 
       this.ws.onopen = e => {
         console.log("WebSocket connection opened.");
@@ -285,13 +511,9 @@
 
       this.ws.onmessage = e => {
         try {
-          const message = JSON.parse(e.data);
-          if (message.event === "connected") {
-            this.config = message.payload.config;
-          }
-          if (message.event) {
-            this._callEvent(message.event, message.payload);
-          }
+          this._handleMessage(
+            typeof e.data === "string" ? JSON.parse(e.data) : msgpack.decode(e.data)
+          );
         } catch (err) {
           console.error("WebSocket message parse error:", err);
         }
@@ -314,6 +536,38 @@
       };
     }
 
+    _handleMessage(message) {
+      // Missed events resent by the server in one frame
+      if (message.event === "replay") {
+        if (message.payload.missed) {
+          this._callEvent("ws:replay_gap", message.payload.missed);
+        }
+        message.payload.events.forEach(m => this._handleMessage(m));
+        return;
+      }
+      if (typeof message.seq === "number") {
+        this.lastSeq = message.seq;
+        this._scheduleAck();
+      }
+      if (message.event === "connected") {
+        this.config = message.payload.config;
+      }
+      if (message.event) {
+        this._callEvent(message.event, message.payload);
+      }
+    }
+
+    // Multiplexed apps are acknowledged by the host client
+    _scheduleAck() {
+      if (this.multiplex || this._ackTimer) return;
+      this._ackTimer = setTimeout(() => {
+        this._ackTimer = null;
+        if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+          this.send({ event: "ack", payload: { seq: this.lastSeq } });
+        }
+      }, this.ackDelay);
+    }
+
     _scheduleReconnect() {
       console.log("Scheduling reconnect... Attempt:", this.reconnectAttempts);
 
@@ -373,15 +627,63 @@
     }
 
     send = data => {
-      if (this.ws && this.ws.readyState === WebSocket.OPEN) {
-        this.ws.send(JSON.stringify(data));
+      if (this.multiplex) {
+        window.parent.postMessage(
+          { kikx: CHANNEL_EVENT, app_id: this.id, event: data.event, payload: data.payload },
+          "*"
+        );
+      } else if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+        this.ws.send(
+          this.ws.protocol === BINARY_PROTOCOL ? msgpack.encode(data) : JSON.stringify(data)
+        );
       } else {
         console.warn("Cannot send message. WebSocket not open.");
       }
     };
 
+    // Call a function over the websocket instead of HTTP, resolves with its
+    // result, rejects with an Error carrying status (or cancelled).
+    // The promise has the request id for cancelFuncx.
+    funcx(name, config = {}) {
+      const id = generateUUID();
+      const promise = new Promise((resolve, reject) => {
+        if (!this.multiplex && !(this.ws && this.ws.readyState === WebSocket.OPEN)) {
+          reject(new Error("WebSocket not open"));
+          return;
+        }
+        this._funcxCalls.set(id, { resolve, reject });
+        this.send({ event: FUNCX_EVENT, payload: { id, name, config } });
+      });
+      promise.id = id;
+      return promise;
+    }
+
+    cancelFuncx(id) {
+      if (!this._funcxCalls.has(id)) return false;
+      this.send({ event: FUNCX_CANCEL_EVENT, payload: { id } });
+      return true;
+    }
+
+    _onFuncxResult(reply) {
+      const call = this._funcxCalls.get(reply?.id);
+      if (!call) return;
+      this._funcxCalls.delete(reply.id);
+
+      if (reply.cancelled) {
+        const error = new Error("Cancelled");
+        error.cancelled = true;
+        call.reject(error);
+      } else if ("error" in reply) {
+        const error = new Error(reply.error);
+        error.status = reply.status;
+        call.reject(error);
+      } else {
+        call.resolve(reply.result);
+      }
+    }
+
     async run(callback = null) {
-      if (this.ws && this.ws.readyState < WebSocket.CLOSING) return;
+      if (this.multiplex ? this._onChannelMessage : this.ws && this.ws.readyState < WebSocket.CLOSING) return;
       if (typeof callback === "function") {
         this.on("connected", callback);
       }
@@ -693,5 +995,6 @@
   exports.getAppID = getAppID;
   exports.getUrl = getUrl;
   exports.getWsUrl = getWsUrl;
+  exports.msgpack = msgpack;
 
 }));
@@ -157,6 +157,17 @@ class Client {
     this.fs = new FileSystemService();
     this.ws = null;
 
+    // Last event sequence handled, acknowledged (batched) so the server can drop it
+    this.lastSeq = null;
+    this.ackDelay = 1000; // ms
+    this._ackTimer = null;
+
+    // App iframes multiplexed over this websocket (app_id -> iframe)
+    this.appFrames = new Map();
+
+    // Websocket funcx calls waiting for their reply, id -> { resolve, reject }
+    this.funcxCalls = new Map();
+
     // Auto-reconnect
     this.reconnectAttempts = 0;
     this.maxReconnectAttempts = 5;
@@ -178,6 +189,47 @@ class Client {
       this.reconnectAttempts = 0;
     });
 
+    this.on("funcx:result", reply => {
+      const call = this.funcxCalls.get(reply?.id);
+      if (!call) return;
+      this.funcxCalls.delete(reply.id);
+      if (reply.cancelled) {
+        const error = new Error("Cancelled");
+        error.cancelled = true;
+        call.reject(error);
+      } else if ("error" in reply) {
+        const error = new Error(reply.error);
+        error.status = reply.status;
+        call.reject(error);
+      } else {
+        call.resolve(reply.result);
+      }
+    });
+
+    // Multiplexed app events -> app iframe
+    this.on("app-channel", channel => {
+      this.appFrames
+        .get(channel.app_id)
+        ?.contentWindow?.postMessage({ kikx: "app-channel", ...channel }, "*");
+    });
+
+    // App iframe -> multiplexed app events
+    window.addEventListener("message", e => {
+      const data = e.data;
+      if (!data || !data.kikx) return;
+      const frame = this.appFrames.get(data.app_id);
+      if (!frame || e.source !== frame.contentWindow) return;
+
+      if (data.kikx === "app:attach") {
+        this.send({ event: "app:attach", payload: { app_id: data.app_id } });
+      } else if (data.kikx === "app-channel") {
+        this.send({
+          event: "app-channel",
+          payload: { app_id: data.app_id, event: data.event, payload: data.payload }
+        });
+      }
+    });
+
     window.addEventListener("app:exit", async () => {
       // app exit
       await this.system.request("info/session/close/" + clientID, "POST");
@@ -222,6 +274,10 @@ class Client {
     this.ws.onmessage = e => {
       try {
         const message = JSON.parse(e.data);
+        if (typeof message.seq === "number") {
+          this.lastSeq = message.seq;
+          this._scheduleAck();
+        }
         if (message.event === "connected") {
           this.clientID = message.payload.client_id;
           clientID = message.payload.client_id;
@@ -247,6 +303,16 @@ class Client {
       }
     };
   }
+  _scheduleAck() {
+    if (this._ackTimer) return;
+    this._ackTimer = setTimeout(() => {
+      this._ackTimer = null;
+      if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+        this.send({ event: "ack", payload: { seq: this.lastSeq } });
+      }
+    }, this.ackDelay);
+  }
+
   _scheduleReconnect() {
     if (this._reconnectTimer) return;
     if (this.reconnectAttempts >= this.maxReconnectAttempts) {
@@ -337,6 +403,15 @@ class Client {
     }
   }
 
+  // Register an app iframe so it can multiplex over this websocket
+  addAppFrame(appID, iframe) {
+    this.appFrames.set(appID, iframe);
+  }
+
+  removeAppFrame(appID) {
+    this.appFrames.delete(appID);
+  }
+
   func(name, ...args) {
     const parsed = parseArgsAndKwargs(...args);
     return this.system.clientFunc(name, {
@@ -344,4 +419,30 @@ class Client {
       options: parsed.options
     });
   }
+
+  // Same as func over the websocket: resolves with the result, rejects with
+  // an Error carrying status (or cancelled). promise.id is for cancelFuncx
+  funcx(name, ...args) {
+    const parsed = parseArgsAndKwargs(...args);
+    const id = generateUUID();
+    const promise = new Promise((resolve, reject) => {
+      if (!this.ws || this.ws.readyState !== WebSocket.OPEN) {
+        reject(new Error("WebSocket not open"));
+        return;
+      }
+      this.funcxCalls.set(id, { resolve, reject });
+      this.send({
+        event: "funcx",
+        payload: { id, name, config: { args: parsed.args, options: parsed.options } }
+      });
+    });
+    promise.id = id;
+    return promise;
+  }
+
+  cancelFuncx(id) {
+    if (!this.funcxCalls.has(id)) return false;
+    this.send({ event: "funcx:cancel", payload: { id } });
+    return true;
+  }
 }
@@ -78,6 +78,7 @@ async function openApp(name, icon, title, sudo = false) {
       isSudo
     };
     openApps.push(name);
+    client.addAppFrame(id, $iframe[0]);
 
     // Create app tab
 
@@ -186,6 +187,7 @@ async function closeApp(name) {
     if (!response.ok) throw new Error(`Failed to close app ${name}`);
 
     // Remove iframe
+    client.removeAppFrame(appID);
     $(appFrames[name].iframe).remove();
     delete appFrames[name];
 
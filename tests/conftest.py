@@ -5,3 +5,8 @@ from pathlib import Path
 project_root = Path(__file__).resolve().parent.parent
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
+
+# core modules import core.* / lib.* (run from kikx/)
+kikx_root = project_root / "kikx"
+if str(kikx_root) not in sys.path:
+    sys.path.insert(1, str(kikx_root))
@@ -0,0 +1,103 @@
+import json
+import shutil
+import pytest
+import asyncio
+from pathlib import Path
+from typing import Optional
+
+from fastapi import WebSocket
+
+# Default storage layout shipped with kikx
+KIKXFS = Path(__file__).resolve().parents[2] / "kikxfs"
+
+
+class FakeTransport:
+  """ASGI side of a websocket, records what the server sends."""
+  def __init__(self, fail: bool = False, gate: Optional[asyncio.Event] = None):
+    self.sent = []
+    self.closed = None
+    self.fail = fail
+    # Sends wait for it when given (slow peer)
+    self.gate = gate
+    # Keepalive round trip, like uvicorn's websockets-sansio protocol
+    self.last_ping_rtt = 0.0
+
+  async def receive(self) -> dict:
+    return {"type": "websocket.connect"}
+
+  async def send(self, message: dict) -> None:
+    if message["type"] == "websocket.send":
+      if self.gate is not None:
+        await self.gate.wait()
+      if self.fail:
+        raise RuntimeError("transport broken")
+      self.sent.append(message.get("text", message.get("bytes")))
+    elif message["type"] == "websocket.close":
+      self.closed = message.get("code")
+
+
+@pytest.fixture
+def websocket():
+  """Factory of accepted websockets: ws, transport = await websocket()."""
+  async def create(fail: bool = False, gate: Optional[asyncio.Event] = None):
+    transport = FakeTransport(fail, gate)
+    ws = WebSocket({"type": "websocket", "path": "/", "headers": []}, transport.receive, transport.send)
+    await ws.accept()
+    transport.sent.clear()
+    return ws, transport
+  return create
+
+
+@pytest.fixture
+def drain():
+  """Wait until a connection's writer has sent everything queued."""
+  async def wait(connection, timeout: float = 1) -> None:
+    async def drained():
+      while connection.queue_size:
+        await asyncio.sleep(0)
+      # The last message is taken off the queue before it is sent
+      for _ in range(3):
+        await asyncio.sleep(0)
+    await asyncio.wait_for(drained(), timeout)
+  return wait
+
+
+@pytest.fixture
+def storage(tmp_path):
+  """Fresh kikx storage with the default config and no apps."""
+  shutil.copytree(KIKXFS / "config", tmp_path / "config")
+  shutil.copytree(KIKXFS / "data", tmp_path / "data")
+  (tmp_path / "apps").mkdir()
+  return tmp_path
+
+
+@pytest.fixture
+def install_app(storage):
+  """Install a bare app (manifest and config) into storage."""
+  def install(name: str, **config) -> None:
+    data = json.dumps({"name": name, "title": name.title(), "version": "1.0.0", **config})
+    (storage / "apps" / name).mkdir()
+    (storage / "apps" / name / "app.json").write_text(data)
+    (storage / "data" / "app" / f"{name}.json").write_text(data)
+  return install
+
+
+@pytest.fixture
+def make_core(storage, monkeypatch):
+  """Core over storage, kikx.json fields can be overridden: core = make_core(limits={...})."""
+  from core.core import Core
+  from core.limits import limits
+  from core.models.kikx_models import LimitsConfigModel
+
+  # No boot script
+  monkeypatch.setenv("KIKX_WORKER", "1")
+  config_path = storage / "config" / "kikx.json"
+  default_config = config_path.read_text()
+
+  def create(**kikx):
+    config_path.write_text(json.dumps({**json.loads(default_config), **kikx}))
+    return Core(str(storage))
+
+  yield create
+  # Shared by every core
+  limits.configure(LimitsConfigModel())
@@ -0,0 +1,95 @@
+import pytest
+
+from core.apps import apps as apps_module
+from core.apps.apps import App
+from core.func import funcx
+from core.func.models import FuncXModel
+from core.models.app_models import AppModel
+
+
+class Tasks:
+  built = 0
+
+  def __init__(self, app, config: dict):
+    Tasks.built += 1
+    self.app = app
+    self.config = config
+    self.closed = False
+
+  @funcx
+  async def run_task(self, name: str) -> str:
+    return f"ran {name}"
+
+  async def on_close(self):
+    self.closed = True
+
+
+class Registry:
+  def get(self, name: str) -> type:
+    return {"tasks": Tasks}[name]
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+  Tasks.built = 0
+  monkeypatch.setattr(apps_module, "module_registry", Registry())
+  config = AppModel(name="notes", title="Notes", version="1.0.0", modules={"tasks": {"shell": False}})
+  return App("client", "notes", tmp_path, config, user=None, manifest=None)
+
+
+# ----------------------------------
+# Test: modules are built on first access only
+# ----------------------------------
+
+def test_modules_are_not_built_upfront(app):
+  assert Tasks.built == 0
+  assert app.get_loaded_module("tasks") is None
+  assert app.info()["modules"] == []
+
+
+def test_first_access_builds_module_once(app):
+  tasks = app.tasks
+
+  assert isinstance(tasks, Tasks)
+  assert tasks.config == {"shell": False}
+  assert app.tasks is tasks
+  assert Tasks.built == 1
+  assert app.get_loaded_module("tasks") is tasks
+  assert app.info()["modules"] == ["tasks"]
+
+
+def test_unknown_attribute_raises(app):
+  with pytest.raises(AttributeError):
+    app.files
+
+
+@pytest.mark.asyncio
+async def test_funcx_builds_module(app):
+  result = await app.run_function(FuncXModel(name="tasks.run_task", config={"args": ["build"]}))
+
+  assert result == "ran build"
+  assert Tasks.built == 1
+
+
+def test_functions_listed_without_building(app):
+  names = [function["name"] for function in app.list_functions()]
+
+  assert "tasks.run_task" in names
+  assert Tasks.built == 0
+
+
+# ----------------------------------
+# Test: only built modules are closed
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_close_skips_unbuilt_modules(app):
+  await app.on_close()
+  assert Tasks.built == 0
+
+
+@pytest.mark.asyncio
+async def test_close_closes_built_modules(app):
+  tasks = app.tasks
+  await app.on_close()
+  assert tasks.closed
@@ -0,0 +1,77 @@
+import pytest
+import asyncio
+
+from core.connection import Connection, MessageEvent
+from core.func.handlers import create_handler
+from core.models.kikx_models import ConnectionConfigModel
+
+
+def throttled_connection() -> Connection:
+  return Connection(ConnectionConfigModel(queue_size=10, high_water=3, low_water=1))
+
+
+# ----------------------------------
+# Test: producers wait above high_water until the queue drains
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_wait_writable_blocks_until_drained(websocket, drain):
+  connection = throttled_connection()
+  ws, transport = await websocket()
+  # Bound without a writer yet, the queue only fills
+  connection.websocket = ws
+
+  for seq in range(1, 5):
+    connection._enqueue(MessageEvent("e", {}, seq))
+  assert connection.is_slow
+  assert connection.info()["queue"]["throttled"] == 1
+
+  waiter = asyncio.create_task(connection.wait_writable())
+  await asyncio.sleep(0.01)
+  assert not waiter.done()
+
+  connection._start_writer()
+  await asyncio.wait_for(waiter, 1)
+  await drain(connection)
+  assert len(transport.sent) == 4
+  await connection.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_releases_waiting_producers(websocket):
+  connection = throttled_connection()
+  ws, _ = await websocket()
+  connection.websocket = ws
+  for seq in range(1, 5):
+    connection._enqueue(MessageEvent("e", {}, seq))
+
+  waiter = asyncio.create_task(connection.wait_writable())
+  await connection.stop()
+  await asyncio.wait_for(waiter, 1)
+
+
+# ----------------------------------
+# Test: task output waits through the handler
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_handler_writable_uses_connection():
+  connection = throttled_connection()
+  connection._writable.clear()
+
+  handler = create_handler("h", connection.send_event, wait_writable=connection.wait_writable)
+  waiter = asyncio.create_task(handler.writable())
+  await asyncio.sleep(0.01)
+  assert not waiter.done()
+
+  connection._writable.set()
+  await asyncio.wait_for(waiter, 1)
+
+
+@pytest.mark.asyncio
+async def test_handler_without_id_never_waits():
+  connection = throttled_connection()
+  connection._writable.clear()
+
+  handler = create_handler(None, connection.send_event, wait_writable=connection.wait_writable)
+  await asyncio.wait_for(handler.writable(), 1)
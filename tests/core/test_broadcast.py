@@ -0,0 +1,79 @@
+import json
+import pytest
+
+from lib.serializer import EncodedPayload, JSONSerializer, set_serializer, get_serializer
+from core.connection import Connection, MessageEvent, broadcast_event
+
+
+class CountingSerializer(JSONSerializer):
+  name = "counting"
+
+  def __init__(self):
+    self.payloads = 0
+
+  def dumps(self, obj):
+    if isinstance(obj, dict) and "big" in obj:
+      self.payloads += 1
+    return super().dumps(obj)
+
+
+@pytest.fixture
+def counting():
+  previous = get_serializer()
+  serializer = CountingSerializer()
+  set_serializer(serializer)
+  yield serializer
+  set_serializer(previous)
+
+
+# ----------------------------------
+# Test: a broadcast payload is serialized once for all connections
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_broadcast_encodes_payload_once(counting, websocket, drain):
+  connections = [Connection() for _ in range(5)]
+  transports = []
+  for connection in connections[:2]:
+    ws, transport = await websocket()
+    await connection.connect(ws)
+    transports.append(transport)
+
+  await broadcast_event(connections, "news", {"big": list(range(100))})
+  for connection in connections[:2]:
+    await drain(connection)
+
+  assert counting.payloads == 1
+  for transport in transports:
+    assert json.loads(transport.sent[0])["payload"] == {"big": list(range(100))}
+  # Disconnected ones keep it for replay
+  assert all(connection.seq == 1 for connection in connections)
+  for connection in connections[:2]:
+    await connection.stop()
+
+
+# ----------------------------------
+# Test: envelopes splice pre-encoded payloads and are cached
+# ----------------------------------
+
+def test_message_splices_encoded_payload(counting):
+  payload = EncodedPayload({"big": 1})
+  message = MessageEvent("e", payload, 7)
+
+  data = message.encode()
+  assert message.encode() is data
+  assert json.loads(data) == {"event": "e", "seq": 7, "payload": {"big": 1}}
+  assert counting.payloads == 1
+
+
+def test_message_resolves_callable_payload_lazily():
+  calls = []
+  def payload():
+    calls.append(1)
+    return {"k": "v"}
+
+  message = MessageEvent("e", payload, 1)
+  assert calls == []
+  message.encode()
+  message.encode()
+  assert calls == [1]
@@ -0,0 +1,94 @@
+import os
+import json
+import pytest
+
+from starlette.requests import Request
+
+from lib.utils import etag_matches
+from core.catalog import AppCatalog
+
+
+def write_json(path, data: dict, bump: int = 0) -> None:
+  path.parent.mkdir(parents=True, exist_ok=True)
+  path.write_text(json.dumps(data))
+  if bump:
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime + bump))
+
+
+def install(tmp_path, name: str, title: str = "App", bump: int = 0) -> None:
+  data = {"name": name, "title": title, "version": "1.0.0"}
+  write_json(tmp_path / "apps" / name / "app.json", data, bump)
+  write_json(tmp_path / "data" / f"{name}.json", data, bump)
+
+
+@pytest.fixture
+def catalog(tmp_path):
+  install(tmp_path, "notes")
+  install(tmp_path, "files")
+  return AppCatalog(tmp_path / "apps", tmp_path / "data", check_interval=0)
+
+
+def request(if_none_match: str) -> Request:
+  return Request({"type": "http", "headers": [(b"if-none-match", if_none_match.encode())]})
+
+
+# ----------------------------------
+# Test: parsed files are cached until they change
+# ----------------------------------
+
+def test_manifest_is_cached(catalog):
+  assert catalog.names() == ["files", "notes"]
+  manifest = catalog.manifest("notes")
+
+  assert catalog.manifest("notes") is manifest
+  assert catalog.config("notes") is catalog.config("notes")
+
+
+def test_edited_manifest_is_parsed_again(tmp_path, catalog):
+  catalog.manifest("notes")
+  install(tmp_path, "notes", title="Renamed", bump=10)
+
+  assert catalog.manifest("notes").title == "Renamed"
+  assert catalog.config("notes").title == "Renamed"
+
+
+def test_missing_app_raises(catalog):
+  with pytest.raises(Exception, match="App not found"):
+    catalog.manifest("nope")
+
+
+# ----------------------------------
+# Test: the ETag changes with the content only
+# ----------------------------------
+
+def test_etag_follows_content(tmp_path, catalog):
+  catalog.summaries()
+  etag = catalog.etag
+  catalog.summaries()
+  assert catalog.etag == etag
+
+  install(tmp_path, "notes", title="Renamed", bump=10)
+  summaries = catalog.summaries()
+  assert catalog.etag != etag
+  assert {s["name"]: s["title"] for s in summaries}["notes"] == "Renamed"
+
+
+def test_etag_changes_on_install_and_invalidate(tmp_path, catalog):
+  catalog.summaries()
+  etag = catalog.etag
+
+  install(tmp_path, "music")
+  catalog.invalidate()
+  assert [s["name"] for s in catalog.summaries()] == ["files", "music", "notes"]
+  assert catalog.etag != etag
+
+
+def test_etag_matches_header(catalog):
+  etag = catalog.etag
+
+  assert etag_matches(request(etag), etag)
+  assert etag_matches(request(f'"old", W/{etag}'), etag)
+  assert etag_matches(request("*"), etag)
+  assert not etag_matches(request('"old"'), etag)
+
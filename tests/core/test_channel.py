@@ -0,0 +1,77 @@
+import json
+import pytest
+
+from lib.serializer import JSONSerializer, set_serializer, get_serializer
+from core.connection import CHANNEL_EVENT, Connection, ChannelConnection, broadcast_event
+
+
+class CountingSerializer(JSONSerializer):
+  name = "counting"
+
+  def __init__(self):
+    self.payloads = 0
+
+  def dumps(self, obj):
+    if isinstance(obj, dict) and "big" in obj:
+      self.payloads += 1
+    return super().dumps(obj)
+
+
+# ----------------------------------
+# Test: channel events ride on the parent connection
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_channel_wraps_events(websocket, drain):
+  parent = Connection()
+  ws, transport = await websocket()
+  await parent.connect(ws)
+  channel = ChannelConnection(parent, "app1")
+
+  await channel.send_event("hello", {"x": 1})
+  await drain(parent)
+
+  frame = json.loads(transport.sent[0])
+  assert frame["event"] == CHANNEL_EVENT
+  assert frame["seq"] == 1
+  assert frame["payload"] == {"app_id": "app1", "event": "hello", "payload": {"x": 1}}
+  assert channel.is_connected
+  await parent.stop()
+
+
+@pytest.mark.asyncio
+async def test_channel_follows_parent_state(websocket):
+  parent = Connection()
+  channel = ChannelConnection(parent, "app1")
+  assert not channel.is_connected
+
+  with pytest.raises(ConnectionError):
+    ws, _ = await websocket()
+    await channel.connect(ws)
+
+
+# ----------------------------------
+# Test: broadcasts to multiplexed apps are encoded once
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_channel_broadcast_encodes_once(websocket, drain):
+  previous = get_serializer()
+  counting = CountingSerializer()
+  set_serializer(counting)
+  try:
+    parent = Connection()
+    ws, transport = await websocket()
+    await parent.connect(ws)
+    channels = [ChannelConnection(parent, f"app{i}") for i in range(3)]
+
+    await broadcast_event(channels, "news", {"big": [1, 2, 3]})
+    await drain(parent)
+  finally:
+    set_serializer(previous)
+
+  assert counting.payloads == 1
+  frames = [json.loads(frame)["payload"] for frame in transport.sent]
+  assert [f["app_id"] for f in frames] == ["app0", "app1", "app2"]
+  assert all(f["payload"] == {"big": [1, 2, 3]} for f in frames)
+  await parent.stop()
@@ -0,0 +1,165 @@
+import asyncio
+import pytest
+from typing import Optional
+
+from core.cluster import Cluster, get_session_id, read_body
+from core.state import MemoryStateBackend, SQLiteStateBackend
+from core.models.kikx_models import StateConfigModel
+
+
+class FakeCore:
+  def __init__(self):
+    self.clients = {}
+    self.app_index = {}
+    self.messages = []
+
+  async def on_cluster_message(self, message: dict):
+    self.messages.append(message)
+
+
+def scope(path: str = "/", query: str = "", headers: Optional[dict] = None) -> dict:
+  return {
+    "type": "http",
+    "path": path,
+    "query_string": query.encode(),
+    "headers": [(k.encode(), v.encode()) for k, v in (headers or {}).items()]
+  }
+
+
+@pytest.fixture
+def workers(tmp_path):
+  """Two clusters sharing one sqlite database, as two workers would."""
+  config = StateConfigModel(backend="sqlite", poll_interval=0.01, heartbeat_interval=0.01, worker_timeout=30)
+  clusters = []
+  for address in ("127.0.0.1:1", "127.0.0.1:2"):
+    state = SQLiteStateBackend(tmp_path / "state.db")
+    cluster = Cluster(FakeCore(), state, config)
+    cluster.address = address
+    state.add_worker(cluster.worker_id, address)
+    clusters.append(cluster)
+  yield clusters
+  for cluster in clusters:
+    cluster.state.close()
+
+
+# ----------------------------------
+# Test: requests name their session in headers, path or query
+# ----------------------------------
+
+@pytest.mark.parametrize("request_scope, session_id", [
+  (scope(headers={"kikx-app-id": "a1", "kikx-client-id": "c1"}), "a1"),
+  (scope(headers={"kikx-client-id": "c1"}), "c1"),
+  (scope("/app/a1/index.html"), "a1"),
+  (scope("/app-data/a1"), "a1"),
+  (scope("/ws", "x=1&client_id=c1"), "c1"),
+  (scope("/ws", "app_id=&x=1"), None),
+  (scope("/share/icons"), None)
+])
+def test_get_session_id(request_scope, session_id):
+  assert get_session_id(request_scope) == session_id
+
+
+@pytest.mark.asyncio
+async def test_read_body_replays_it():
+  messages = [
+    {"type": "http.request", "body": b'{"app_id":', "more_body": True},
+    {"type": "http.request", "body": b'"a1"}'}
+  ]
+  async def receive():
+    return messages.pop(0)
+
+  body, replay = await read_body(receive)
+
+  assert body == b'{"app_id":"a1"}'
+  assert await replay() == {"type": "http.request", "body": body, "more_body": False}
+
+
+# ----------------------------------
+# Test: sessions are located on their owner worker
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_locate_other_workers_sessions(workers):
+  first, second = workers
+  first.core.clients["c1"] = object()
+  await first.claim("c1")
+
+  assert await first.locate("c1") is None
+  assert await second.locate("c1") == "127.0.0.1:1"
+  assert await second.locate("unknown") is None
+
+  first.release("c1")
+  # Written in the background, in order with later calls
+  await first.state.run(first.state.last_message_id)
+  assert await second.locate("c1") is None
+
+
+@pytest.mark.asyncio
+async def test_single_worker_is_a_noop():
+  cluster = Cluster(FakeCore(), MemoryStateBackend(), StateConfigModel())
+  await cluster.claim("c1")
+  cluster.publish("signal", topic="t")
+
+  assert not cluster.enabled
+  assert cluster.state.get_owner("c1") is None
+  assert await cluster.locate("c1") is None
+  assert cluster.stats["published"] == 0
+
+
+# ----------------------------------
+# Test: published messages reach the other workers only
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_publish_reaches_other_worker(workers):
+  first, second = workers
+  poll = asyncio.create_task(second._poll())
+  try:
+    first.publish("signal", topic="news", payload={"n": 1})
+    await first.state.run(first.state.last_message_id)
+    for _ in range(100):
+      if second.core.messages:
+        break
+      await asyncio.sleep(0.01)
+  finally:
+    poll.cancel()
+
+  assert second.core.messages == [{"op": "signal", "topic": "news", "payload": {"n": 1}}]
+  assert first.core.messages == []
+  assert second.stats["received"] == 1
+
+
+# ----------------------------------
+# Test: heartbeats drop dead workers and bring back dropped ones
+# ----------------------------------
+
+async def beat(cluster: Cluster) -> None:
+  task = asyncio.create_task(cluster._heartbeat())
+  await asyncio.sleep(0.05)
+  task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_drops_dead_workers(workers):
+  first, second = workers
+  await second.claim("c2")
+  second.state._db.execute("UPDATE workers SET seen = 0 WHERE worker_id = ?", (second.worker_id,))
+
+  await beat(first)
+
+  assert first.stats["dead_workers"] == 1
+  assert await first.locate("c2") is None
+
+
+@pytest.mark.asyncio
+async def test_dropped_worker_registers_again(workers):
+  first, second = workers
+  first.core.clients["c1"] = object()
+  first.core.app_index["a1"] = "c1"
+  await first.claim("c1", "a1")
+  first.state.drop_worker(first.worker_id)
+
+  await beat(first)
+
+  assert await second.locate("c1") == "127.0.0.1:1"
+  assert await second.locate("a1") == "127.0.0.1:1"
@@ -0,0 +1,164 @@
+import json
+import pytest
+import asyncio
+
+from starlette.websockets import WebSocketState
+
+from core.connection import Connection, MessageEvent
+from core.models.kikx_models import ConnectionConfigModel
+
+
+def events(transport) -> list:
+  return [json.loads(frame)["event"] for frame in transport.sent]
+
+
+# ----------------------------------
+# Test: the writer sends queued events in order
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_writer_sends_in_order(websocket, drain):
+  connection = Connection()
+  ws, transport = await websocket()
+  await connection.connect(ws)
+
+  for i in range(5):
+    await connection.send_event(f"e{i}", {"i": i})
+  await drain(connection)
+
+  assert events(transport) == ["e0", "e1", "e2", "e3", "e4"]
+  assert connection.sent_seq == 5
+  assert connection.info()["queue"]["sent"] == 5
+  await connection.stop()
+
+
+# ----------------------------------
+# Test: events sent while disconnected go out on connect
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_events_before_connect_are_sent_on_connect(websocket, drain):
+  connection = Connection()
+  await connection.send_event("early", {})
+
+  ws, transport = await websocket()
+  await connection.connect(ws)
+  await drain(connection)
+
+  assert events(transport) == ["early"]
+  await connection.stop()
+
+
+# ----------------------------------
+# Test: overflow policies of a full queue
+# ----------------------------------
+
+def full_connection(policy: str) -> Connection:
+  config = ConnectionConfigModel(queue_size=2, high_water=2, low_water=0, overflow=policy)
+  return Connection(config)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("policy, kept", [
+  ("drop_oldest", ["e1", "e2"]),
+  ("drop_newest", ["e0", "e1"])
+])
+async def test_overflow_drops(policy, kept):
+  connection = full_connection(policy)
+  for i in range(3):
+    connection._enqueue(MessageEvent(f"e{i}", {}, i + 1))
+
+  queued = [connection._queue.get_nowait().event for _ in range(connection.queue_size)]
+  assert queued == kept
+  assert connection.info()["queue"]["dropped"] == 1
+  assert connection.info()["queue"]["overflows"] == 1
+
+
+@pytest.mark.asyncio
+async def test_overflow_close(websocket):
+  connection = full_connection("close")
+  ws, transport = await websocket()
+  connection.websocket = ws
+
+  for i in range(3):
+    connection._enqueue(MessageEvent(f"e{i}", {}, i + 1))
+  await asyncio.sleep(0)
+
+  assert connection.queue_size == 0
+  assert transport.closed == 1013
+  # Kept until done
+  assert connection._close_task.done()
+
+
+# ----------------------------------
+# Test: a failed send closes the websocket, the event stays for replay
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_send_failure_closes_connection(websocket):
+  connection = Connection()
+  ws, transport = await websocket(fail=True)
+  await connection.connect(ws)
+
+  await connection.send_event("lost", {})
+  for _ in range(5):
+    await asyncio.sleep(0)
+
+  assert transport.closed == 1011
+  assert not connection.is_connected
+  assert connection.info()["queue"]["send_errors"] == 1
+  # Not sent, still tracked for the next websocket
+  assert connection.sent_seq == 0
+  assert [m.event for m in connection.tracking] == ["lost"]
+
+  ws2, transport2 = await websocket()
+  await connection.connect(ws2)
+  for _ in range(5):
+    await asyncio.sleep(0)
+  assert events(transport2) == ["lost"]
+  await connection.stop()
+
+
+@pytest.mark.asyncio
+async def test_send_failure_on_replaced_websocket(websocket):
+  connection = Connection()
+  gate = asyncio.Event()
+  ws1, transport1 = await websocket(fail=True, gate=gate)
+  await connection.connect(ws1)
+
+  await connection.send_event("e1", {})
+  await asyncio.sleep(0)
+  # Tab reloaded while the send hangs on the dead socket
+  ws1.client_state = WebSocketState.DISCONNECTED
+  ws2, transport2 = await websocket()
+  await connection.connect(ws2)
+
+  gate.set()
+  for _ in range(5):
+    await asyncio.sleep(0)
+
+  assert transport2.closed is None
+  assert connection.is_connected
+  assert connection.disconnected_at is None
+  assert events(transport2) == ["e1"]
+  assert connection.info()["queue"]["send_errors"] == 1
+  await connection.stop()
+
+
+# ----------------------------------
+# Test: a msgpack connection sends binary frames
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_binary_protocol_frames(websocket, drain):
+  msgpack = pytest.importorskip("msgpack")
+  connection = Connection()
+  ws, transport = await websocket()
+  await connection.connect(ws, protocol="kikx.msgpack")
+
+  await connection.send_event("e", {"raw": b"\x00"})
+  await drain(connection)
+
+  assert isinstance(transport.sent[0], bytes)
+  assert msgpack.unpackb(transport.sent[0], raw=False) == {"event": "e", "seq": 1, "payload": {"raw": b"\x00"}}
+  await connection.stop()
@@ -0,0 +1,119 @@
+import pytest
+import asyncio
+
+from core.dispatcher import Dispatcher
+
+
+async def settle(dispatcher: Dispatcher, timeout: float = 1) -> None:
+  async def wait():
+    while dispatcher.in_flight:
+      await asyncio.sleep(0.001)
+  await asyncio.wait_for(wait(), timeout)
+
+
+# ----------------------------------
+# Test: same key runs in order, other keys concurrently
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_same_key_keeps_order():
+  done = []
+  async def handler(data):
+    # Earlier messages take longer, order only holds if they are serialized
+    await asyncio.sleep(data["delay"])
+    done.append(data["n"])
+
+  dispatcher = Dispatcher(handler)
+  for n, delay in enumerate((0.03, 0.02, 0.01, 0)):
+    await dispatcher.submit({"key": "k", "n": n, "delay": delay})
+  await settle(dispatcher)
+
+  assert done == [0, 1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_unkeyed_messages_run_concurrently():
+  done = []
+  async def handler(data):
+    await asyncio.sleep(data["delay"])
+    done.append(data["n"])
+
+  dispatcher = Dispatcher(handler)
+  for n, delay in enumerate((0.03, 0.02, 0.01, 0)):
+    await dispatcher.submit({"n": n, "delay": delay})
+  await settle(dispatcher)
+
+  assert done == [3, 2, 1, 0]
+
+
+# ----------------------------------
+# Test: submit blocks once the limit is reached
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_limit_pauses_submit():
+  release = asyncio.Event()
+  async def handler(data):
+    await release.wait()
+
+  dispatcher = Dispatcher(handler, limit=2)
+  await dispatcher.submit({})
+  await dispatcher.submit({})
+
+  third = asyncio.create_task(dispatcher.submit({}))
+  await asyncio.sleep(0.01)
+  assert not third.done()
+  assert dispatcher.stats["paused"] == 1
+
+  release.set()
+  await asyncio.wait_for(third, 1)
+  await settle(dispatcher)
+  assert dispatcher.stats["dispatched"] == 3
+
+
+# ----------------------------------
+# Test: unusable keys and failing handlers never leak slots
+# ----------------------------------
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("key", [["list"], {"a": 1}, True, 1.5, None])
+async def test_bad_keys_are_ignored(key):
+  handled = []
+  async def handler(data):
+    handled.append(data)
+
+  dispatcher = Dispatcher(handler, limit=1)
+  for _ in range(3):
+    await asyncio.wait_for(dispatcher.submit({"key": key}), 1)
+  await settle(dispatcher)
+
+  assert len(handled) == 3
+  assert dispatcher._keys == {}
+
+
+@pytest.mark.asyncio
+async def test_handler_errors_release_slot():
+  async def handler(data):
+    raise ValueError("boom")
+
+  dispatcher = Dispatcher(handler, limit=1)
+  for _ in range(3):
+    await asyncio.wait_for(dispatcher.submit({"key": "k"}), 1)
+  await settle(dispatcher)
+
+  assert dispatcher.stats["failed"] == 3
+
+
+@pytest.mark.asyncio
+async def test_close_cancels_running_handlers():
+  started = asyncio.Event()
+  async def handler(data):
+    started.set()
+    await asyncio.sleep(10)
+
+  dispatcher = Dispatcher(handler)
+  await dispatcher.submit({})
+  await started.wait()
+  await asyncio.wait_for(dispatcher.close(), 1)
+
+  assert dispatcher.in_flight == 0
@@ -0,0 +1,187 @@
+import os
+import json
+import pytest
+from pathlib import Path
+
+from core.catalog import AppCatalog
+from core.apps.env import EnvCache, env_cache
+from core.apps.modules.tasks import Tasks
+
+
+class User:
+  def __init__(self, path: Path):
+    self.storage_path = path
+
+  def get_path_env(self) -> str:
+    return str(self.storage_path / "bin")
+
+
+class FakeApp:
+  def __init__(self, path: Path, app_id: str, name: str = "envtest"):
+    self.id = app_id
+    self.name = name
+    self.app_path = path
+    self.user = User(path)
+    self.sudo = False
+
+  def get_app_path(self) -> Path:
+    return self.app_path
+
+  def get_home_path(self) -> Path:
+    return self.app_path
+
+  def get_app_data_path(self) -> Path:
+    return self.app_path
+
+  async def send_event(self, event, payload):
+    pass
+
+  async def wait_writable(self):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def clean_env_cache():
+  env_cache.invalidate()
+  yield
+  env_cache.invalidate()
+
+
+def tasks_config(**config) -> dict:
+  return {"shell": True, "main": "printenv {name}", **config}
+
+
+# ----------------------------------
+# Test: app envs are built once and rebuilt on change
+# ----------------------------------
+
+def test_env_is_built_once_per_fingerprint():
+  cache = EnvCache()
+  builds = []
+  def build(base):
+    builds.append(1)
+    return {**base, "X": "1"}
+
+  first = cache.get("app", "fp1", build)
+  assert cache.get("app", "fp1", build) is first
+  assert first["X"] == "1"
+  assert cache.stats == {"hits": 1, "builds": 1}
+
+  cache.get("app", "fp2", build)
+  assert len(builds) == 2
+
+
+def test_base_is_read_only():
+  cache = EnvCache()
+  env = cache.get("app", "fp", lambda base: {"X": "1"})
+
+  assert type(env) is dict
+  with pytest.raises(TypeError):
+    cache.base["X"] = "2"
+
+
+def test_invalidate(monkeypatch):
+  cache = EnvCache()
+  cache.get("one", "fp", dict)
+  cache.get("two", "fp", dict)
+  monkeypatch.setenv("KIKX_ENV_TEST", "1")
+
+  cache.invalidate("one")
+  assert cache.info()["apps"] == 1
+  cache.invalidate()
+  assert cache.info()["apps"] == 0
+  # Server env snapshot of startup
+  assert "KIKX_ENV_TEST" not in cache.base
+
+
+# ----------------------------------
+# Test: instances share the app env, each with its own app id
+# ----------------------------------
+
+def test_instances_share_app_env(tmp_path):
+  builds = env_cache.stats["builds"]
+  first = Tasks(FakeApp(tmp_path, "id1"), tasks_config(env={"MY_VAR": "x"}))
+  second = Tasks(FakeApp(tmp_path, "id2"), tasks_config(env={"MY_VAR": "x"}))
+
+  assert env_cache.stats["builds"] == builds + 1
+  assert type(first.task_env) is dict
+  assert first.task_env["MY_VAR"] == "x"
+  assert first.task_env["KIKX_APP_NAME"] == "envtest"
+  assert (first.task_env["KIKX_APP_ID"], second.task_env["KIKX_APP_ID"]) == ("id1", "id2")
+
+
+def test_instances_without_app_id_share_one_dict(tmp_path):
+  first = Tasks(FakeApp(tmp_path, "id1"), tasks_config(shell=False))
+  second = Tasks(FakeApp(tmp_path, "id2"), tasks_config(shell=False))
+
+  assert first.task_env is second.task_env
+  assert type(first.task_env) is dict
+  assert "KIKX_APP_ID" not in first.task_env
+
+
+def test_sandbox_env_skips_server_env(tmp_path):
+  server_vars = set(env_cache.base) - {"PATH"}
+
+  tasks = Tasks(FakeApp(tmp_path, "id1"), tasks_config(sandbox=True))
+  assert server_vars and not server_vars & set(tasks.task_env)
+  assert tasks.task_env["PATH"].startswith(str(tmp_path / "bin"))
+
+
+@pytest.mark.asyncio
+async def test_task_runs_with_app_env(tmp_path):
+  tasks = Tasks(FakeApp(tmp_path, "id1"), tasks_config())
+
+  result = await tasks.run_once("KIKX_APP_ID")
+  assert result["stdout"] == "id1"
+
+
+def test_task_spawns_on_uvloop(tmp_path):
+  uvloop = pytest.importorskip("uvloop")
+  tasks = Tasks(FakeApp(tmp_path, "id1"), tasks_config())
+
+  loop = uvloop.new_event_loop()
+  try:
+    result = loop.run_until_complete(tasks.run_once("KIKX_APP_NAME"))
+  finally:
+    loop.close()
+  assert result["stdout"] == "envtest"
+
+
+# ----------------------------------
+# Test: the catalog drops the env of changed apps
+# ----------------------------------
+
+def install(tmp_path, name: str, bump: int = 0) -> None:
+  data = json.dumps({"name": name, "title": "App", "version": "1.0.0"})
+  for path in (tmp_path / "apps" / name / "app.json", tmp_path / "data" / f"{name}.json"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(data)
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime + bump))
+
+
+def test_catalog_invalidate_drops_env(tmp_path):
+  install(tmp_path, "notes")
+  install(tmp_path, "files")
+  catalog = AppCatalog(tmp_path / "apps", tmp_path / "data")
+  env_cache.get("notes", "fp", dict)
+  env_cache.get("files", "fp", dict)
+
+  catalog.invalidate("notes")
+
+  assert env_cache.info()["apps"] == 1
+  hits = env_cache.stats["hits"]
+  env_cache.get("files", "fp", dict)
+  assert env_cache.stats["hits"] == hits + 1
+
+
+def test_edited_config_drops_env(tmp_path):
+  install(tmp_path, "notes")
+  catalog = AppCatalog(tmp_path / "apps", tmp_path / "data")
+  catalog.config("notes")
+  env_cache.get("notes", "fp", dict)
+
+  install(tmp_path, "notes", bump=10)
+  catalog.config("notes")
+
+  assert env_cache.info()["apps"] == 0
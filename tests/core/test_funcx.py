@@ -0,0 +1,102 @@
+import pytest
+
+from core.func import FuncX, funcx
+from core.func.func import FuncXNotFound, describe_funcx, funcx_functions
+from core.func.models import FuncXModel
+
+
+class Files:
+  @funcx
+  async def read(self, path: str, encoding: str = "utf-8") -> str:
+    """Read a file."""
+    return f"{path}:{encoding}"
+
+
+class Base(FuncX):
+  def __init__(self):
+    super().__init__()
+    self.files = Files()
+    self.calls = 0
+
+  @funcx
+  async def echo(self, value):
+    self.calls += 1
+    return value
+
+  @funcx
+  async def hidden(self):
+    return "base"
+
+  async def private(self):
+    return "private"
+
+  def funcx_children(self):
+    return {"files": Files}
+
+
+class Child(Base):
+  # Overridden without @funcx, no longer callable
+  async def hidden(self):
+    return "child"
+
+  @funcx
+  async def extra(self):
+    return "extra"
+
+
+def call(name: str, *args, **options) -> FuncXModel:
+  return FuncXModel(name=name, config={"args": list(args), "options": options})
+
+
+# ----------------------------------
+# Test: exposed functions are collected once per class
+# ----------------------------------
+
+def test_funcx_functions():
+  functions = funcx_functions(Child)
+
+  assert {"echo", "extra", "cancel_funcx", "list_funcx"} <= set(functions)
+  assert "hidden" not in functions
+  assert "private" not in functions
+  assert "hidden" in funcx_functions(Base)
+  assert funcx_functions(Child) is functions
+
+
+def test_describe_funcx():
+  (read,) = describe_funcx(Files, "files.")
+  assert read == {
+    "name": "files.read",
+    "signature": "(path: str, encoding: str = 'utf-8') -> str",
+    "doc": "Read a file.",
+    "cached": False
+  }
+
+
+def test_list_functions_includes_children():
+  names = [function["name"] for function in Child().list_functions()]
+
+  assert names == sorted(name for name in names if "." not in name) + ["files.read"]
+  assert "extra" in names
+
+
+# ----------------------------------
+# Test: calls go through the dispatch table
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_run_function():
+  obj = Child()
+
+  assert await obj.run_function(call("echo", 1)) == 1
+  assert await obj.run_function(call("echo", 2)) == 2
+  assert await obj.run_function(call("files.read", "a.txt", encoding="ascii")) == "a.txt:ascii"
+  assert obj.calls == 2
+  assert obj.funcx_calls == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", ["hidden", "private", "missing", "files.missing", "nope.read"])
+async def test_unexposed_functions_are_refused(name):
+  with pytest.raises(FuncXNotFound) as error:
+    await Child().run_function(call(name))
+  assert error.value.status_code == 404
@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+from pydantic import ValidationError
+
+from core.func import FuncX, funcx
+from core.func.func import BATCH_CONCURRENCY
+from core.func.models import BATCH_MAX_CALLS, FuncXBatchModel
+
+
+class Worker(FuncX):
+  def __init__(self):
+    super().__init__()
+    self.running = 0
+    self.peak = 0
+    self.order = []
+
+  @funcx
+  async def work(self, n: int, delay: float = 0):
+    self.running += 1
+    self.peak = max(self.peak, self.running)
+    try:
+      await asyncio.sleep(delay)
+    finally:
+      self.running -= 1
+    self.order.append(n)
+    return n * 2
+
+  @funcx
+  async def fail(self):
+    raise ValueError("broken")
+
+
+def batch(*calls, sequential: bool = False) -> FuncXBatchModel:
+  return FuncXBatchModel(calls=[{"name": name, "config": {"args": list(args)}} for name, *args in calls], sequential=sequential)
+
+
+# ----------------------------------
+# Test: results come back in request order, failures per call
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_results_in_request_order():
+  worker = Worker()
+  results = await worker.run_batch(batch(("work", 1, 0.03), ("fail",), ("missing",), ("work", 2, 0)))
+
+  assert results[0] == {"result": 2}
+  assert results[1] == {"error": "broken", "status": 500}
+  assert results[2] == {"error": "Function not found", "status": 404}
+  assert results[3] == {"result": 4}
+  # Concurrent, the quick one finished first
+  assert worker.order == [2, 1]
+
+
+@pytest.mark.asyncio
+async def test_sequential_batch():
+  worker = Worker()
+  results = await worker.run_batch(batch(("work", 1, 0.02), ("work", 2, 0), sequential=True))
+
+  assert results == [{"result": 2}, {"result": 4}]
+  assert worker.order == [1, 2]
+  assert worker.peak == 1
+
+
+# ----------------------------------
+# Test: batches are bounded in size and concurrency
+# ----------------------------------
+
+def test_batch_size_is_capped():
+  batch(*[("work", n) for n in range(BATCH_MAX_CALLS)])
+  with pytest.raises(ValidationError):
+    batch(*[("work", n) for n in range(BATCH_MAX_CALLS + 1)])
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_bounded():
+  worker = Worker()
+  calls = BATCH_CONCURRENCY * 3
+  results = await worker.run_batch(batch(*[("work", n, 0.01) for n in range(calls)]))
+
+  assert [result["result"] for result in results] == [n * 2 for n in range(calls)]
+  assert worker.peak == BATCH_CONCURRENCY
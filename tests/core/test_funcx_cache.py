@@ -0,0 +1,170 @@
+import gc
+import time
+import pytest
+
+from core.func import FuncX, funcx
+from core.func.cache import funcx_cache_info
+from core.func.func import describe_funcx, funcx_functions
+from core.func.models import FuncXModel
+
+
+class Store(FuncX):
+  def __init__(self):
+    super().__init__()
+    self.calls = 0
+
+  async def compute(self, value):
+    self.calls += 1
+    if value == "fail":
+      raise ValueError("broken")
+    return {"value": value, "call": self.calls}
+
+  @funcx(cache=True)
+  async def forever(self, value=None):
+    return await self.compute(value)
+
+  @funcx(cache=0)
+  async def zero(self, value=None):
+    return await self.compute(value)
+
+  @funcx(cache=False)
+  async def uncached(self, value=None):
+    return await self.compute(value)
+
+  @funcx(cache=60)
+  async def minute(self, value=None):
+    return await self.compute(value)
+
+  @funcx(cache={"max_entries": 2})
+  async def small(self, value=None):
+    return await self.compute(value)
+
+  @funcx(cache={"scope": "class"})
+  async def shared(self, value=None):
+    return await self.compute(value)
+
+  @funcx(cache={"key": lambda value, page=0: value})
+  async def keyed(self, value=None, page=0):
+    return await self.compute(value)
+
+
+async def call(obj: FuncX, name: str, *args, **options):
+  return await obj.run_function(FuncXModel(name=name, config={"args": list(args), "options": options}))
+
+
+# ----------------------------------
+# Test: results are reused per arguments
+# ----------------------------------
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", ["forever", "zero", "minute"])
+async def test_results_are_reused(name):
+  store = Store()
+  first = await call(store, name, [1, {"a": 2}])
+
+  assert await call(store, name, [1, {"a": 2}]) == first
+  assert await call(store, name, "other") != first
+  assert store.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_false_disables_cache():
+  store = Store()
+  await call(store, "uncached", 1)
+  await call(store, "uncached", 1)
+
+  assert store.calls == 2
+  assert funcx_functions(Store)["uncached"].cache is None
+  assert {f["name"]: f["cached"] for f in describe_funcx(Store)}["zero"] is True
+
+
+@pytest.mark.asyncio
+async def test_ttl_expires(monkeypatch):
+  store = Store()
+  await call(store, "minute", 1)
+
+  now = time.monotonic()
+  monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+  await call(store, "minute", 1)
+  assert store.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_failures_are_not_cached():
+  store = Store()
+  for _ in range(2):
+    with pytest.raises(ValueError):
+      await call(store, "forever", "fail")
+  assert store.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_is_evicted():
+  store = Store()
+  for value in (1, 2, 1, 3):
+    await call(store, "small", value)
+  await call(store, "small", 1)
+  await call(store, "small", 2)
+
+  # 1 kept (used last), 2 evicted by 3
+  assert store.calls == 4
+
+
+@pytest.mark.asyncio
+async def test_custom_key():
+  store = Store()
+  await call(store, "keyed", "a", page=1)
+  await call(store, "keyed", "a", page=2)
+  assert store.calls == 1
+
+
+# ----------------------------------
+# Test: instance scope, class scope and invalidation
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_scopes():
+  first, second = Store(), Store()
+  await call(first, "forever", 1)
+  await call(second, "forever", 1)
+  assert (first.calls, second.calls) == (1, 1)
+
+  await call(first, "shared", 1)
+  await call(second, "shared", 1)
+  assert (first.calls, second.calls) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_invalidate():
+  store, other = Store(), Store()
+  await call(store, "forever", 1)
+  await call(store, "forever", 2)
+  await call(other, "forever", 1)
+
+  funcx_functions(Store)["forever"].cache.invalidate(store, 1)
+  await call(store, "forever", 2)
+  await call(store, "forever", 1)
+  assert store.calls == 3
+
+  store.invalidate_funcx_cache("forever")
+  await call(store, "forever", 2)
+  await call(other, "forever", 1)
+  assert (store.calls, other.calls) == (4, 1)
+
+
+def test_instance_entries_go_with_the_instance():
+  cache = funcx_functions(Store)["forever"].cache
+  cache.invalidate()
+  store = Store()
+  cache._entries(store)[("k",)] = (None, 1)
+
+  assert cache.info()["entries"] == 1
+  del store
+  gc.collect()
+  assert cache.info()["entries"] == 0
+
+
+def test_caches_are_named_by_module():
+  info = funcx_cache_info()
+  assert f"{__name__}.Store.forever" in info
+  assert info[f"{__name__}.Store.zero"]["ttl"] == 0
@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+
+from core.func import FuncX, funcx
+from core.func.models import FuncXModel
+
+
+class Jobs(FuncX):
+  def __init__(self):
+    super().__init__()
+    self.started = asyncio.Event()
+    self.cancelled = []
+
+  @funcx
+  async def long(self, name: str):
+    self.started.set()
+    try:
+      await asyncio.sleep(10)
+    except asyncio.CancelledError:
+      self.cancelled.append(name)
+      raise
+
+
+def run(jobs: Jobs, name: str, funcx_id: str, *args) -> asyncio.Task:
+  model = FuncXModel(name=name, config={"id": funcx_id, "args": list(args)})
+  return asyncio.create_task(jobs.run_function(model))
+
+
+# ----------------------------------
+# Test: calls in flight are listed by id
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_list_funcx():
+  jobs = Jobs()
+  task = run(jobs, "long", "f1", "a")
+  await jobs.started.wait()
+
+  (call,) = await jobs.run_function(FuncXModel(name="list_funcx"))
+  assert call["id"] == "f1"
+  assert call["name"] == "long"
+  assert call["elapsed"] >= 0
+  assert jobs.funcx_in_flight == 1
+
+  task.cancel()
+  await asyncio.gather(task, return_exceptions=True)
+  await asyncio.sleep(0)
+  assert jobs.funcx_in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_duplicate_id_is_refused():
+  jobs = Jobs()
+  task = run(jobs, "long", "f1", "a")
+  await jobs.started.wait()
+
+  with pytest.raises(Exception, match="already in flight"):
+    await jobs.run_function(FuncXModel(name="long", config={"id": "f1", "args": ["b"]}))
+
+  await jobs.on_close()
+  await asyncio.gather(task, return_exceptions=True)
+
+
+# ----------------------------------
+# Test: calls are cancelled by id
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_cancel_funcx():
+  jobs = Jobs()
+  task = run(jobs, "long", "f1", "a")
+  await jobs.started.wait()
+
+  assert await jobs.run_function(FuncXModel(name="cancel_funcx", config={"args": ["f1"]}))
+  # Cancelled calls resolve to None
+  assert await asyncio.wait_for(task, 1) is None
+  assert jobs.cancelled == ["a"]
+  assert not await jobs.cancel_funcx("f1")
+  assert not await jobs.cancel_funcx("unknown")
+
+
+@pytest.mark.asyncio
+async def test_close_cancels_calls():
+  jobs = Jobs()
+  tasks = [run(jobs, "long", f"f{n}", str(n)) for n in range(3)]
+  await jobs.started.wait()
+  await asyncio.sleep(0)
+
+  await asyncio.wait_for(jobs.on_close(), 3)
+  await asyncio.gather(*tasks, return_exceptions=True)
+
+  assert sorted(jobs.cancelled) == ["0", "1", "2"]
+  assert jobs.funcx_in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_close_from_own_call():
+  class Closing(Jobs):
+    @funcx
+    async def close(self):
+      await self.on_close()
+      return "closed"
+
+  jobs = Closing()
+  assert await asyncio.wait_for(jobs.run_function(FuncXModel(name="close")), 1) == "closed"
@@ -0,0 +1,163 @@
+import asyncio
+import pytest
+
+from core.func import FuncX, funcx
+from core.func.func import FUNCX_EVENT, FUNCX_CANCEL_EVENT, FUNCX_RESULT_EVENT, FuncXTimeout
+from core.func.models import FuncXBatchModel, FuncXModel
+from core.client import Client
+from core.ui import ClientUI
+from core.utils import load_app_manifest
+
+
+class Remote(FuncX):
+  def __init__(self):
+    super().__init__()
+    self.events = []
+    self.release = asyncio.Event()
+
+  async def send_event(self, event, payload):
+    self.events.append((event, payload))
+
+  @funcx
+  async def add(self, a: int, b: int) -> int:
+    return a + b
+
+  @funcx
+  async def wait(self) -> str:
+    await self.release.wait()
+    return "released"
+
+  @funcx
+  async def fail(self):
+    raise ValueError("broken")
+
+
+async def replies(remote: Remote, count: int, timeout: float = 2) -> list:
+  async def wait():
+    while len(remote.events) < count:
+      await asyncio.sleep(0.001)
+  await asyncio.wait_for(wait(), timeout)
+  assert all(event == FUNCX_RESULT_EVENT for event, _ in remote.events)
+  return [payload for _, payload in remote.events]
+
+
+# ----------------------------------
+# Test: every websocket call gets one reply with its id
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_result_reply():
+  remote = Remote()
+  await remote.run_funcx_request({"id": "r1", "name": "add", "config": {"args": [1, 2]}}, limit=8)
+  await remote.run_funcx_request({"id": "r2", "name": "fail"}, limit=8)
+
+  assert sorted(await replies(remote, 2), key=lambda reply: reply["id"]) == [
+    {"id": "r1", "result": 3},
+    {"id": "r2", "error": "broken", "status": 500}
+  ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("payload, status", [
+  ({"name": "add"}, 422),
+  ({"id": 5, "name": "add"}, 422),
+  ({"id": "r1"}, 422),
+  ({"id": "r1", "name": "add", "config": {"timeout": "soon"}}, 422)
+])
+async def test_bad_requests_are_answered(payload, status):
+  remote = Remote()
+  await remote.run_funcx_request(payload, limit=8)
+
+  (reply,) = await replies(remote, 1)
+  assert reply["status"] == status
+  assert reply["id"] == (payload["id"] if isinstance(payload.get("id"), str) else None)
+
+
+@pytest.mark.asyncio
+async def test_duplicate_and_over_limit():
+  remote = Remote()
+  await remote.run_funcx_request({"id": "r1", "name": "wait"}, limit=1)
+  await remote.run_funcx_request({"id": "r1", "name": "wait"}, limit=1)
+  await remote.run_funcx_request({"id": "r2", "name": "wait"}, limit=1)
+
+  assert [(reply["id"], reply["status"]) for reply in await replies(remote, 2)] == [("r1", 409), ("r2", 429)]
+  remote.release.set()
+  assert (await replies(remote, 3))[2] == {"id": "r1", "result": "released"}
+
+
+@pytest.mark.asyncio
+async def test_timeout_reply():
+  remote = Remote()
+  await remote.run_funcx_request({"id": "r1", "name": "wait", "config": {"timeout": 1}}, limit=8)
+
+  (reply,) = await replies(remote, 1)
+  assert reply["status"] == 504
+  assert remote.funcx_in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_timeout_over_http_and_batch():
+  remote = Remote()
+  with pytest.raises(FuncXTimeout):
+    await remote.run_function(FuncXModel(name="wait", config={"timeout": 1}))
+
+  results = await remote.run_batch(FuncXBatchModel(calls=[{"name": "wait", "config": {"timeout": 1}}]))
+  assert results[0]["status"] == 504
+
+
+# ----------------------------------
+# Test: a cancelled call is answered once, by the cancel
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_cancel_request():
+  remote = Remote()
+  await remote.run_funcx_request({"id": "r1", "name": "wait"}, limit=8)
+  await asyncio.sleep(0.01)
+
+  assert await remote.cancel_funcx_request("r1")
+  assert not await remote.cancel_funcx_request("r1")
+  remote.release.set()
+  await asyncio.sleep(0.01)
+
+  assert await replies(remote, 1) == [{"id": "r1", "cancelled": True}]
+  assert remote.funcx_in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_close_cancels_requests():
+  remote = Remote()
+  await remote.run_funcx_request({"id": "r1", "name": "wait"}, limit=8)
+  await asyncio.sleep(0.01)
+
+  await remote.on_close()
+  assert remote.funcx_in_flight == 0
+
+
+# ----------------------------------
+# Test: core routes websocket funcx events
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_core_routes_funcx_events(make_core, install_app):
+  install_app("notes")
+  core = make_core()
+  client = Client(
+    core.user, core.config.resolve_path, core.auth.new_token("kui"),
+    ClientUI("kui", core.get_ui_config("kui")), core.config.kikx
+  )
+  await core.add_client(client)
+  app = await core.open_app(client.id, "notes", load_app_manifest(core, "notes"), False)
+
+  # Apps need the funcx permission
+  await core.on_app_data(client, app, {"event": FUNCX_EVENT, "payload": {"id": "a1", "name": "list_funcx"}})
+  (message,) = app.connection.replay.since(0)
+  assert message.event == FUNCX_RESULT_EVENT
+  assert message.payload == {"id": "a1", "error": "Permission denied", "status": 403}
+
+  await core.on_client_data(client, {"event": FUNCX_EVENT, "payload": {"id": "c1", "name": "list_funcx"}})
+  await core.on_client_data(client, {"event": FUNCX_CANCEL_EVENT, "payload": {"id": "c1"}})
+  await asyncio.sleep(0.01)
+  (message,) = client.connection.replay.since(0)
+  assert message.event == FUNCX_RESULT_EVENT
+  assert message.payload["id"] == "c1"
@@ -0,0 +1,92 @@
+import pytest
+import asyncio
+
+from core.func.handlers import create_handler
+
+
+def recorder():
+  sent = []
+  async def send_event(event, payload):
+    sent.append((payload["data"]["status"], payload["data"]["output"]))
+  return sent, send_event
+
+
+# ----------------------------------
+# Test: without a window every output is its own frame
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_no_window_sends_each_output():
+  sent, send_event = recorder()
+  handler = create_handler("h", send_event)
+
+  await handler.output("a")
+  await handler.output("b")
+
+  assert sent == [("output", "a"), ("output", "b")]
+
+
+# ----------------------------------
+# Test: output inside the window is coalesced
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_window_coalesces_output():
+  sent, send_event = recorder()
+  handler = create_handler("h", send_event, window_ms=20)
+
+  for line in ("a\n", "b\n", "c\n"):
+    await handler.output(line)
+  assert sent == []
+
+  await asyncio.sleep(0.05)
+  assert sent == [("output", "a\nb\nc\n")]
+
+
+@pytest.mark.asyncio
+async def test_max_bytes_flushes_early():
+  sent, send_event = recorder()
+  handler = create_handler("h", send_event, window_ms=10_000, max_bytes=4)
+
+  await handler.output("ab")
+  await handler.output("cd")
+
+  assert sent == [("output", "abcd")]
+
+
+# ----------------------------------
+# Test: other statuses flush pending output first
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_status_keeps_order():
+  sent, send_event = recorder()
+  handler = create_handler("h", send_event, window_ms=10_000)
+
+  await handler.output("x")
+  await handler.error("boom")
+  await handler.ended("done")
+
+  assert sent == [("output", "x"), ("error", "boom"), ("ended", "done")]
+
+
+@pytest.mark.asyncio
+async def test_non_text_output_is_not_buffered():
+  sent, send_event = recorder()
+  handler = create_handler("h", send_event, window_ms=10_000)
+
+  await handler.output("x")
+  await handler.output({"k": 1})
+
+  assert sent == [("output", "x"), ("output", {"k": 1})]
+
+
+@pytest.mark.asyncio
+async def test_handler_without_id_sends_nothing():
+  sent, send_event = recorder()
+  handler = create_handler(None, send_event)
+
+  await handler.output("x")
+  await handler.ended("done")
+
+  assert sent == []
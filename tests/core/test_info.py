@@ -0,0 +1,14 @@
+from services.system.routes.info import server_info
+
+
+# ----------------------------------
+# Test: subsystem counters are served apart from the sessions
+# ----------------------------------
+
+def test_server_info(make_core):
+  core = make_core()
+  info = server_info(core)
+
+  assert set(info) == {"reaper", "snapshot", "cluster", "limits", "pubsub", "funcx_cache", "modules", "task_env"}
+  assert info["reaper"] == core.reaper.info()
+  assert info["pubsub"] == core.pubsub.info()
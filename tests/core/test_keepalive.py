@@ -0,0 +1,135 @@
+import time
+import pytest
+
+from lib.utils import get_protocol_latency, get_websocket_protocol
+from core.connection import Connection
+from core.models.kikx_models import ConnectionConfigModel
+
+
+class Protocol:
+  def __init__(self, rtt=None):
+    self.last_ping_rtt = rtt
+
+  async def send(self, message):
+    pass
+
+
+class Socket:
+  def __init__(self, send):
+    self._send = send
+
+
+# ----------------------------------
+# Test: the server protocol is found behind middleware wrappers
+# ----------------------------------
+
+def test_protocol_from_bound_send():
+  protocol = Protocol()
+  assert get_websocket_protocol(Socket(protocol.send)) is protocol
+
+
+def test_protocol_through_closures():
+  protocol = Protocol()
+  def middleware(send):
+    async def wrapped(message):
+      await send(message)
+    return wrapped
+
+  assert get_websocket_protocol(Socket(middleware(middleware(protocol.send)))) is protocol
+  assert get_websocket_protocol(Socket(None)) is None
+
+
+def test_protocol_fallback_is_none():
+  class Unknown:
+    async def send(self, message):
+      pass
+
+  # Bound to something that keeps no RTT (another server or backend)
+  assert get_websocket_protocol(Socket(Unknown().send)) is None
+  # Plain function, nothing bound behind it
+  async def send(message):
+    pass
+  assert get_websocket_protocol(Socket(send)) is None
+
+  # Closure with a cell that isn't filled yet
+  def wrapper():
+    async def wrapped(message):
+      await inner(message)
+    return wrapped
+    inner = None
+
+  assert get_websocket_protocol(Socket(wrapper())) is None
+
+
+@pytest.mark.asyncio
+async def test_protocol_from_uvicorn_sansio():
+  from uvicorn.config import Config
+  from uvicorn.server import ServerState
+  from uvicorn.protocols.websockets.websockets_sansio_impl import WebSocketsSansIOProtocol
+
+  async def app(scope, receive, send):
+    pass
+
+  config = Config(app)
+  config.load()
+  protocol = WebSocketsSansIOProtocol(config=config, server_state=ServerState(), app_state={})
+  assert get_websocket_protocol(Socket(protocol.send)) is protocol
+
+
+def test_latency_attributes():
+  assert get_protocol_latency(Protocol(0.25)) == 0.25
+  # Never pinged yet
+  assert get_protocol_latency(Protocol(0)) is None
+  assert get_protocol_latency(None) is None
+
+
+# ----------------------------------
+# Test: a new keepalive round trip counts as activity
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_pong_refreshes_last_seen(websocket):
+  connection = Connection()
+  ws, transport = await websocket()
+  await connection.connect(ws)
+
+  connection.last_seen -= 100
+  transport.last_ping_rtt = 0.02
+
+  assert connection.sample_latency() == 0.02
+  assert time.monotonic() - connection.last_seen < 1
+  assert connection.info()["latency_ms"] == 20.0
+  await connection.stop()
+
+
+@pytest.mark.asyncio
+async def test_silent_connection_is_stale(websocket):
+  connection = Connection(ConnectionConfigModel(ping_interval=1, ping_timeout=1))
+  ws, _ = await websocket()
+  await connection.connect(ws)
+  assert not connection.is_stale
+
+  connection.last_seen -= 3
+  assert connection.is_stale
+
+  connection.touch(10)
+  assert not connection.is_stale
+  assert connection.usage()["bytes_in"] == 10
+  await connection.stop()
+
+
+@pytest.mark.asyncio
+async def test_stale_connection_is_replaced(websocket):
+  connection = Connection(ConnectionConfigModel(ping_interval=1, ping_timeout=1))
+  ws, transport = await websocket()
+  await connection.connect(ws)
+
+  ws2, _ = await websocket()
+  with pytest.raises(ConnectionError):
+    await connection.connect(ws2)
+
+  connection.last_seen -= 3
+  await connection.connect(ws2)
+  assert transport.closed == 1001
+  assert connection.websocket is ws2
+  await connection.stop()
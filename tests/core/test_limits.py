@@ -0,0 +1,121 @@
+import asyncio
+import pytest
+
+from core.limits import Admission, LimitExceeded, Limits
+from core.models.kikx_models import LimitsConfigModel
+from core.client import Client
+from core.ui import ClientUI
+from core.utils import load_app_manifest
+
+
+def make_limits(**config) -> Limits:
+  return Limits(LimitsConfigModel(**config))
+
+
+# ----------------------------------
+# Test: client / app caps reject at once
+# ----------------------------------
+
+def test_client_and_app_caps():
+  limits = make_limits(max_clients=2, max_apps_per_client=1, max_apps=3)
+  limits.check_clients(1)
+  limits.check_apps(0, 2)
+
+  with pytest.raises(LimitExceeded) as error:
+    limits.check_clients(2)
+  assert error.value.limit == "clients"
+  assert error.value.status_code == 429
+
+  with pytest.raises(LimitExceeded, match="per client"):
+    limits.check_apps(1, 0)
+  with pytest.raises(LimitExceeded) as error:
+    limits.check_apps(0, 3)
+  assert error.value.limit == "apps"
+
+  assert limits.info()["rejected"] == {"clients": 1, "apps_per_client": 1, "apps": 1}
+
+
+def test_unlimited():
+  limits = make_limits(max_clients=None, max_apps_per_client=None, max_apps=None)
+  limits.check_clients(10 ** 6)
+  limits.check_apps(10 ** 6, 10 ** 6)
+
+
+# ----------------------------------
+# Test: task slots queue, then reject
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_admission_queues_past_limit():
+  limits = make_limits()
+  admission = Admission(limits, "tasks", 1, max_queued=1, timeout=1)
+  release = asyncio.Event()
+  waited = []
+
+  async def task():
+    async with admission.slot() as queued:
+      waited.append(queued)
+      await release.wait()
+
+  first = asyncio.create_task(task())
+  while not admission.running:
+    await asyncio.sleep(0)
+  second = asyncio.create_task(task())
+  while not admission.waiting:
+    await asyncio.sleep(0)
+  try:
+    assert admission.info() == {"limit": 1, "running": 1, "waiting": 1}
+    # Queue full
+    with pytest.raises(LimitExceeded):
+      admission.check()
+  finally:
+    release.set()
+  await asyncio.wait_for(asyncio.gather(first, second), 1)
+  assert waited == [False, True]
+  assert limits.stats["queued"] == 1
+  assert admission.info()["running"] == 0
+
+
+@pytest.mark.asyncio
+async def test_admission_times_out():
+  limits = make_limits()
+  admission = Admission(limits, "tasks", 1, max_queued=5, timeout=0.01)
+
+  async with admission.slot():
+    with pytest.raises(LimitExceeded, match="no slot within"):
+      async with admission.slot():
+        pass
+
+  assert admission.info() == {"limit": 1, "running": 0, "waiting": 0}
+  assert limits.stats["rejected"] == {"tasks": 1}
+
+
+@pytest.mark.asyncio
+async def test_unlimited_admission_counts():
+  admission = Admission(make_limits(), "tasks", None, max_queued=0, timeout=1)
+  async with admission.slot() as queued:
+    assert not queued
+    assert admission.running == 1
+  assert admission.running == 0
+
+
+# ----------------------------------
+# Test: core rejects apps past the configured caps
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_open_app_over_limit(make_core, install_app):
+  install_app("notes")
+  core = make_core(limits={"max_apps_per_client": 1})
+  client = Client(
+    core.user, core.config.resolve_path, core.auth.new_token("kui"),
+    ClientUI("kui", core.get_ui_config("kui")), core.config.kikx
+  )
+  await core.add_client(client)
+  manifest = load_app_manifest(core, "notes")
+
+  await core.open_app(client.id, "notes", manifest, False)
+  with pytest.raises(LimitExceeded):
+    await core.open_app(client.id, "notes", manifest, False)
+  assert len(client.running_apps) == 1
+  assert len(core.app_index) == 1
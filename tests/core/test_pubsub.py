@@ -0,0 +1,102 @@
+import pytest
+
+from core.pubsub import PubSub, is_pattern
+from core.connection import Connection
+from core.models.app_models import AppModel
+
+
+class Subscriber:
+  def __init__(self, subscriber_id: str):
+    self.id = subscriber_id
+    self.connection = Connection()
+
+
+def ids(subscribers) -> list:
+  return sorted(subscriber.id for subscriber in subscribers)
+
+
+# ----------------------------------
+# Test: exact topics and fnmatch patterns
+# ----------------------------------
+
+def test_is_pattern():
+  assert is_pattern("app:*")
+  assert is_pattern("theme?")
+  assert is_pattern("[ab]")
+  assert not is_pattern("theme")
+
+
+def test_exact_and_pattern_matches():
+  pubsub = PubSub()
+  a, b, c = Subscriber("a"), Subscriber("b"), Subscriber("c")
+  pubsub.subscribe(a, "theme")
+  pubsub.subscribe(b, "app:*")
+  pubsub.subscribe(c, "*")
+
+  assert ids(pubsub.subscribers("theme")) == ["a", "c"]
+  assert ids(pubsub.subscribers("app:open")) == ["b", "c"]
+  assert ids(pubsub.subscribers("other")) == ["c"]
+
+
+def test_subscriber_matched_once():
+  pubsub = PubSub()
+  a = Subscriber("a")
+  pubsub.subscribe(a, "app:open")
+  pubsub.subscribe(a, "app:*")
+  pubsub.subscribe(a, "*")
+
+  assert ids(pubsub.subscribers("app:open")) == ["a"]
+
+
+def test_empty_topic_rejected():
+  with pytest.raises(ValueError):
+    PubSub().subscribe(Subscriber("a"), "")
+
+
+# ----------------------------------
+# Test: unsubscribe updates the index and the match cache
+# ----------------------------------
+
+def test_unsubscribe_one_and_all():
+  pubsub = PubSub()
+  a = Subscriber("a")
+  pubsub.subscribe(a, "theme")
+  pubsub.subscribe(a, "app:*")
+  assert ids(pubsub.subscribers("app:x")) == ["a"]
+
+  pubsub.unsubscribe(a, "app:*")
+  assert pubsub.subscribers("app:x") == []
+  assert pubsub.topics(a) == ["theme"]
+
+  pubsub.unsubscribe(a)
+  assert pubsub.subscribers("theme") == []
+  assert pubsub.info()["subscribers"] == 0
+  assert pubsub.info()["topics"] == 0
+
+
+# ----------------------------------
+# Test: publish reaches only matching subscribers
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_publish_counts():
+  pubsub = PubSub()
+  a, b = Subscriber("a"), Subscriber("b")
+  pubsub.subscribe(a, "news")
+  pubsub.subscribe(b, "sports")
+
+  assert await pubsub.publish("news", "signal", {"x": 1}) == 1
+  assert await pubsub.publish("weather", "signal", {}) == 0
+
+  assert a.connection.seq == 1
+  assert b.connection.seq == 0
+  assert pubsub.info()["published"] == 2
+  assert pubsub.info()["delivered"] == 1
+
+
+# ----------------------------------
+# Test: apps receive every signal unless app.json lists signals
+# ----------------------------------
+
+def test_app_signals_default_to_all():
+  assert AppModel.model_fields["signals"].default == ["*"]
@@ -0,0 +1,104 @@
+import time
+import pytest
+from typing import Optional
+
+from core.reaper import Reaper
+from core.connection import Connection
+from core.state import MemoryStateBackend
+from core.models.kikx_models import ConnectionConfigModel, ReaperConfigModel
+
+
+class Session:
+  def __init__(self, session_id: str, idle: float):
+    self.id = session_id
+    self.connection = Connection(ConnectionConfigModel(timeout=10))
+    self.connection.disconnected_at = time.monotonic() - idle
+    self.running_apps = {}
+
+  def get_loaded_module(self, name: str):
+    return None
+
+
+class FakeCore:
+  def __init__(self):
+    self.clients = {}
+    self.state = MemoryStateBackend(token_ttl=60)
+    self.closed_apps = []
+
+  async def on_client_disconnect(self, client):
+    del self.clients[client.id]
+
+  async def close_app(self, client, app):
+    del client.running_apps[app.id]
+    self.closed_apps.append(app.id)
+
+
+def add_client(core: FakeCore, client_id: str, idle: float, apps: Optional[dict] = None) -> Session:
+  client = core.clients[client_id] = Session(client_id, idle)
+  for app_id, app_idle in (apps or {}).items():
+    client.running_apps[app_id] = Session(app_id, app_idle)
+  return client
+
+
+# ----------------------------------
+# Test: only sessions idle past the timeout are reaped
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_reaps_expired_clients_with_apps():
+  core = FakeCore()
+  add_client(core, "old", 60, {"a1": 60, "a2": 0})
+  add_client(core, "fresh", 1)
+  reaper = Reaper(core, ReaperConfigModel())
+
+  await reaper.reap()
+
+  assert list(core.clients) == ["fresh"]
+  assert reaper.stats["clients"] == 1
+  assert reaper.stats["apps"] == 2
+  assert reaper.stats["runs"] == 1
+
+
+@pytest.mark.asyncio
+async def test_reaps_expired_apps_of_live_clients():
+  core = FakeCore()
+  client = add_client(core, "c", 0, {"dead": 60, "alive": 1})
+  client.connection.disconnected_at = None  # connected long ago, never dropped
+
+  reaper = Reaper(core, ReaperConfigModel())
+  await reaper.reap()
+
+  assert core.closed_apps == ["dead"]
+  assert list(client.running_apps) == ["alive"]
+
+
+@pytest.mark.asyncio
+async def test_counts_reclaimed_events():
+  core = FakeCore()
+  client = add_client(core, "old", 60)
+  for i in range(3):
+    await client.connection.send_event("e", {"i": i})
+
+  reaper = Reaper(core, ReaperConfigModel())
+  await reaper.reap()
+
+  assert reaper.stats["events"] == 3
+  assert reaper.stats["bytes"] > 0
+
+
+# ----------------------------------
+# Test: expired login tokens are purged
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_purges_expired_tokens():
+  core = FakeCore()
+  core.state.add_token("new")
+  core.state.add_token("old")
+  core.state._tokens["old"] -= 120
+
+  reaper = Reaper(core, ReaperConfigModel())
+  await reaper.reap()
+
+  assert reaper.stats["tokens"] == 1
+  assert core.state.has_token("new")
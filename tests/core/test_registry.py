@@ -0,0 +1,67 @@
+import os
+import pytest
+
+from core.apps.registry import ModuleRegistry
+
+
+def write_module(path, name: str, value: int) -> None:
+  file = path / f"{name}.py"
+  file.write_text(f"class {name.capitalize()}:\n  value = {value}\n")
+  # Distinct mtime even on coarse clocks
+  stat = file.stat()
+  os.utime(file, (stat.st_atime, stat.st_mtime + value))
+
+
+# ----------------------------------
+# Test: modules are discovered and imported once
+# ----------------------------------
+
+def test_discover_skips_private(tmp_path):
+  write_module(tmp_path, "alpha", 1)
+  write_module(tmp_path, "beta", 1)
+  (tmp_path / "_helpers.py").write_text("")
+
+  assert ModuleRegistry(tmp_path).discover() == ["alpha", "beta"]
+
+
+def test_class_is_cached(tmp_path):
+  write_module(tmp_path, "alpha", 1)
+  registry = ModuleRegistry(tmp_path)
+
+  first = registry.get("alpha")
+  write_module(tmp_path, "alpha", 2)
+
+  assert registry.get("alpha") is first
+  assert first.value == 1
+  assert registry.info()["alpha"]["loads"] == 1
+
+
+# ----------------------------------
+# Test: with reload a changed file is imported again
+# ----------------------------------
+
+def test_reload_on_change(tmp_path):
+  write_module(tmp_path, "alpha", 1)
+  registry = ModuleRegistry(tmp_path, reload=True)
+
+  first = registry.get("alpha")
+  assert registry.get("alpha") is first
+
+  write_module(tmp_path, "alpha", 2)
+  second = registry.get("alpha")
+
+  assert second is not first
+  assert second.value == 2
+  assert registry.info()["alpha"]["loads"] == 2
+
+
+def test_preload_survives_broken_module(tmp_path):
+  write_module(tmp_path, "alpha", 1)
+  (tmp_path / "broken.py").write_text("raise RuntimeError('nope')\n")
+  registry = ModuleRegistry(tmp_path)
+
+  registry.preload()
+
+  assert list(registry.info()) == ["alpha"]
+  with pytest.raises(RuntimeError):
+    registry.get("broken")
@@ -0,0 +1,155 @@
+import json
+import pytest
+
+from core.connection import Connection, MessageEvent, ReplayBuffer
+from core.models.kikx_models import ConnectionConfigModel
+
+
+def buffer_with(count: int, max_messages: int = 100, max_bytes: int = 1 << 20) -> ReplayBuffer:
+  buffer = ReplayBuffer(max_messages, max_bytes)
+  for seq in range(1, count + 1):
+    buffer.append(MessageEvent("e", {}, seq), 10)
+  return buffer
+
+
+# ----------------------------------
+# Test: ReplayBuffer bounds and lookups
+# ----------------------------------
+
+def test_buffer_evicts_by_count():
+  buffer = buffer_with(5, max_messages=3)
+
+  assert len(buffer) == 3
+  assert buffer.first_seq == 3
+  assert buffer.evicted == 2
+  assert buffer.bytes == 30
+
+
+def test_buffer_evicts_by_bytes():
+  buffer = buffer_with(5, max_bytes=25)
+
+  assert [m.seq for m in buffer.since(0)] == [4, 5]
+
+
+def test_buffer_since():
+  buffer = buffer_with(5)
+
+  assert [m.seq for m in buffer.since(3)] == [4, 5]
+  assert buffer.since(5) == []
+  assert len(buffer.since(0)) == 5
+
+
+def test_buffer_trim():
+  buffer = buffer_with(5)
+
+  assert buffer.trim(3) == 3
+  assert buffer.first_seq == 4
+  assert buffer.bytes == 20
+  assert buffer.trim(3) == 0
+
+
+# ----------------------------------
+# Test: resume with last_seq sends the missing tail in one replay frame
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_resume_sends_replay_frame(websocket, drain):
+  connection = Connection()
+  for i in range(4):
+    await connection.send_event("e", {"i": i})
+
+  ws, transport = await websocket()
+  await connection.connect(ws, last_seq=2)
+  await drain(connection)
+
+  assert len(transport.sent) == 1
+  frame = json.loads(transport.sent[0])
+  assert frame["event"] == "replay"
+  assert frame["payload"]["since"] == 2
+  assert frame["payload"]["missed"] == 0
+  assert [e["seq"] for e in frame["payload"]["events"]] == [3, 4]
+  await connection.stop()
+
+
+@pytest.mark.asyncio
+async def test_resume_reports_gap(websocket, drain):
+  connection = Connection(ConnectionConfigModel(replay_max_messages=2))
+  for i in range(5):
+    await connection.send_event("e", {"i": i})
+
+  ws, transport = await websocket()
+  await connection.connect(ws, last_seq=1)
+  await drain(connection)
+
+  payload = json.loads(transport.sent[0])["payload"]
+  # 2 and 3 were evicted
+  assert payload["missed"] == 2
+  assert [e["seq"] for e in payload["events"]] == [4, 5]
+  await connection.stop()
+
+
+@pytest.mark.asyncio
+async def test_resume_from_unknown_seq_resends_all(websocket, drain):
+  connection = Connection()
+  for i in range(2):
+    await connection.send_event("e", {"i": i})
+
+  ws, transport = await websocket()
+  # Sequence of a previous server incarnation
+  await connection.connect(ws, last_seq=99)
+  await drain(connection)
+
+  payload = json.loads(transport.sent[0])["payload"]
+  assert [e["seq"] for e in payload["events"]] == [1, 2]
+  await connection.stop()
+
+
+# ----------------------------------
+# Test: acks trim the buffer, never past what was sent
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_ack_trims_sent_events(websocket, drain):
+  connection = Connection()
+  ws, transport = await websocket()
+  await connection.connect(ws)
+  for i in range(3):
+    await connection.send_event("e", {"i": i})
+  await drain(connection)
+
+  connection.ack(2)
+  assert connection.acked_seq == 2
+  assert connection.replay.first_seq == 3
+
+  # Bogus ack beyond what was sent
+  connection.ack(50)
+  assert connection.acked_seq == 3
+  assert len(connection.replay) == 0
+  await connection.stop()
+
+
+def test_ack_ignores_unsent():
+  connection = Connection()
+  connection.ack(5)
+
+  assert connection.acked_seq == 0
+
+
+# ----------------------------------
+# Test: dump_state / load_state keep sequence and buffered events
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_state_round_trip():
+  connection = Connection()
+  for i in range(3):
+    await connection.send_event("e", {"i": i})
+
+  restored = Connection()
+  restored.load_state(connection.dump_state())
+
+  assert restored.seq == 3
+  assert [(m.seq, m.payload) for m in restored.replay.since(0)] == [(1, {"i": 0}), (2, {"i": 1}), (3, {"i": 2})]
+  # First websocket after a restore is a reconnect
+  assert connection.is_new
+  assert not restored.is_new
@@ -0,0 +1,85 @@
+import signal
+import shutil
+import importlib
+import pytest
+
+from core.models.kikx_models import ServerModel
+
+from tests.core.conftest import KIKXFS
+
+
+@pytest.fixture(scope="module")
+def main(tmp_path_factory):
+  """The server entry module, its core set up on a throwaway storage."""
+  storage = tmp_path_factory.mktemp("kikxfs")
+  for name in ("config", "data"):
+    shutil.copytree(KIKXFS / name, storage / name)
+  (storage / "apps").mkdir()
+
+  with pytest.MonkeyPatch.context() as monkeypatch:
+    monkeypatch.setenv("KIKXFS", str(storage))
+    monkeypatch.setenv("KIKX_WORKER", "1")
+    # Routes and services are loaded relative to kikx/
+    monkeypatch.chdir(KIKXFS.parent / "kikx")
+    yield importlib.import_module("main")
+
+
+# ----------------------------------
+# Test: server tuning options reach uvicorn
+# ----------------------------------
+
+def test_server_options(main):
+  config = ServerModel(loop="asyncio", http="h11", ws="websockets", backlog=10, timeout_keep_alive=2, limit_concurrency=50)
+
+  assert main.server_options(config) == {
+    "loop": "asyncio",
+    "http": "h11",
+    "ws": "websockets",
+    "backlog": 10,
+    "timeout_keep_alive": 2,
+    "limit_concurrency": 50
+  }
+
+
+@pytest.mark.parametrize("option, value", [("loop", "uvloop"), ("http", "httptools"), ("ws", "websockets-sansio")])
+def test_missing_implementation_falls_back(main, monkeypatch, option, value):
+  missing = main.OPTIONAL_IMPLEMENTATIONS[value]
+  monkeypatch.setattr(main, "find_spec", lambda package: None if package == missing else object())
+
+  options = main.server_options(ServerModel(**{option: value}))
+  assert options[option] == "auto"
+
+
+def test_installed_implementation_is_kept(main, monkeypatch):
+  monkeypatch.setattr(main, "find_spec", lambda package: object())
+  assert main.server_options(ServerModel(loop="uvloop"))["loop"] == "uvloop"
+
+
+def test_invalid_implementation_is_rejected():
+  with pytest.raises(ValueError):
+    ServerModel(loop="trio")
+
+
+# ----------------------------------
+# Test: several workers run under uvicorn's supervisor
+# ----------------------------------
+
+def test_supervisor_for_workers(main):
+  import uvicorn
+
+  config = uvicorn.Config("core.kikx:kikx_app", host="127.0.0.1", port=0, workers=2)
+  # The supervisor takes over signal handling
+  handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP)}
+  try:
+    supervisor = main.create_supervisor(config)
+  finally:
+    for sig, handler in handlers.items():
+      signal.signal(sig, handler)
+
+  try:
+    assert supervisor.processes_num == 2
+    assert supervisor.sockets[0].getsockname()[1] > 0
+    assert supervisor.config is config
+  finally:
+    for sock in supervisor.sockets:
+      sock.close()
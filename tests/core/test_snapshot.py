@@ -0,0 +1,107 @@
+import pytest
+import pytest_asyncio
+
+from core.client import Client
+from core.ui import ClientUI
+from core.utils import load_app_manifest
+
+
+async def new_client(core) -> Client:
+  client = Client(
+    core.user, core.config.resolve_path, core.auth.new_token("kui"),
+    ClientUI("kui", core.get_ui_config("kui")), core.config.kikx
+  )
+  await core.add_client(client)
+  return client
+
+
+async def open_app(core, client: Client, name: str):
+  return await core.open_app(client.id, name, load_app_manifest(core, name), False)
+
+
+@pytest_asyncio.fixture
+async def saved(make_core, install_app):
+  """A core with one client running two apps, saved to the snapshot file."""
+  install_app("notes")
+  install_app("files", signals=["files.*"])
+  core = make_core()
+
+  client = await new_client(core)
+  core.pubsub.subscribe(client, "system")
+  notes = await open_app(core, client, "notes")
+  files = await open_app(core, client, "files")
+  await client.connection.send_event("hello", {"n": 1})
+  await notes.send_event("note", {"n": 2})
+  await files.attach_channel(client.connection)
+
+  path = core.snapshot.save()
+  return {"path": path, "client": client, "apps": [notes, files]}
+
+
+# ----------------------------------
+# Test: saved sessions come back with their ids and events
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_snapshot_keeps_no_tokens(saved):
+  assert saved["client"].access_token not in saved["path"].read_text()
+  assert "access_token" not in saved["path"].read_text()
+
+
+@pytest.mark.asyncio
+async def test_restore_sessions(saved, make_core):
+  core = make_core()
+  assert await core.snapshot.restore() == 1
+  assert not saved["path"].exists()
+
+  client = core.clients[saved["client"].id]
+  assert client.access_token != saved["client"].access_token
+  assert core.pubsub.topics(client) == ["system"]
+  assert client.connection.seq == 1
+  assert [message.payload for message in client.connection.replay.since(0)] == [{"n": 1}]
+
+  notes, files = (client.running_apps[app.id] for app in saved["apps"])
+  assert notes.connection.seq == 1
+  assert [message.payload for message in notes.connection.replay.since(0)] == [{"n": 2}]
+  assert files.multiplexed
+  assert not notes.connection.is_new
+  assert core.pubsub.topics(files) == ["files.*"]
+  assert core.app_index == {notes.id: client.id, files.id: client.id}
+  assert core.snapshot.stats["restored"] == {"clients": 1, "apps": 2}
+
+
+@pytest.mark.asyncio
+async def test_restore_is_one_shot(saved, make_core):
+  assert await make_core().snapshot.restore() == 1
+  assert await make_core().snapshot.restore() == 0
+
+
+# ----------------------------------
+# Test: apps are reopened under the current limits and installs
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_restore_respects_app_limits(saved, make_core):
+  core = make_core(limits={"max_apps_per_client": 1})
+  await core.snapshot.restore()
+
+  client = core.clients[saved["client"].id]
+  assert [app.name for app in client.running_apps.values()] == ["notes"]
+
+
+@pytest.mark.asyncio
+async def test_restore_skips_uninstalled_apps(saved, make_core, storage):
+  (storage / "data" / "app" / "files.json").unlink()
+  core = make_core()
+  await core.snapshot.restore()
+
+  client = core.clients[saved["client"].id]
+  assert [app.name for app in client.running_apps.values()] == ["notes"]
+
+
+@pytest.mark.asyncio
+async def test_expired_snapshot_is_ignored(saved, make_core, monkeypatch):
+  core = make_core()
+  monkeypatch.setattr(core.config.kikx.connection, "timeout", 0)
+  assert await core.snapshot.restore() == 0
+  assert not saved["path"].exists()
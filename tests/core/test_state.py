@@ -0,0 +1,179 @@
+import pytest
+
+from core.state import MemoryStateBackend, SQLiteStateBackend, StateBackend, create_state_backend
+from core.models.kikx_models import StateConfigModel
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def state(request, tmp_path):
+  if request.param == "sqlite":
+    backend = SQLiteStateBackend(tmp_path / "state.db", message_ttl=60, token_ttl=60)
+  else:
+    backend = MemoryStateBackend(token_ttl=60)
+  yield backend
+  backend.close()
+
+
+def age(state: StateBackend, table: str, column: str, key: str, seconds: float) -> None:
+  """Move a row of either backend back in time."""
+  if isinstance(state, SQLiteStateBackend):
+    key_column = {"tokens": "token", "workers": "worker_id"}[table]
+    state._db.execute(f"UPDATE {table} SET {column} = {column} - ? WHERE {key_column} = ?", (seconds, key))
+  elif table == "tokens":
+    state._tokens[key] -= seconds
+  else:
+    address, seen = state._workers[key]
+    state._workers[key] = (address, seen - seconds)
+
+
+# ----------------------------------
+# Test: tokens are one shot and expire after token_ttl
+# ----------------------------------
+
+def test_token_lifecycle(state):
+  state.add_token("t1")
+
+  assert state.has_token("t1")
+  assert state.pop_token("t1")
+  assert not state.pop_token("t1")
+  assert not state.has_token("t1")
+
+
+def test_expired_tokens_are_refused_and_purged(state):
+  state.add_token("old")
+  state.add_token("new")
+  age(state, "tokens", "created", "old", 120)
+
+  assert not state.has_token("old")
+  assert state.purge_tokens() == 1
+  assert not state.pop_token("old")
+  assert state.pop_token("new")
+
+
+# ----------------------------------
+# Test: owners go with their worker
+# ----------------------------------
+
+def test_owners(state):
+  state.set_owner("c1", "w1")
+  state.set_owner("a1", "w1")
+  state.set_owner("c2", "w2")
+  assert state.get_owner("c1") == "w1"
+
+  state.drop_owners("c1")
+  assert state.get_owner("c1") is None
+
+  state.drop_worker("w1")
+  assert state.get_owner("a1") is None
+  assert state.get_owner("c2") == "w2"
+
+
+def test_dead_workers_are_dropped(state):
+  state.add_worker("w1", "127.0.0.1:1")
+  state.add_worker("w2", "127.0.0.1:2")
+  state.set_owner("c1", "w1")
+  age(state, "workers", "seen", "w1", 60)
+
+  assert state.drop_dead_workers(30) == ["w1"]
+  assert state.get_worker("w1") is None
+  assert state.get_owner("c1") is None
+  assert state.get_worker("w2") == "127.0.0.1:2"
+  assert not state.heartbeat("w1")
+  assert state.heartbeat("w2")
+
+
+def test_heartbeat_keeps_worker_alive(state):
+  state.add_worker("w1", "127.0.0.1:1")
+  age(state, "workers", "seen", "w1", 60)
+
+  assert state.heartbeat("w1")
+  assert state.drop_dead_workers(30) == []
+
+
+# ----------------------------------
+# Test: the sqlite bus delivers other workers' messages
+# ----------------------------------
+
+def test_sqlite_bus(tmp_path):
+  first = SQLiteStateBackend(tmp_path / "state.db")
+  second = SQLiteStateBackend(tmp_path / "state.db")
+  try:
+    start = second.last_message_id()
+    first.publish("w1", "hello")
+    second.publish("w2", "own")
+
+    assert [message for _, message in second.poll("w2", start)] == ["hello"]
+    last = second.poll("w2", start)[-1][0]
+    assert second.poll("w2", last) == []
+  finally:
+    first.close()
+    second.close()
+
+
+def test_sqlite_purges_old_messages(tmp_path):
+  state = SQLiteStateBackend(tmp_path / "state.db", message_ttl=60)
+  try:
+    state.publish("w1", "old")
+    state._db.execute("UPDATE messages SET created = created - 120")
+    state.publish("w1", "new")
+    state.drop_dead_workers(30)
+
+    assert [message for _, message in state.poll("w2", 0)] == ["new"]
+    assert state.info()["workers"] == 0
+  finally:
+    state.close()
+
+
+# ----------------------------------
+# Test: the event loop never runs sqlite queries itself
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_run_and_submit_keep_order(state):
+  state.submit(state.add_token, "t1")
+  assert await state.run(state.pop_token, "t1")
+  assert not await state.run(state.has_token, "t1")
+
+
+@pytest.mark.asyncio
+async def test_sqlite_runs_off_the_loop(tmp_path):
+  import threading
+  state = SQLiteStateBackend(tmp_path / "state.db")
+  try:
+    thread = await state.run(threading.current_thread)
+    assert thread is not threading.current_thread()
+    assert thread.name.startswith("kikx-state")
+  finally:
+    state.close()
+
+
+def test_close_waits_for_submitted_writes(tmp_path):
+  state = SQLiteStateBackend(tmp_path / "state.db")
+  for i in range(50):
+    state.submit(state.add_token, f"t{i}")
+  state.close()
+
+  state = SQLiteStateBackend(tmp_path / "state.db")
+  try:
+    assert state.has_token("t49")
+  finally:
+    state.close()
+
+
+# ----------------------------------
+# Test: backend selection
+# ----------------------------------
+
+def test_create_state_backend(tmp_path):
+  memory = create_state_backend(StateConfigModel(token_ttl=5), lambda path: path)
+  sqlite = create_state_backend(StateConfigModel(backend="sqlite", path=str(tmp_path / "s.db")), lambda path: path)
+  try:
+    assert (memory.name, memory.shared, memory.token_ttl) == ("memory", False, 5)
+    assert (sqlite.name, sqlite.shared) == ("sqlite", True)
+  finally:
+    sqlite.close()
+
+
+def test_backends_implement_everything():
+  with pytest.raises(TypeError):
+    StateBackend()
@@ -0,0 +1,102 @@
+import json
+import pytest
+
+from lib.utils import receive_message
+from core.connection import Connection
+from core.client import Client
+from core.ui import ClientUI
+from core.utils import load_app_manifest
+from core.apps.modules import tasks as tasks_module
+from core.apps.modules.tasks import Tasks
+
+
+class Sample:
+  def __init__(self, usage):
+    self.sample = usage
+
+  def usage(self):
+    return self.sample
+
+
+# ----------------------------------
+# Test: connections count their traffic
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_connection_counts_bytes(websocket, drain):
+  connection = Connection()
+  ws, transport = await websocket()
+  await connection.connect(ws)
+
+  await connection.send_event("e", {"k": "v"})
+  await drain(connection)
+  connection.touch(12)
+  connection.touch()
+
+  assert connection.usage() == {"bytes_in": 12, "bytes_out": len(transport.sent[0]), "queued": 0}
+  assert connection.info()["queue"]["received"] == 1
+  await connection.stop()
+
+
+@pytest.mark.asyncio
+async def test_receive_message_size():
+  messages = [
+    {"type": "websocket.receive", "text": json.dumps({"event": "é"}, ensure_ascii=False)},
+    {"type": "websocket.receive", "bytes": b'{"event":"x"}'}
+  ]
+  class WS:
+    async def receive(self):
+      return messages.pop(0)
+
+  assert await receive_message(WS()) == ({"event": "é"}, 14)
+  assert await receive_message(WS(), "json") == ({"event": "x"}, 13)
+
+
+# ----------------------------------
+# Test: task usage is sampled at most every USAGE_MAX_AGE
+# ----------------------------------
+
+def test_tasks_usage_is_cached(monkeypatch):
+  tasks = Tasks.__new__(Tasks)
+  tasks._usage, tasks._usage_at = None, 0
+  tasks.running_tasks = {
+    "t1": Sample({"cpu": 1.5, "rss": 100, "processes": 2}),
+    "t2": Sample({"cpu": 0.5, "rss": 50, "processes": 1}),
+    "done": Sample(None)
+  }
+
+  assert tasks.usage() == {"tasks": 2, "processes": 3, "cpu": 2.0, "rss": 150}
+  del tasks.running_tasks["t1"]
+  assert tasks.usage()["tasks"] == 2
+
+  monkeypatch.setattr(tasks_module, "USAGE_MAX_AGE", 0)
+  assert tasks.usage()["tasks"] == 1
+
+
+# ----------------------------------
+# Test: a client's usage includes its apps
+# ----------------------------------
+
+@pytest.mark.asyncio
+async def test_client_usage_sums_apps(make_core, install_app):
+  install_app("notes")
+  core = make_core()
+  client = Client(
+    core.user, core.config.resolve_path, core.auth.new_token("kui"),
+    ClientUI("kui", core.get_ui_config("kui")), core.config.kikx
+  )
+  await core.add_client(client)
+  manifest = load_app_manifest(core, "notes")
+  first = await core.open_app(client.id, "notes", manifest, False)
+  second = await core.open_app(client.id, "notes", manifest, False)
+
+  client.connection.touch(10)
+  first.connection.touch(5)
+  second.funcx_calls = 3
+
+  usage = client.usage()
+  assert usage["bytes_in"] == 15
+  assert usage["funcx_calls"] == 3
+  assert usage["funcx"] == 0
+  assert usage["tasks"] == 0
+  assert first.usage()["bytes_in"] == 5
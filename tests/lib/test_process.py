@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+import signal
+import subprocess
+import pytest
+
+from kikx.lib.process import child_pids, process_tree_usage, read_process_usage
+
+
+pytestmark = pytest.mark.skipif(not os.path.isdir("/proc/self/task"), reason="needs Linux /proc")
+
+
+# ----------------------------------
+# Test: /proc usage of one process
+# ----------------------------------
+
+def test_read_own_usage():
+  cpu, rss = read_process_usage(os.getpid())
+  assert cpu > 0
+  assert rss > 1024 * 1024
+
+
+def test_gone_process():
+  process = subprocess.Popen([sys.executable, "-c", "pass"])
+  process.wait()
+
+  assert read_process_usage(process.pid) is None
+  assert child_pids(process.pid) == []
+  assert process_tree_usage(process.pid) == {"cpu": 0.0, "rss": 0, "processes": 0}
+
+
+# ----------------------------------
+# Test: a process tree is summed up
+# ----------------------------------
+
+def test_process_tree_usage():
+  # sh -> two sleeping children
+  process = subprocess.Popen(["sh", "-c", "sleep 5 & sleep 5 & wait"], start_new_session=True)
+  try:
+    for _ in range(100):
+      if len(child_pids(process.pid)) == 2:
+        break
+      time.sleep(0.01)
+
+    usage = process_tree_usage(process.pid)
+    assert usage["processes"] == 3
+    assert usage["rss"] > 0
+  finally:
+    os.killpg(process.pid, signal.SIGKILL)
+    process.wait()
@@ -0,0 +1,64 @@
+import pytest
+
+from kikx.lib import serializer as kikx_serializer
+from kikx.lib.serializer import (
+  JSON_PROTOCOL, MSGPACK_PROTOCOL, EncodedPayload,
+  negotiate_protocol, get_protocol_serializer, get_serializer
+)
+
+msgpack = pytest.importorskip("msgpack")
+
+
+# ----------------------------------
+# Test: subprotocol negotiation follows the client's preference
+# ----------------------------------
+
+def test_prefers_first_supported():
+  assert negotiate_protocol([MSGPACK_PROTOCOL, JSON_PROTOCOL]) == MSGPACK_PROTOCOL
+  assert negotiate_protocol([JSON_PROTOCOL, MSGPACK_PROTOCOL]) == JSON_PROTOCOL
+
+
+def test_binary_disabled_falls_back_to_json():
+  assert negotiate_protocol([MSGPACK_PROTOCOL, JSON_PROTOCOL], allow_binary=False) == JSON_PROTOCOL
+  assert negotiate_protocol([MSGPACK_PROTOCOL], allow_binary=False) is None
+
+
+def test_old_clients_get_plain_json():
+  assert negotiate_protocol([]) is None
+  assert negotiate_protocol(["graphql-ws"]) is None
+
+
+def test_msgpack_missing(monkeypatch):
+  monkeypatch.setattr(kikx_serializer, "_msgpack_serializer", None)
+
+  assert negotiate_protocol([MSGPACK_PROTOCOL, JSON_PROTOCOL]) == JSON_PROTOCOL
+  assert get_protocol_serializer(MSGPACK_PROTOCOL) is get_serializer()
+
+
+# ----------------------------------
+# Test: msgpack frames built from encoded parts decode like a plain dump
+# ----------------------------------
+
+def test_msgpack_join():
+  serializer = get_protocol_serializer(MSGPACK_PROTOCOL)
+  assert serializer.binary
+
+  payload = EncodedPayload({"data": b"\x00\x01", "n": [1, -1, 2 ** 40]})
+  frame = serializer.join_map([
+    ("event", serializer.dumps("e")),
+    ("seq", serializer.dumps(3)),
+    ("payload", payload.encode(serializer)),
+    ("list", serializer.join_array([serializer.dumps("a"), serializer.dumps(None)]))
+  ])
+
+  assert isinstance(frame, bytes)
+  assert serializer.loads(frame) == {
+    "event": "e", "seq": 3,
+    "payload": {"data": b"\x00\x01", "n": [1, -1, 2 ** 40]},
+    "list": ["a", None]
+  }
+
+
+def test_json_protocol_uses_text_serializer():
+  assert get_protocol_serializer(JSON_PROTOCOL) is get_serializer()
+  assert get_protocol_serializer(None) is get_serializer()
@@ -0,0 +1,94 @@
+import json
+import pytest
+
+from pydantic import BaseModel
+
+from kikx.lib import serializer as kikx_serializer
+from kikx.lib.serializer import (
+  EncodedPayload, JSONSerializer, ORJSONSerializer,
+  create_serializer, get_serializer, set_serializer
+)
+
+
+class CountingSerializer(JSONSerializer):
+  name = "counting"
+
+  def __init__(self):
+    self.calls = 0
+
+  def dumps(self, obj):
+    self.calls += 1
+    return super().dumps(obj)
+
+
+class Point(BaseModel):
+  x: int
+  y: int
+
+
+# ----------------------------------
+# Test: encoders produce compact JSON for plain and model payloads
+# ----------------------------------
+
+@pytest.mark.parametrize("serializer", [JSONSerializer(), ORJSONSerializer()] if kikx_serializer.orjson else [JSONSerializer()])
+def test_dumps_loads(serializer):
+  data = {"a": [1, 2], "t": "héllo", "p": Point(x=1, y=2), "s": {3}}
+  encoded = serializer.dumps(data)
+
+  assert serializer.loads(encoded) == {"a": [1, 2], "t": "héllo", "p": {"x": 1, "y": 2}, "s": [3]}
+  assert " " not in encoded
+
+
+def test_unknown_type_raises():
+  with pytest.raises(TypeError):
+    JSONSerializer().dumps({"x": object()})
+
+
+# ----------------------------------
+# Test: containers built from encoded values are valid JSON
+# ----------------------------------
+
+def test_join_map_and_array():
+  serializer = JSONSerializer()
+  data = serializer.join_map([
+    ("event", serializer.dumps("e")),
+    ("items", serializer.join_array([serializer.dumps(1), serializer.dumps({"k": "v"})]))
+  ])
+
+  assert json.loads(data) == {"event": "e", "items": [1, {"k": "v"}]}
+
+
+# ----------------------------------
+# Test: EncodedPayload encodes once per serializer
+# ----------------------------------
+
+def test_encoded_payload_encodes_once():
+  serializer = CountingSerializer()
+  payload = EncodedPayload({"big": list(range(10))})
+
+  first = payload.encode(serializer)
+  second = payload.encode(serializer)
+
+  assert first is second
+  assert serializer.calls == 1
+  assert json.loads(first) == {"big": list(range(10))}
+
+
+# ----------------------------------
+# Test: serializer selection
+# ----------------------------------
+
+def test_create_serializer_by_name():
+  assert isinstance(create_serializer("json"), JSONSerializer)
+  assert create_serializer("json").name == "json"
+  if kikx_serializer.orjson:
+    assert create_serializer("auto").name == "orjson"
+
+
+def test_set_serializer():
+  previous = get_serializer()
+  try:
+    set_serializer("json")
+    assert get_serializer().name == "json"
+  finally:
+    set_serializer(previous)